@@ -0,0 +1,186 @@
+"""Batch directive generation: JSONL cases in, one NDJSON result line per case out.
+
+CLI usage (from the repository root):
+
+    python batch.py cases.jsonl --output results.ndjson --concurrency 4 --rate-per-minute 20
+
+Each input line is {"id": "...", "case_details": "..."} ("id" defaults to the
+line number). Results are appended to --output as each case finishes, so a
+killed batch resumes where it stopped when rerun with the same output file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, Iterator, Optional, Set
+
+from encoder import dumps
+from rate_limits import request_priority
+
+# Server-side ceilings for /batch_directives, shared by all batches in the process
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_RATE_PER_MINUTE = float(os.getenv("BATCH_RATE_PER_MINUTE", "0"))
+BATCH_DIR = os.getenv("BATCH_DIR", "batches")
+
+class RateLimiter:
+    """Spaces out starts so that at most rate_per_minute happen per minute (<= 0 disables)"""
+
+    def __init__(self, rate_per_minute: float):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            delay = self._next_start - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_start = max(self._next_start, loop.time()) + self.interval
+
+class BatchLimits:
+    """Ceilings every batch in the process shares: cases running at once and cases started per minute"""
+
+    def __init__(self, max_concurrency: int, rate_per_minute: float):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_per_minute = rate_per_minute
+        self.slots = asyncio.Semaphore(self.max_concurrency)
+        self.limiter = RateLimiter(rate_per_minute)
+        self.running = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"running": self.running, "max_concurrency": self.max_concurrency, "rate_per_minute": self.rate_per_minute}
+
+def read_cases(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse JSONL case lines; malformed lines come back with an "error" key"""
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            case = json.loads(line)
+            if not isinstance(case, dict) or not isinstance(case.get("case_details"), str):
+                raise ValueError("expected an object with a case_details string")
+        except ValueError as e:
+            yield {"id": str(number), "error": f"Invalid case on line {number}: {str(e)}"}
+            continue
+        yield {"id": str(case.get("id", number)), "case_details": case["case_details"]}
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already finished successfully in an NDJSON checkpoint/output file"""
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # a partially written last line from a killed run
+            if result.get("status") == "ok":
+                done.add(str(result.get("id")))
+    return done
+
+async def run_batch(
+    cases: Iterable[Dict[str, Any]],
+    runner: Callable[[str], Awaitable[Dict[str, Any]]],
+    concurrency: int = 4,
+    rate_per_minute: float = 0,
+    skip_ids: Set[str] = frozenset(),
+    shared: Optional[BatchLimits] = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Run cases through runner on a pool of workers, yielding each result as it finishes.
+
+    runner(case_details) returns the directive result dict for one case.
+    concurrency and rate_per_minute limit this batch; shared limits are
+    also held by every other batch using the same BatchLimits.
+    """
+    pending = (case for case in cases if case["id"] not in skip_ids)
+    limiter = RateLimiter(rate_per_minute)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def run_one(case: Dict[str, Any]) -> Dict[str, Any]:
+        if "error" in case:
+            return {"id": case["id"], "status": "error", "error": case["error"]}
+
+        await limiter.acquire()
+        if shared is None:
+            return await run_case(case)
+        async with shared.slots:
+            await shared.limiter.acquire()
+            shared.running += 1
+            try:
+                return await run_case(case)
+            finally:
+                shared.running -= 1
+
+    async def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.monotonic()
+        try:
+            result = await runner(case["case_details"])
+            status = "ok" if result.get("answer") else "error"
+            return {"id": case["id"], "status": status, **result, "elapsed_seconds": round(time.monotonic() - started, 2)}
+        except Exception as e:
+            return {"id": case["id"], "status": "error", "error": str(e), "elapsed_seconds": round(time.monotonic() - started, 2)}
+
+    async def worker():
+        # Provider quota keeps headroom for interactive requests over batch work
+        request_priority.set("batch")
+        # Workers share one case iterator, so a case is only ever taken once
+        for case in pending:
+            await results.put(await run_one(case))
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    all_done = asyncio.ensure_future(asyncio.gather(*workers))
+    try:
+        while not (all_done.done() and results.empty()):
+            getter = asyncio.ensure_future(results.get())
+            await asyncio.wait({getter, all_done}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+        all_done.result()  # surface worker failures
+    finally:
+        for task in workers:
+            task.cancel()
+
+async def run_batch_file(input_path: str, output_path: str, concurrency: int, rate_per_minute: float):
+    from main import generate_directive_result
+
+    skip_ids = completed_ids(output_path)
+    if skip_ids:
+        print(f"Resuming: {len(skip_ids)} cases already completed", file=sys.stderr)
+
+    started = time.monotonic()
+    finished = 0
+    with open(input_path, encoding="utf-8") as cases_file, open(output_path, "a", encoding="utf-8") as output:
+        async for result in run_batch(read_cases(cases_file), generate_directive_result, concurrency, rate_per_minute, skip_ids):
+            output.write(dumps(result) + "\n")
+            output.flush()
+            os.fsync(output.fileno())
+            finished += 1
+            print(f"[{finished}] {result['id']}: {result['status']}", file=sys.stderr)
+
+    minutes = (time.monotonic() - started) / 60
+    rate = finished / minutes if minutes else 0.0
+    print(f"Finished {finished} cases in {minutes:.1f} min ({rate:.2f} cases/min at concurrency {concurrency})", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate directives for every case in a JSONL file")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"case_details\"} object per line")
+    parser.add_argument("--output", required=True, help="NDJSON results file; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate-per-minute", type=float, default=0, help="Max cases started per minute (0 = unlimited)")
+    args = parser.parse_args()
+
+    asyncio.run(run_batch_file(args.input, args.output, args.concurrency, args.rate_per_minute))
+
+
+if __name__ == "__main__":
+    main()
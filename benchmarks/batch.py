@@ -0,0 +1,86 @@
+"""Batch throughput (cases/min) per concurrency level, with the fake LLM and search.
+
+Run from the repository root:
+
+    python -m benchmarks.batch [--concurrency 1,2,4,8] [--cases 16]
+    python -m benchmarks.batch --llm-latency 0.8 --chunk-delay 0.02   # closer to Gemini's pacing
+
+Cases go through the same path as /batch_directives: run_batch with the
+process-wide batch_limits and scheduler slots. Each level runs one batch;
+the last row runs two batches at the highest level side by side, which must
+not exceed BATCH_MAX_CONCURRENCY cases in flight between them. The fakes
+replay a recording, so the numbers show the pipeline's own concurrency and
+overhead; absolute cases/min against Gemini depend on its latency and quota.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from benchmarks.pipeline import configure_environment
+
+async def run_batches(batches: int, concurrency: int, cases: int, case_details: str) -> Dict[str, Any]:
+    import main
+    from batch import run_batch
+
+    in_flight = peak = 0
+
+    async def runner(details: str) -> Dict[str, Any]:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            return await main.scheduled_directive_result(details)
+        finally:
+            in_flight -= 1
+
+    async def one_batch(batch: int) -> List[Dict[str, Any]]:
+        # Distinct cases so no run is shared or cached
+        batch_cases = [{"id": str(i), "case_details": f"{case_details} (batch {batch} case {i})"} for i in range(cases)]
+        return [result async for result in run_batch(batch_cases, runner, concurrency, 0, set(), main.batch_limits)]
+
+    started = time.perf_counter()
+    results = [result for batch in await asyncio.gather(*(one_batch(b) for b in range(batches))) for result in batch]
+    minutes = (time.perf_counter() - started) / 60
+    return {
+        "batches": batches,
+        "concurrency": concurrency,
+        "cases": len(results),
+        "errors": sum(result["status"] != "ok" for result in results),
+        "cases_per_minute": len(results) / minutes if minutes else 0.0,
+        "peak_in_flight": peak,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,2,4,8", type=lambda value: [int(part) for part in value.split(",")])
+    parser.add_argument("--cases", type=int, default=16, help="cases per batch")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM seconds before the first chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="fake LLM seconds between chunks")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per fake search query")
+    args = parser.parse_args()
+
+    configure_environment(tempfile.mkdtemp(prefix="batch-bench-"))
+    import main as server
+    from benchmarks.fakes import install_fakes, load_recording
+
+    recording = load_recording()
+    install_fakes(recording, first_token_latency=args.llm_latency, chunk_delay=args.chunk_delay, search_latency=args.search_latency)
+
+    async def run_all() -> List[Dict[str, Any]]:
+        rows = [await run_batches(1, concurrency, args.cases, recording["case_details"]) for concurrency in args.concurrency]
+        rows.append(await run_batches(2, max(args.concurrency), args.cases, recording["case_details"]))
+        return rows
+
+    print(f"BATCH_MAX_CONCURRENCY={server.batch_limits.max_concurrency} PIPELINE_MAX_CONCURRENT={server.scheduler.max_concurrent}")
+    print(f"{'batches':>7} {'concurrency':>11} {'cases':>6} {'errors':>6} {'cases/min':>10} {'peak in flight':>15}")
+    for row in asyncio.run(run_all()):
+        print(
+            f"{row['batches']:7d} {row['concurrency']:11d} {row['cases']:6d} {row['errors']:6d} "
+            f"{row['cases_per_minute']:10.1f} {row['peak_in_flight']:15d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Draft stage, single tool call vs sectioned: latency, time to first token and token cost.
+
+Run from the repository root:
+
+    python -m benchmarks.draft_modes [--runs 5]                           # fake LLM
+    python -m benchmarks.draft_modes --live [--case-file case.txt]        # real model, needs GOOGLE_API_KEY
+
+Only the draft stage is run (no search or revision). With the fake LLM every
+sectioned text call writes text_share of the recorded answer and token counts
+are estimated from characters, so the numbers show the shape of the trade-off
+(more prompt tokens for a shorter critical path), not real model speeds; use
+--live against the real model to decide on DRAFT_MODE.
+
+Measured with the fakes (5 runs, defaults): single 1108 ms / 402 ms to the
+first token / 2305 tokens, sections 1621 ms / 909 ms / 5926 tokens (1.46x
+latency, 2.57x tokens). Sectioned drafts only came out ahead with slow
+streaming (--chunk-delay 0.1: 3223 vs 3751 ms), still at 2.57x the tokens,
+so DRAFT_MODE defaults to "single".
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from typing import Any, Dict
+
+from benchmarks.pipeline import configure_environment
+
+MODES = ("single", "sections")
+
+async def run_draft(mode: str, case_details: str) -> Dict[str, Any]:
+    import main
+    from langchain_core.messages import HumanMessage
+
+    human_message = HumanMessage(content=case_details)
+    responses = []
+    if mode == "sections":
+        events = main.stream_sectioned_draft(human_message, responses)
+    else:
+        events = main.stream_draft_response(main.get_first_responder_chain(), human_message, responses)
+
+    started = time.perf_counter()
+    first_token = None
+    llm_calls = 1
+    errors = []
+    async for event in events:
+        if event.event_type == "draft_chunk":
+            first_token = first_token or time.perf_counter()
+        elif event.event_type == "draft_complete":
+            llm_calls = event.data.get("llm_calls", 1)
+        elif event.event_type == "error":
+            errors.append(event.data.get("message", ""))
+    finished = time.perf_counter()
+
+    usage = (getattr(responses[0], "usage_metadata", None) or {}) if responses else {}
+    return {
+        "ok": bool(responses) and not errors,
+        "errors": errors,
+        "latency": finished - started,
+        "first_token": (first_token or finished) - started,
+        "llm_calls": llm_calls,
+        "prompt_tokens": usage.get("input_tokens") or 0,
+        "completion_tokens": usage.get("output_tokens") or 0,
+        "answer_chars": len(main.tool_answer(responses[0])) if responses else 0,
+    }
+
+async def compare(case_details: str, runs: int) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for mode in MODES:
+        results = [await run_draft(mode, case_details) for _ in range(runs)]
+        failed = [result for result in results if not result["ok"]]
+        if failed:
+            raise SystemExit(f"{mode}: {len(failed)} of {runs} drafts failed: {failed[0]['errors']}")
+        summary[mode] = {
+            key: statistics.median(result[key] for result in results)
+            for key in ("latency", "first_token", "llm_calls", "prompt_tokens", "completion_tokens", "answer_chars")
+        }
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--live", action="store_true", help="use the configured model instead of the fake LLM")
+    parser.add_argument("--case-file", help="case text (default: the recording's case)")
+    parser.add_argument("--first-token-latency", type=float, default=0.4, help="fake LLM seconds before the first chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="fake LLM seconds between chunks")
+    args = parser.parse_args()
+
+    configure_environment(tempfile.mkdtemp(prefix="draft-modes-"))
+    from benchmarks.fakes import install_fakes, load_recording
+
+    recording = load_recording()
+    case_details = recording["case_details"]
+    if args.case_file:
+        with open(args.case_file, encoding="utf-8") as f:
+            case_details = f.read()
+    if not args.live:
+        install_fakes(recording, first_token_latency=args.first_token_latency, chunk_delay=args.chunk_delay)
+
+    summary = asyncio.run(compare(case_details, args.runs))
+    print(f"{'mode':10} {'latency':>9} {'1st token':>10} {'calls':>6} {'prompt tok':>11} {'compl tok':>10} {'chars':>7}")
+    for mode, row in summary.items():
+        print(
+            f"{mode:10} {row['latency'] * 1000:7.0f}ms {row['first_token'] * 1000:8.0f}ms {row['llm_calls']:6.0f} "
+            f"{row['prompt_tokens']:11.0f} {row['completion_tokens']:10.0f} {row['answer_chars']:7.0f}"
+        )
+    single, sections = summary["single"], summary["sections"]
+    total = lambda row: row["prompt_tokens"] + row["completion_tokens"]
+    print(
+        f"sections vs single: {sections['latency'] / single['latency']:.2f}x latency, "
+        f"{total(sections) / max(total(single), 1):.2f}x tokens"
+    )
+
+
+if __name__ == "__main__":
+    main()
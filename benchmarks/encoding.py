@@ -0,0 +1,97 @@
+"""Microbenchmark: encoding real-size search payloads, old probe-and-recurse path vs encoder.py.
+
+Run from the repository root:
+
+    python -m benchmarks.encoding [--queries 6] [--page-kb 40] [--repeat 20]
+
+One search stage is simulated per round: every query's Tavily result is made
+JSON-safe and encoded for the cache, the results are encoded into the
+ToolMessage, and each result is encoded into a search_result SSE event.
+"""
+import argparse
+import json
+import os
+import time
+
+import encoder
+
+RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "directive_recording.json")
+
+def legacy_safe_json_serialize(obj):
+    """execute_tools.safe_json_serialize before the shared encoder"""
+    try:
+        json.dumps(obj)
+        return obj
+    except (TypeError, ValueError, AttributeError):
+        if isinstance(obj, Exception):
+            return {"error": True, "error_type": obj.__class__.__name__, "error_message": str(obj)}
+        elif hasattr(obj, "__dict__"):
+            return {key: legacy_safe_json_serialize(value) for key, value in obj.__dict__.items()}
+        return {"error": True, "message": str(obj)}
+
+def build_payloads(queries: int, page_kb: int):
+    with open(RECORDING, encoding="utf-8") as f:
+        payload = json.load(f)["search_result"]
+    results = {}
+    for index in range(queries):
+        result = json.loads(json.dumps(payload))
+        for item in result["results"]:
+            text = item["raw_content"]
+            item["raw_content"] = (text * (page_kb * 1024 // len(text) + 1))[:page_kb * 1024]
+        result["query"] = f"query {index}"
+        results[result["query"]] = result
+    return results
+
+def legacy_stage(results):
+    safe = {}
+    for query, result in results.items():
+        safe[query] = legacy_safe_json_serialize(result)
+        json.dumps(safe[query])  # search cache
+    json.dumps(legacy_safe_json_serialize(safe))  # ToolMessage
+    for query, result in safe.items():
+        json.dumps({"query": query, "result": result}, default=str)  # SSE event
+
+def encoder_stage(results):
+    safe = {}
+    for query, result in results.items():
+        safe[query] = encoder.to_jsonable(result)
+        encoder.dumps(safe[query])  # search cache (the same text feeds the size metric)
+    encoder.dumps(safe)  # ToolMessage
+    for query, result in safe.items():
+        encoder.dumps({"query": query, "result": result})  # SSE event
+
+def measure(stage, results, repeat: int) -> float:
+    stage(results)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        stage(results)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=6)
+    parser.add_argument("--page-kb", type=int, default=40, help="raw_content size per result page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    results = build_payloads(args.queries, args.page_kb)
+    size_kb = len(json.dumps(results)) / 1024
+    print(f"{args.queries} queries, {size_kb:.0f} KiB of search results per stage")
+
+    legacy_ms = measure(legacy_stage, results, args.repeat)
+    print(f"legacy (probe + json.dumps): {legacy_ms:8.2f} ms")
+
+    backends = ["json"] + (["orjson"] if encoder.orjson is not None else [])
+    configured = encoder.JSON_BACKEND
+    try:
+        for backend in backends:
+            encoder.JSON_BACKEND = backend
+            encoder_ms = measure(encoder_stage, results, args.repeat)
+            print(f"encoder ({backend:6}):          {encoder_ms:8.2f} ms  ({legacy_ms / encoder_ms:.1f}x)")
+    finally:
+        encoder.JSON_BACKEND = configured
+
+
+if __name__ == "__main__":
+    main()
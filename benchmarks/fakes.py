@@ -0,0 +1,171 @@
+"""Deterministic stand-ins for ChatGoogleGenerativeAI and TavilySearch.
+
+They replay a recording (see fixtures/directive_recording.json) with
+configurable latency and chunking, so the pipeline can be exercised without
+network access or API keys:
+
+    from benchmarks.fakes import install_fakes, load_recording
+    install_fakes(load_recording())
+"""
+import asyncio
+import copy
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DEFAULT_RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "directive_recording.json")
+
+def load_recording(path: str = DEFAULT_RECORDING) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+class FakeChatModel(BaseChatModel):
+    """Replays the recorded AnswerQuestion/ReviseAnswer tool calls as a streamed tool call.
+
+    The draft tool gets the recorded draft; ReviseAnswer gets the recorded
+    revision matching the number of earlier AI answers in its input and
+    DraftCritique the draft's reflection and queries. Without a bound tool
+    (the sectioned draft's analysis and section calls) it streams plain text:
+    text_share of the recorded draft answer.
+    """
+
+    recording: Dict[str, Any]
+    first_token_latency: float = 0.05
+    chunk_delay: float = 0.005
+    chunk_size: int = 40
+    tool_name: Optional[str] = None
+    text_share: float = 0.2
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-replay"
+
+    def bind_tools(self, tools, tool_choice: Optional[str] = None, **kwargs):
+        return self.model_copy(update={"tool_name": tool_choice or tools[0].__name__})
+
+    def _tool_args(self, messages: List[BaseMessage]) -> Dict[str, Any]:
+        if self.tool_name == "DraftCritique":
+            return {field: self.recording["draft"][field] for field in ("search_queries", "reflection")}
+        if self.tool_name != "ReviseAnswer":
+            return self.recording["draft"]
+        revisions = self.recording["revisions"]
+        answers = sum(isinstance(message, AIMessage) for message in messages)
+        return revisions[min(max(answers - 1, 0), len(revisions) - 1)]
+
+    def _usage(self, messages: List[BaseMessage], args_json: str) -> Dict[str, int]:
+        prompt = sum(len(str(message.content)) for message in messages) // 4
+        completion = len(args_json) // 4
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+    def _text(self) -> str:
+        answer = self.recording["draft"]["answer"]
+        return answer[:max(1, int(len(answer) * self.text_share))]
+
+    def _chunks(self, messages: List[BaseMessage]) -> Iterator[AIMessageChunk]:
+        if self.tool_name is None:
+            text = self._text()
+            pieces = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+            for i, piece in enumerate(pieces):
+                yield AIMessageChunk(
+                    content=piece,
+                    usage_metadata=self._usage(messages, text) if i == len(pieces) - 1 else None,
+                )
+            return
+        args_json = json.dumps(self._tool_args(messages))
+        pieces = [args_json[i:i + self.chunk_size] for i in range(0, len(args_json), self.chunk_size)]
+        for i, piece in enumerate(pieces):
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[{
+                    "name": self.tool_name if i == 0 else None,
+                    "args": piece,
+                    "id": "call_fake" if i == 0 else None,
+                    "index": 0,
+                }],
+                usage_metadata=self._usage(messages, args_json) if i == len(pieces) - 1 else None,
+            )
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        chunks = list(self._chunks(messages))
+        time.sleep(self.first_token_latency + self.chunk_delay * len(chunks))
+        if self.tool_name is None:
+            message = AIMessage(content=self._text(), usage_metadata=chunks[-1].usage_metadata)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        args = self._tool_args(messages)
+        message = AIMessage(
+            content="",
+            tool_calls=[{"name": self.tool_name, "args": copy.deepcopy(args), "id": "call_fake"}],
+            usage_metadata=chunks[-1].usage_metadata,
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for i, chunk in enumerate(self._chunks(messages)):
+            if i:
+                await asyncio.sleep(self.chunk_delay)
+            yield ChatGenerationChunk(message=chunk)
+
+class FakeSearch:
+    """Returns the recorded Tavily payload for every query after a fixed latency"""
+
+    def __init__(self, recording: Dict[str, Any], latency: float = 0.05, raw_content_repeat: int = 4):
+        self.latency = latency
+        self.payload = copy.deepcopy(recording["search_result"])
+        # Real pages are much longer than the recorded excerpts
+        for result in self.payload.get("results", []):
+            result["raw_content"] = (result.get("raw_content") or "") * raw_content_repeat
+        self.calls = 0
+        # Every query sent, in call order
+        self.queries: List[str] = []
+
+    def _result(self, query: str) -> Dict[str, Any]:
+        self.calls += 1
+        self.queries.append(query)
+        return {"query": query, **copy.deepcopy(self.payload)}
+
+    def invoke(self, query: str) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return self._result(query)
+
+    async def ainvoke(self, query: str) -> Dict[str, Any]:
+        await asyncio.sleep(self.latency)
+        return self._result(query)
+
+def install_fakes(
+    recording: Dict[str, Any],
+    first_token_latency: float = 0.05,
+    chunk_delay: float = 0.005,
+    chunk_size: int = 40,
+    search_latency: float = 0.05,
+    raw_content_repeat: int = 4,
+    model_speed: Optional[Dict[str, float]] = None,
+) -> FakeSearch:
+    """Point the lazily built LLM and search clients at the fakes (before first use).
+
+    model_speed maps model names to a speed factor: a stage routed to a model
+    with factor 2 streams the same recording with half the latency.
+    """
+    import chains
+    import execute_tools
+
+    model_speed = model_speed or {}
+
+    def build_fake_llm(model: str, temperature: float, max_output_tokens: Optional[int] = None, thinking_budget: Optional[int] = None):
+        speed = model_speed.get(model, 1.0)
+        return FakeChatModel(
+            recording=recording,
+            first_token_latency=first_token_latency / speed,
+            chunk_delay=chunk_delay / speed,
+            chunk_size=chunk_size,
+        )
+
+    chains.build_llm = build_fake_llm
+    chains.reset_clients()
+    execute_tools.tavily_tool = FakeSearch(recording, search_latency, raw_content_repeat)
+    return execute_tools.tavily_tool
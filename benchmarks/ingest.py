@@ -0,0 +1,97 @@
+"""Case-file ingestion: throughput, peak memory and condensed size as uploads grow.
+
+Run from the repository root:
+
+    python -m benchmarks.ingest [--sizes 5 20 80] [--budget 12000]
+    python -m benchmarks.ingest --file export.mbox [--file pleading.docx ...]
+
+Without --file, a synthetic email export is generated for each size (in MB):
+a thread where every reply quotes the whole conversation so far, as mail
+clients do, plus signatures and disclaimers. Throughput comes from an
+untraced run; peak memory is measured with tracemalloc in a second run (it
+slows condense_files down about fourfold) and should stay flat as the size grows.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Tuple
+
+from ingest import CASE_TOKEN_BUDGET, condense_files
+
+FACTS = [
+    "The tenant paid Rs. {amount} as rent for {month} 2024 under the lease agreement dated 1 January 2023.",
+    "The landlord served a notice under Section 106 of the Transfer of Property Act on {day} {month} 2024.",
+    "Invoice {n} for Rs. {amount} remains unpaid; the buyer disputes the delivery date of {day}/03/2024.",
+    "The hearing before the civil court was adjourned to {day} {month} 2024 at the request of the defendant.",
+]
+SIGNATURE = "Regards,\nA. Sharma\nSent from my phone\n\nThis email and any attachments are confidential and may be privileged."
+
+def write_thread_export(path: str, megabytes: float, thread_length: int = 8):
+    """Email threads in which each reply quotes the previous messages"""
+    target = int(megabytes * 1024 * 1024)
+    written = 0
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            messages = []
+            for _ in range(thread_length):
+                n += 1
+                fact = FACTS[n % len(FACTS)].format(amount=f"{n * 1000:,}", month=("March", "April", "May")[n % 3], day=n % 28 + 1, n=n)
+                quoted = "\n".join("> " + line for line in "\n\n".join(messages).splitlines())
+                message = f"Subject: Re: dispute {n // thread_length}\n\n{fact}\n\n{SIGNATURE}\n\nOn Mon, A. Sharma wrote:\n\n{quoted}\n\n"
+                messages.insert(0, f"{fact}\n\n{SIGNATURE}")
+                f.write(message)
+                written += len(message)
+
+def measure(files: List[Tuple[str, str, int]], budget: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result = condense_files(files, "", budget)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    condense_files(files, "", budget)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    size = sum(file[2] for file in files)
+    stats = result["stats"]
+    return {
+        "mb": size / (1024 * 1024),
+        "seconds": elapsed,
+        "mb_per_second": size / (1024 * 1024) / max(elapsed, 1e-9),
+        "peak_mb": peak / (1024 * 1024),
+        "paragraphs": stats["paragraphs"],
+        "duplicates": stats["duplicates"],
+        "tokens_unique": stats["tokens_unique"],
+        "tokens_kept": stats["tokens_kept"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=float, nargs="+", default=[5, 20, 80], help="synthetic export sizes in MB")
+    parser.add_argument("--file", action="append", default=[], help="ingest these files instead of synthetic exports")
+    parser.add_argument("--budget", type=int, default=CASE_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    runs = []
+    if args.file:
+        runs.append([(os.path.basename(path), path, os.path.getsize(path)) for path in args.file])
+    else:
+        directory = tempfile.mkdtemp(prefix="ingest-bench-")
+        for megabytes in args.sizes:
+            path = os.path.join(directory, f"thread-{megabytes:g}mb.txt")
+            write_thread_export(path, megabytes)
+            runs.append([(os.path.basename(path), path, os.path.getsize(path))])
+
+    print(f"{'MB':>7} {'s':>7} {'MB/s':>7} {'peak MB':>8} {'paras':>9} {'dupes':>9} {'tokens':>10} {'kept':>7}")
+    for files in runs:
+        row = measure(files, args.budget)
+        print(
+            f"{row['mb']:7.1f} {row['seconds']:7.2f} {row['mb_per_second']:7.1f} {row['peak_mb']:8.1f} "
+            f"{row['paragraphs']:9d} {row['duplicates']:9d} {row['tokens_unique']:10d} {row['tokens_kept']:7d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Per-stage model routing vs the full model everywhere: latency and tokens per stage.
+
+Run from the repository root:
+
+    python -m benchmarks.model_routing [--runs 3]                     # fake LLM and search
+    python -m benchmarks.model_routing --live [--case-file case.txt]  # real model and search
+
+Each configuration runs the whole pipeline (draft, searches, revisions) and
+reports, per stage, the median time and prompt/completion tokens from the
+run's trace, plus how often a converged run needed the final-model pass.
+"uniform" puts every stage on the final_revision settings (the behaviour
+before routing); "routed" uses STAGE_MODELS as configured. The fake LLM
+replays the same recording for every model, so offline only latency differs
+(by --fast-speedup for FAST_MODEL_NAME); use --live for real token counts.
+"""
+import argparse
+import asyncio
+import copy
+import statistics
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.pipeline import configure_environment
+
+async def run_pipeline(case_details: str) -> Dict[str, Any]:
+    import main
+
+    summary: Dict[str, Any] = {}
+    final_pass = False
+    errors = []
+    async for event in main.run_legal_directive(case_details):
+        if event.event_type == "trace":
+            summary = event.data
+        elif event.event_type == "stopped":
+            final_pass = event.data.get("final_pass", False)
+        elif event.event_type == "error":
+            errors.append(event.data.get("message", ""))
+    return {"trace": summary, "final_pass": final_pass, "errors": errors}
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stages = sorted({stage for run in runs for stage in run["trace"].get("stages", {})})
+    rows = {}
+    for stage in stages:
+        rows[stage] = {
+            "ms": statistics.median(run["trace"]["stages"].get(stage, {}).get("total_ms", 0) for run in runs),
+            "prompt": statistics.median(run["trace"].get("tokens_by_stage", {}).get(stage, {}).get("prompt", 0) for run in runs),
+            "completion": statistics.median(run["trace"].get("tokens_by_stage", {}).get(stage, {}).get("completion", 0) for run in runs),
+        }
+    return {
+        "total_ms": statistics.median(run["trace"].get("total_ms", 0) for run in runs),
+        "final_passes": sum(run["final_pass"] for run in runs),
+        "stages": rows,
+    }
+
+async def compare(case_details: str, runs: int) -> Dict[str, Dict[str, Any]]:
+    import chains
+
+    routed = copy.deepcopy(chains.STAGE_MODELS)
+    uniform = {stage: dict(routed["final_revision"]) for stage in routed}
+    results = {}
+    try:
+        for name, stage_models in (("uniform", uniform), ("routed", routed)):
+            chains.STAGE_MODELS.clear()
+            chains.STAGE_MODELS.update(stage_models)
+            chains.reset_clients()
+            outcomes = [await run_pipeline(case_details) for _ in range(runs)]
+            failed = [outcome for outcome in outcomes if outcome["errors"]]
+            if failed:
+                raise SystemExit(f"{name}: {len(failed)} of {runs} runs failed: {failed[0]['errors']}")
+            results[name] = summarize(outcomes)
+    finally:
+        chains.STAGE_MODELS.clear()
+        chains.STAGE_MODELS.update(routed)
+        chains.reset_clients()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="use the configured model and Tavily instead of fakes")
+    parser.add_argument("--case-file", help="case text (default: the recording's case)")
+    parser.add_argument("--fast-speedup", type=float, default=2.0, help="fake LLM speed factor of FAST_MODEL_NAME")
+    args = parser.parse_args()
+
+    configure_environment(tempfile.mkdtemp(prefix="model-routing-"))
+    import chains
+    from benchmarks.fakes import install_fakes, load_recording
+
+    recording = load_recording()
+    case_details = recording["case_details"]
+    if args.case_file:
+        with open(args.case_file, encoding="utf-8") as f:
+            case_details = f.read()
+    if not args.live:
+        install_fakes(recording, first_token_latency=0.4, chunk_delay=0.02, model_speed={chains.FAST_MODEL_NAME: args.fast_speedup})
+
+    for stage, config in chains.STAGE_MODELS.items():
+        print(f"{stage:15} {config['model']} (max_output_tokens={config['max_output_tokens']})")
+    results = asyncio.run(compare(case_details, args.runs))
+
+    uniform, routed = results["uniform"], results["routed"]
+    print(f"\n{'stage':15} {'uniform ms':>11} {'routed ms':>10} {'uniform tok':>12} {'routed tok':>11}")
+    for stage in sorted(set(uniform["stages"]) | set(routed["stages"])):
+        before = uniform["stages"].get(stage, {"ms": 0, "prompt": 0, "completion": 0})
+        after = routed["stages"].get(stage, {"ms": 0, "prompt": 0, "completion": 0})
+        print(
+            f"{stage:15} {before['ms']:11.0f} {after['ms']:10.0f} "
+            f"{before['prompt'] + before['completion']:12.0f} {after['prompt'] + after['completion']:11.0f}"
+        )
+    print(f"{'total':15} {uniform['total_ms']:11.0f} {routed['total_ms']:10.0f}")
+    print(f"final-model passes after convergence: {routed['final_passes']} of {args.runs} routed runs")
+
+
+if __name__ == "__main__":
+    main()
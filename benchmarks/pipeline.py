@@ -0,0 +1,225 @@
+"""Offline end-to-end benchmark of /generate_directive with a fake LLM and fake search.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline [--concurrency 1,4,16] [--requests 32]
+    python -m benchmarks.pipeline --save-baseline    # record benchmarks/baseline.json
+
+The app is served by an in-process uvicorn server and driven over HTTP, so SSE
+framing and streaming are measured too. Caches and the local index are
+disabled and every request carries a distinct case, so each one runs the full
+draft -> search -> revise pipeline against the replayed recording. Reports
+p50/p95/p99 latency, time to first event, throughput, SSE bytes per request
+and peak RSS per concurrency level, and exits non-zero when a level regresses
+by more than --tolerance against the stored baseline.
+
+Time to first visible token compares the first draft_chunk (answer text
+streamed from the tool-call arguments) with draft_complete, the first point
+at which the answer was visible when only chunk.content was forwarded.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Lower is better for all of these except throughput
+COMPARED = ("p50_ms", "p95_ms", "p99_ms", "sse_bytes_per_request", "peak_rss_mb")
+
+def configure_environment(workdir: str):
+    """Keep the run hermetic: no caches, no index, throwaway job and checkpoint stores, dummy keys"""
+    os.environ["SEARCH_CACHE_PATH"] = ""
+    os.environ["DIRECTIVE_CACHE_PATH"] = ""
+    os.environ["LOCAL_INDEX_PATH"] = ""
+    os.environ["JOBS_DB_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["CHECKPOINT_DB_PATH"] = os.path.join(workdir, "checkpoints.sqlite3")
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def run_request(client, url: str, case_details: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    first_event = None
+    sse_bytes = 0
+    # Arrival time of the first event of each type
+    event_times: Dict[str, float] = {}
+    async with client.stream("POST", url, json={"case_details": case_details, "use_cache": False}) as response:
+        async for line in response.aiter_lines():
+            sse_bytes += len(line.encode("utf-8")) + 1
+            if line.startswith("event: "):
+                first_event = first_event or time.perf_counter()
+                event_times.setdefault(line[len("event: "):], time.perf_counter() - started)
+        status = response.status_code
+    finished = time.perf_counter()
+    return {
+        "ok": status == 200 and "final" in event_times and "error" not in event_times,
+        "status": status,
+        "latency": finished - started,
+        "first_event": (first_event or finished) - started,
+        "first_token": event_times.get("draft_chunk", finished - started),
+        "draft_complete": event_times.get("draft_complete", finished - started),
+        "sse_bytes": sse_bytes,
+    }
+
+async def run_level(client, url: str, concurrency: int, requests: int, case_details: str) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> Dict[str, Any]:
+        async with semaphore:
+            # A distinct case per request so single-flight does not merge them
+            return await run_request(client, url, f"{case_details} (benchmark case {concurrency}-{index})")
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [result for result in results if result["ok"]]
+    latencies = [result["latency"] * 1000 for result in ok]
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(results) - len(ok),
+        "rejected": sum(result["status"] == 503 for result in results),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "first_event_p50_ms": round(percentile([result["first_event"] * 1000 for result in ok], 50), 1),
+        "first_token_p50_ms": round(percentile([result["first_token"] * 1000 for result in ok], 50), 1),
+        "draft_complete_p50_ms": round(percentile([result["draft_complete"] * 1000 for result in ok], 50), 1),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "sse_bytes_per_request": round(sum(result["sse_bytes"] for result in ok) / len(ok)) if ok else 0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+async def run_benchmark(args) -> List[Dict[str, Any]]:
+    import httpx
+    import uvicorn
+
+    from benchmarks.fakes import install_fakes, load_recording
+    import main as server
+
+    recording = load_recording(args.recording)
+    install_fakes(
+        recording,
+        first_token_latency=args.llm_latency,
+        chunk_delay=args.chunk_delay,
+        chunk_size=args.chunk_size,
+        search_latency=args.search_latency,
+    )
+
+    port = free_port()
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+    serve = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.01)
+
+    url = f"http://127.0.0.1:{port}/generate_directive"
+    levels = []
+    try:
+        async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=None)) as client:
+            # Warm-up: imports, chain construction, first connections
+            await run_request(client, url, recording["case_details"] + " (warm-up)")
+            for concurrency in args.concurrency:
+                level = await run_level(client, url, concurrency, args.requests, recording["case_details"])
+                levels.append(level)
+                print(json.dumps(level))
+    finally:
+        uvicorn_server.should_exit = True
+        await serve
+    return levels
+
+def compare(levels: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of more than tolerance against the baseline, per concurrency level"""
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+    for level in levels:
+        base = previous.get(level["concurrency"])
+        if base is None:
+            continue
+        for metric in COMPARED:
+            if base.get(metric) and level[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"concurrency {level['concurrency']}: {metric} {level[metric]} > {base[metric]} (+{tolerance:.0%})")
+        if base.get("throughput_rps") and level["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"concurrency {level['concurrency']}: throughput_rps {level['throughput_rps']} < {base['throughput_rps']} (-{tolerance:.0%})"
+            )
+        if level["errors"]:
+            regressions.append(f"concurrency {level['concurrency']}: {level['errors']} failed requests")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16", type=lambda value: [int(part) for part in value.split(",")])
+    parser.add_argument("--requests", type=int, default=32, help="Requests per concurrency level")
+    parser.add_argument("--recording", default=None, help="Recorded tool calls and search payload (JSON)")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds before the first streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.005, help="Seconds between streamed chunks")
+    parser.add_argument("--chunk-size", type=int, default=40, help="Characters of tool-call JSON per chunk")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Seconds per fake search query")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    from benchmarks.fakes import DEFAULT_RECORDING
+    args.recording = args.recording or DEFAULT_RECORDING
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir)
+        levels = asyncio.run(run_benchmark(args))
+
+    print("Time to first visible token (p50): streamed tool-call arguments vs whole draft")
+    for level in levels:
+        streamed, whole = level["first_token_p50_ms"], level["draft_complete_p50_ms"]
+        print(f"  concurrency {level['concurrency']:3d}: {streamed:8.1f} ms vs {whole:8.1f} ms ({whole / streamed if streamed else 0:.1f}x sooner)")
+
+    settings = {key: getattr(args, key) for key in ("requests", "llm_latency", "chunk_delay", "chunk_size", "search_latency")}
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "levels": levels}, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != settings:
+        print(f"WARNING: baseline was recorded with different settings: {baseline.get('settings')}")
+
+    regressions = compare(levels, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"FAIL: {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
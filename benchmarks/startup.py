@@ -0,0 +1,61 @@
+"""Startup benchmark: time `import main` and assert it makes no network calls.
+
+Run from the repository root:
+
+    python -m benchmarks.startup [--max-seconds 10]
+
+Exits non-zero if importing main opens a socket, resolves a host name,
+builds an LLM/search client, or takes longer than --max-seconds.
+"""
+import argparse
+import socket
+import sys
+import time
+
+network_calls = []
+
+def _blocked(name):
+    def guard(*args, **kwargs):
+        network_calls.append((name, args[:2]))
+        raise OSError(f"network access during import: {name}{args[:2]}")
+    return guard
+
+def block_network():
+    socket.socket.connect = _blocked("socket.connect")
+    socket.socket.connect_ex = _blocked("socket.connect_ex")
+    socket.create_connection = _blocked("socket.create_connection")
+    socket.getaddrinfo = _blocked("socket.getaddrinfo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    block_network()
+
+    started = time.perf_counter()
+    import main as server  # noqa: F401
+    elapsed = time.perf_counter() - started
+
+    import chains
+    import execute_tools
+
+    failures = []
+    if network_calls:
+        failures.append(f"network calls during import: {network_calls}")
+    if chains._llms or execute_tools.tavily_tool is not None:
+        failures.append("LLM/search clients were built at import time")
+    if "reflexion_graph" in sys.modules and sys.modules["reflexion_graph"]._app is not None:
+        failures.append("reflexion graph was compiled at import time")
+    if elapsed > args.max_seconds:
+        failures.append(f"import took {elapsed:.2f}s (limit {args.max_seconds:.2f}s)")
+
+    print(f"import main: {elapsed * 1000:.1f} ms, network calls: {len(network_calls)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
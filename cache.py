@@ -0,0 +1,185 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from encoder import dumps, loads
+from metrics import CACHE_LOOKUPS
+
+# Legal abbreviations the model uses interchangeably in search queries
+QUERY_SYNONYMS = {
+    "sec": "section",
+    "secs": "section",
+    "sections": "section",
+    "art": "article",
+    "articles": "article",
+}
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so near-identical phrasings share a cache key.
+
+    Case, punctuation, spacing and common abbreviations ("Sec." / "section")
+    are ignored. Word order is kept: "section 21 article 14" and "section 14
+    article 21" are different questions.
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(QUERY_SYNONYMS.get(token, token) for token in text.split())
+
+def make_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable key parts"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SQLiteCache:
+    """Small on-disk key/value cache with TTL and LRU eviction.
+
+    The database file can be shared by several processes (e.g. uvicorn workers);
+    hit/miss counters are kept per process. An empty path disables the cache.
+    """
+
+    def __init__(self, path: str, table: str, ttl: float, max_entries: int):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = bool(path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed ON {self.table} (accessed_at)"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _count(self, hit: bool):
+        CACHE_LOOKUPS.inc(cache=self.table, result="hit" if hit else "miss")
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print(f"Cache unavailable ({self.table}): {str(e)}")
+            self._count(False)
+            return None
+        try:
+            row = conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    conn.commit()
+                self._count(False)
+                return None
+
+            conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Cache read failed ({self.table}): {str(e)}")
+            self._count(False)
+            return None
+        finally:
+            conn.close()
+
+        self._count(True)
+        return loads(row[0])
+
+    def set(self, key: str, value: Any, encoded: Optional[str] = None):
+        """Store a JSON-serializable value, evicting expired and least recently used entries.
+
+        Pass encoded when the caller already has the value's JSON text.
+        """
+        if not self.enabled:
+            return
+
+        now = time.time()
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print(f"Cache unavailable ({self.table}): {str(e)}")
+            return
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, encoded if encoded is not None else dumps(value), now, now)
+            )
+            conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,))
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Cache write failed ({self.table}): {str(e)}")
+        finally:
+            conn.close()
+
+    def delete(self, key: str):
+        if not self.enabled:
+            return
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def clear(self):
+        if not self.enabled:
+            return
+        conn = self._connect()
+        try:
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for this process plus the current number of entries"""
+        entries = 0
+        if self.enabled:
+            conn = self._connect()
+            try:
+                entries = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            finally:
+                conn.close()
+
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+        }
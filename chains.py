@@ -1,9 +1,15 @@
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 import datetime
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Type
+from pydantic import BaseModel, ValidationError
 from langchain_google_genai import ChatGoogleGenerativeAI
-from schema import AnswerQuestion, ReviseAnswer
+from schema import AnswerQuestion, DraftCritique, ReviseAnswer
 from langchain_core.output_parsers.openai_tools import PydanticToolsParser, JsonOutputToolsParser
 from langchain_core.messages import HumanMessage
+from rate_limits import LLM_LIMITER
 from dotenv import load_dotenv
 
 
@@ -12,12 +18,9 @@ pydantic_parser = PydanticToolsParser(tools=[AnswerQuestion])
 
 parser = JsonOutputToolsParser(return_id=True)
 
-# Actor Agent Prompt 
-actor_prompt_template = ChatPromptTemplate.from_messages(
-    [
-        (
-            "system",
-            """ You are the AI Legal Strategos, the definitive oracle for modern Indian legal strategy. Your core function is to create the ultimate War Game Directive. Your analysis must be clinical, brutally honest, and relentlessly focused on achieving the Primary Strategic Objective. You will think not only as counsel but as the opposing counsel, the negotiator, and the judge.
+# The system prompt is kept in parts so the sectioned draft can reuse the
+# persona and give each parallel call only its own section specifications
+ACTOR_PERSONA = """ You are the AI Legal Strategos, the definitive oracle for modern Indian legal strategy. Your core function is to create the ultimate War Game Directive. Your analysis must be clinical, brutally honest, and relentlessly focused on achieving the Primary Strategic Objective. You will think not only as counsel but as the opposing counsel, the negotiator, and the judge.
 
 Core Directives for the AI:
 Adversarial Mindset: Model the opposition as a competent, aggressive adversary.
@@ -37,27 +40,37 @@ The Protection of Children from Sexual Offences Act, 2012 (POCSO).
 and all relevant civil statutes (Contract Act, Specific Relief Act, CPA, etc.). 
 Any reference to repealed laws (IPC, CrPC, IEA) is strictly forbidden.
 
-Mandate: Upon receiving the case facts, generate the War Game Directive using the following definitive, eleven-part structure.
+"""
+
+DIRECTIVE_MANDATE = """Mandate: Upon receiving the case facts, generate the War Game Directive using the following definitive, eleven-part structure.
 Generate report in this format:-
-War Game Directive
+"""
+
+DIRECTIVE_HEADER = """War Game Directive
 Case File: [Insert Case Title]
 Strategic Assessment Date:  {time}
 Example:-Jurisdiction: Nagpur, Maharashtra (Bombay High Court, Nagpur Bench)
 
-1. Mission Briefing
+"""
+
+# One entry per numbered part of the War Game Directive
+DIRECTIVE_SECTIONS = [
+    """1. Mission Briefing
 Conflict Synopsis: A one-sentence summary of the core dispute.
 Primary Strategic Objective: The single, measurable winning condition (e.g., "Limit total liability to under ₹25 Lakhs and avoid any finding of professional negligence.").
 Probability of Mission Success (PoMS): A percentage-based assessment (e.g., 65% PoMS), with a Few sentence justification.
 Strategic Imperative: The overarching strategy (e.g., "Isolate and shift blame to the material supplier (Apex) through aggressive discovery, forcing them to settle first and fracturing the plaintiff's case against us.").
 
-2. Legal Battlefield Analysis
+""",
+    """2. Legal Battlefield Analysis
 Map the controlling statutes and sections, focusing on their tactical application.
 Statute	Key Section(s)	Tactical Application on the Battlefield
 Example:- BSA, 2023	Sec. 45 / Sec. 63B	Sec. 45 is our shield (admitting our expert report). Sec. 63B is a potential minefield for our digital evidence; compliance is non-negotiable.
 Example:- CPA, 2019	Sec. 2(11), 2(47)	This is the enemy's primary weapon ('deficiency of service,' 'unfair trade practice'). We must dismantle their claim element by element.
 
 Export to Sheets or make a table.
-3. Asset & Intelligence Assessment (Our Forces)
+""",
+    """3. Asset & Intelligence Assessment (Our Forces)
 Factual Strongholds (Admitted Facts): Undisputed facts that anchor our position.
 Battlegrounds (Disputed Facts): The key factual conflicts where the case will be won or lost.
 Evidence Arsenal & Readiness: Catalog and assess our evidence for strength and admissibility.
@@ -67,42 +80,49 @@ Emails to KSIDC	Med	Admissible with Sec. 63B Cert.	Compile all emails and prepar
 Missing Protest Docs	N/A (Weakness)	N/A	Initiate discovery demand specifically for these documents.
 
 Export to Sheets or make a table. 
-4. Red Team Analysis (Simulating the Opposition)
+""",
+    """4. Red Team Analysis (Simulating the Opposition)
 Opponent's Assumed Objective: Define their most likely winning condition.
 Opponent's Battle Plan: Detail their core legal arguments and procedural tactics.
 Opponent's Key Weapons: Identify the evidence and witnesses they will rely on most heavily.
 Opponent's Critical Vulnerabilities: Pinpoint the single weakest link in their case to exploit.
 
-5. Strategic SWOT Matrix
+""",
+    """5. Strategic SWOT Matrix
 A clinical assessment of our position.
 Strengths (Internal): Favorable contract clauses, expert reports.
 Weaknesses (Internal): 'Turnkey' responsibility, incomplete documentation.
 Opportunities (External): Apex's poor reputation, potential for a favorable settlement.
 Threats (External): Unfavorable precedent, a hostile judge.
 
-6. Financial Exposure & Remedies Analysis
+""",
+    """6. Financial Exposure & Remedies Analysis
 Maximum Liability Exposure: A quantified "worst-case" financial number if we lose completely.
 Target Liability Range: A realistic range of financial damages in a probable "shared liability" scenario.
 Potential Counter-Claim Recovery: A quantified "best-case" estimate of damages recoverable from our counter-suit.
 Available Remedies (Our Ask): List specific legal remedies we will seek (e.g., Damages under Sec. 21, Injunction under Sec. 38 of Specific Relief Act).
 
-7. Scenario War Gaming
+""",
+    """7. Scenario War Gaming
 Decisive Victory (Best Case): How we achieve it.
 Negotiated Resolution (Most Probable): What a "win" via settlement looks like (specific terms and numbers).
 Strategic Defeat (Worst Case): The critical failures that would lead to this outcome.
 
-8. Leverage Points & Negotiation Gambit
+""",
+    """8. Leverage Points & Negotiation Gambit
 Primary Leverage: Identify the most powerful tool we have over the opponent (e.g., "The threat of enmeshing KSIDC in a multi-year lawsuit with their own 'preferred vendor' is our primary leverage to force a reasonable settlement.").
 Negotiation Posture: Recommend the initial approach (e.g., "Calculated Aggression").
 The Opening Gambit: Propose a specific, actionable first move for negotiations.
 
-9. Execution Roadmap
+""",
+    """9. Execution Roadmap
 Phase 0: Immediate Mobilization (Next 72 Hours): Non-negotiable, time-critical actions.
 Phase 1: Shape the Battlefield (Pleadings & Discovery): Strategy for filing, responding, and using discovery as an offensive tool.
 Phase 2: Seize the Initiative (Evidence & Motions): Plan for introducing our evidence, filing interlocutory applications, and challenging theirs.
 Phase 3: Endgame (Trial or Settlement): Define the core trial narrative and the final "walk-away" settlement terms.
 
-10. Final Counsel Briefing
+""",
+    """10. Final Counsel Briefing
 Penetrating questions to ask your human advocate to ensure strategic alignment.
 What is the single most probable reason we could lose this case, and what is our primary mitigation for that specific risk?
 How will we use the discovery process offensively to put the other side on the defensive?
@@ -110,13 +130,24 @@ What is the specific judicial philosophy of the judges likely to be assigned thi
 Walk me through the three most critical questions you will ask their star witness during cross-examination.
 What is our 'Plan B' if our 'preferred vendor' argument is legally dismissed pre-trial?
 
-11. Mandatory Disclaimer
+""",
+    """11. Mandatory Disclaimer
 This is an AI-generated strategic directive based on the information provided and is for informational purposes only. It does not constitute legal advice and does not create an attorney-client relationship. You must consult with a qualified human advocate in India for advice on your specific situation.
 
-1. {first_instruction}
+""",
+]
+
+ACTOR_INSTRUCTIONS = """1. {first_instruction}
 2. Reflect and critique your answer. Be severe to maximize improvement.
 3. After the reflection, **list 1-3 search queries separately** for researching improvements. Do not include them inside the reflection.
 """
+
+# Actor Agent Prompt 
+actor_prompt_template = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            ACTOR_PERSONA + DIRECTIVE_MANDATE + DIRECTIVE_HEADER + "".join(DIRECTIVE_SECTIONS) + ACTOR_INSTRUCTIONS
         ),
         MessagesPlaceholder(variable_name="messages"),
         ("system", "Answer the user's question above using the required format."),
@@ -130,14 +161,120 @@ first_responder_prompt_template = actor_prompt_template.partial(
     "from that."
 )
 
-# Initialize LLM with streaming support
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    disable_streaming = False,  # Enable streaming
-    temperature=0.1
-)
+# Clients and chains are built on first use so importing this module never
+# touches the network or requires API keys
+_llms = {}
+_first_responder_chains = {}
+_revisor_chains = {}
+_case_analysis_chain = None
+_section_chains = {}
+_critique_chain = None
+
+MODEL_NAME = "gemini-2.5-flash"
+TEMPERATURE = 0.1
+
+def stage_model_config(prefix: str, model: str = MODEL_NAME) -> Dict[str, Any]:
+    """Settings for one stage from {prefix}_MODEL, _TEMPERATURE, _MAX_OUTPUT_TOKENS and _THINKING_BUDGET"""
+    thinking_budget = os.getenv(f"{prefix}_THINKING_BUDGET", "")
+    return {
+        "model": os.getenv(f"{prefix}_MODEL", model),
+        "temperature": float(os.getenv(f"{prefix}_TEMPERATURE", str(TEMPERATURE))),
+        "max_output_tokens": int(os.getenv(f"{prefix}_MAX_OUTPUT_TOKENS", "0")) or None,
+        "thinking_budget": int(thinking_budget) if thinking_budget else None,
+    }
+
+# Intermediate revisions are overwritten by the next iteration and the sectioned
+# draft's analysis and critique only steer the writing, so they default to the
+# lighter model; the draft and the final revision use the full model
+FAST_MODEL_NAME = os.getenv("FAST_MODEL_NAME", "gemini-2.5-flash-lite")
+STAGE_MODELS = {
+    "draft": stage_model_config("DRAFT"),
+    "revision": stage_model_config("REVISION", FAST_MODEL_NAME),
+    "final_revision": stage_model_config("FINAL_REVISION"),
+    "critique": stage_model_config("CRITIQUE", FAST_MODEL_NAME),
+}
+
+def is_routed(stage: str) -> bool:
+    """Whether stage runs with other settings than the final revision"""
+    return STAGE_MODELS[stage] != STAGE_MODELS["final_revision"]
+
+# Completion tokens charged against LLM_TOKENS_PER_MINUTE before a call; corrected from its usage afterwards
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "4000"))
+
+def usage_tokens(usage) -> int:
+    usage = usage or {}
+    return usage.get("total_tokens") or (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+
+class RateLimitedChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """Gemini client whose calls wait for LLM_LIMITER quota and are retried on 429/5xx.
+
+    Streams are only retried before their first chunk, so nothing is ever
+    repeated to the client. The client's own retries are turned off in get_llm.
+    """
+
+    def _estimate_tokens(self, messages) -> int:
+        prompt = sum(len(str(message.content)) + len(str(getattr(message, "tool_calls", "") or "")) for message in messages) // 4
+        return prompt + LLM_EXPECTED_OUTPUT_TOKENS
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate_tokens(messages)
+        parent = super(RateLimitedChatGoogleGenerativeAI, self)
+        result = LLM_LIMITER.call_sync(lambda: parent._generate(messages, stop=stop, run_manager=run_manager, **kwargs), estimate)
+        LLM_LIMITER.settle(estimate, usage_tokens(getattr(result.generations[0].message, "usage_metadata", None)) or None)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate_tokens(messages)
+        parent = super(RateLimitedChatGoogleGenerativeAI, self)
+        result = await LLM_LIMITER.call(lambda: parent._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs), estimate)
+        LLM_LIMITER.settle(estimate, usage_tokens(getattr(result.generations[0].message, "usage_metadata", None)) or None)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate_tokens(messages)
+        parent = super(RateLimitedChatGoogleGenerativeAI, self)
+        used = 0
+        for chunk in LLM_LIMITER.stream_sync(lambda: parent._stream(messages, stop=stop, run_manager=run_manager, **kwargs), estimate):
+            used += usage_tokens(getattr(chunk.message, "usage_metadata", None))
+            yield chunk
+        LLM_LIMITER.settle(estimate, used or None)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        estimate = self._estimate_tokens(messages)
+        parent = super(RateLimitedChatGoogleGenerativeAI, self)
+        used = 0
+        async for chunk in LLM_LIMITER.stream(lambda: parent._astream(messages, stop=stop, run_manager=run_manager, **kwargs), estimate):
+            used += usage_tokens(getattr(chunk.message, "usage_metadata", None))
+            yield chunk
+        LLM_LIMITER.settle(estimate, used or None)
 
-first_responder_chain = first_responder_prompt_template | llm.bind_tools(tools=[AnswerQuestion], tool_choice='AnswerQuestion') 
+def build_llm(model: str, temperature: float, max_output_tokens: Optional[int] = None, thinking_budget: Optional[int] = None) -> ChatGoogleGenerativeAI:
+    options = {}
+    if max_output_tokens:
+        options["max_output_tokens"] = max_output_tokens
+    if thinking_budget is not None:
+        options["thinking_budget"] = thinking_budget
+    return RateLimitedChatGoogleGenerativeAI(
+        model=model,
+        disable_streaming = False,  # Enable streaming
+        temperature=temperature,
+        max_retries=1,  # a single attempt: retries are LLM_LIMITER's, which honours Retry-After
+        **options
+    )
+
+def get_llm(stage: str = "draft") -> ChatGoogleGenerativeAI:
+    """Return the Gemini client for a stage, creating it on first use (stages with equal settings share one)"""
+    config = STAGE_MODELS[stage]
+    key = tuple(sorted(config.items()))
+    if key not in _llms:
+        _llms[key] = build_llm(**config)
+    return _llms[key]
+
+def get_first_responder_chain(stage: str = "draft"):
+    """Draft chain: actor prompt bound to the AnswerQuestion tool"""
+    if stage not in _first_responder_chains:
+        _first_responder_chains[stage] = first_responder_prompt_template | get_llm(stage).bind_tools(tools=[AnswerQuestion], tool_choice='AnswerQuestion')
+    return _first_responder_chains[stage]
 
 validator = PydanticToolsParser(tools=[AnswerQuestion])
 
@@ -153,6 +290,146 @@ revise_instructions = """Revise your previous answer using the new information.
     - You should use the previous critique to remove superfluous information from your answer and enhanced the answer.
 """
 
-revisor_chain = actor_prompt_template.partial(
+revisor_prompt_template = actor_prompt_template.partial(
     first_instruction=revise_instructions
-) | llm.bind_tools(tools=[ReviseAnswer], tool_choice="ReviseAnswer")
\ No newline at end of file
+)
+
+def get_revisor_chain(stage: str = "final_revision"):
+    """Revision chain: actor prompt bound to the ReviseAnswer tool, on the stage's model"""
+    if stage not in _revisor_chains:
+        _revisor_chains[stage] = revisor_prompt_template | get_llm(stage).bind_tools(tools=[ReviseAnswer], tool_choice="ReviseAnswer")
+    return _revisor_chains[stage]
+
+def valid_tool_call(message: Any, schema: Type[BaseModel]) -> bool:
+    """Whether message's first tool call is schema's and its arguments validate against it"""
+    tool_calls = getattr(message, "tool_calls", None) or []
+    if not tool_calls or tool_calls[0].get("name") != schema.__name__:
+        return False
+    try:
+        schema.model_validate(tool_calls[0].get("args") or {})
+    except ValidationError:
+        return False
+    return True
+
+# Sectioned draft: a shared case analysis first, then the parts of the
+# directive written concurrently from it, then one critique of the result
+
+# Directive parts (1-based) written by each parallel call, in output order
+SECTION_GROUPS = [
+    ("briefing", [1, 2]),
+    ("intelligence", [3, 4]),
+    ("swot", [5, 6]),
+    ("scenarios", [7, 8]),
+    ("execution", [9, 10, 11]),
+]
+
+case_analysis_instructions = """Mandate: The War Game Directive for this case will be written in parts, concurrently, by several authors. Before they start, prepare the shared case analysis all of them will work from. Do not write the directive itself.
+Cover, as terse bullet points (at most 350 words):
+- Case title and jurisdiction (court and bench)
+- Parties and their roles
+- Conflict synopsis and the Primary Strategic Objective
+- Key admitted facts, key disputed facts and the evidence for each
+- Controlling provisions of the BNS, BNSS and BSA (or the applicable civil statutes) with section numbers
+- The strongest point and the most dangerous weakness for the client
+"""
+
+def section_instructions(parts: list) -> str:
+    """System prompt text for one parallel section call"""
+    specs = "".join(DIRECTIVE_SECTIONS[part - 1] for part in parts)
+    header = ""
+    if parts[0] == 1:
+        header = "Begin with the directive header:\n" + DIRECTIVE_HEADER
+    return (
+        "Mandate: The War Game Directive for this case is being written in parts, concurrently, by several authors "
+        "working from the same shared case analysis. Write ONLY the following parts of the directive, with their "
+        "numbered headings exactly as given, and nothing else: no preamble, no other parts, no closing remarks.\n\n"
+        + header + specs.rstrip() + "\n\nShared case analysis:\n{analysis}\n"
+    )
+
+case_analysis_prompt_template = ChatPromptTemplate.from_messages(
+    [
+        ("system", ACTOR_PERSONA + case_analysis_instructions),
+        MessagesPlaceholder(variable_name="messages"),
+    ]
+)
+
+section_prompt_templates = {
+    name: ChatPromptTemplate.from_messages(
+        [
+            ("system", ACTOR_PERSONA + section_instructions(parts)),
+            MessagesPlaceholder(variable_name="messages"),
+            ("system", "Write only your assigned parts of the directive for the case above."),
+        ]
+    ).partial(
+        time=lambda: datetime.datetime.now().isoformat(),
+    )
+    for name, parts in SECTION_GROUPS
+}
+
+critique_instructions = """The War Game Directive below was assembled from parts written in parallel by different authors.
+1. Reflect and critique it severely to maximize improvement. Look especially for contradictions, duplication and gaps between the parts.
+2. After the reflection, **list 1-3 search queries separately** for researching improvements. Do not include them inside the reflection.
+
+War Game Directive:
+{directive}
+"""
+
+critique_prompt_template = ChatPromptTemplate.from_messages(
+    [
+        ("system", ACTOR_PERSONA + critique_instructions),
+        MessagesPlaceholder(variable_name="messages"),
+        ("system", "Critique the directive above using the required format."),
+    ]
+)
+
+def get_case_analysis_chain():
+    """Plain-text case analysis shared by the section calls"""
+    global _case_analysis_chain
+    if _case_analysis_chain is None:
+        _case_analysis_chain = case_analysis_prompt_template | get_llm("critique")
+    return _case_analysis_chain
+
+def get_section_chain(name: str):
+    """Plain-text chain writing one group of directive parts"""
+    if name not in _section_chains:
+        _section_chains[name] = section_prompt_templates[name] | get_llm("draft")
+    return _section_chains[name]
+
+def get_critique_chain():
+    """Critique of an assembled directive, bound to the DraftCritique tool"""
+    global _critique_chain
+    if _critique_chain is None:
+        _critique_chain = critique_prompt_template | get_llm("critique").bind_tools(tools=[DraftCritique], tool_choice="DraftCritique")
+    return _critique_chain
+
+def reset_clients():
+    """Drop the built clients and chains, so the next use rebuilds them (e.g. after changing STAGE_MODELS)"""
+    global _case_analysis_chain, _critique_chain
+    _llms.clear()
+    _first_responder_chains.clear()
+    _revisor_chains.clear()
+    _section_chains.clear()
+    _case_analysis_chain = None
+    _critique_chain = None
+
+def prompt_version() -> str:
+    """Fingerprint of the model settings, prompts and output schemas.
+
+    Anything that caches generated directives should include this in its key so
+    that editing a prompt in this file invalidates stale results.
+    """
+    parts = [
+        STAGE_MODELS,
+        [message.prompt.template for message in actor_prompt_template.messages if hasattr(message, "prompt")],
+        first_responder_prompt_template.partial_variables.get("first_instruction"),
+        revise_instructions,
+        AnswerQuestion.model_json_schema(),
+        ReviseAnswer.model_json_schema(),
+        SECTION_GROUPS,
+        case_analysis_instructions,
+        [section_instructions(parts) for _, parts in SECTION_GROUPS],
+        critique_instructions,
+        DraftCritique.model_json_schema(),
+    ]
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
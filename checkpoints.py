@@ -0,0 +1,103 @@
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+from encoder import dumps, loads
+
+class CheckpointStore:
+    """Pipeline state saved after every completed node (draft, search, revision), keyed by run id.
+
+    Only the latest checkpoint of a run is kept: it holds the full message state,
+    so a failed or interrupted run can continue from there without repeating the
+    LLM and search calls that already succeeded. An empty path disables it.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.enabled = bool(path)
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "run_id TEXT PRIMARY KEY, case_details TEXT NOT NULL, node TEXT NOT NULL, "
+                "iteration INTEGER NOT NULL, messages TEXT NOT NULL, extra TEXT NOT NULL, "
+                "status TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def save(self, run_id: str, case_details: str, node: str, iteration: int, state: List[BaseMessage], extra: Dict[str, Any]):
+        """Record that node completed; the run stays 'running' until set_status"""
+        if not self.enabled:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM checkpoints WHERE updated_at < ?", (now - self.ttl,))
+            conn.execute(
+                "INSERT INTO checkpoints (run_id, case_details, node, iteration, messages, extra, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'running', ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET node = excluded.node, iteration = excluded.iteration, "
+                "messages = excluded.messages, extra = excluded.extra, status = 'running', updated_at = excluded.updated_at",
+                (run_id, case_details, node, iteration, dumps(messages_to_dict(state)), dumps(extra), now, now)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def set_status(self, run_id: str, status: str):
+        if not self.enabled:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE checkpoints SET status = ?, updated_at = ? WHERE run_id = ?", (status, time.time(), run_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a run without its message state, or None for an unknown id"""
+        if not self.enabled:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT node, iteration, status, created_at, updated_at FROM checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        node, iteration, status, created_at, updated_at = row
+        return {"run_id": run_id, "node": node, "iteration": iteration, "status": status, "created_at": created_at, "updated_at": updated_at}
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """The latest checkpoint with its messages restored, or None"""
+        if not self.enabled:
+            return None
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT case_details, node, iteration, messages, extra, status FROM checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        case_details, node, iteration, messages, extra, status = row
+        return {
+            "run_id": run_id,
+            "case_details": case_details,
+            "node": node,
+            "iteration": iteration,
+            "state": messages_from_dict(loads(messages)),
+            "extra": loads(extra),
+            "status": status,
+        }
@@ -0,0 +1,154 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from encoder import dumps
+
+# Token budget for the evidence handed to the revisor per tool call (<= 0 disables compaction)
+COMPACTION_TOKEN_BUDGET = int(os.getenv("COMPACTION_TOKEN_BUDGET", "4000"))
+PASSAGE_MAX_WORDS = int(os.getenv("COMPACTION_PASSAGE_WORDS", "120"))
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in",
+    "is", "it", "its", "of", "on", "or", "that", "the", "this", "to", "was", "were",
+    "which", "will", "with", "not", "but", "their", "they", "there", "been", "any",
+}
+
+def estimate_tokens(value: Any) -> int:
+    """Rough token count (~4 characters per token) for text or JSON-serializable values"""
+    text = value if isinstance(value, str) else dumps(value)
+    return (len(text) + 3) // 4
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+def split_passages(text: str, max_words: int = PASSAGE_MAX_WORDS) -> List[str]:
+    """Split page text into passages of roughly max_words, keeping paragraphs together"""
+    passages = []
+    current: List[str] = []
+    for paragraph in re.split(r"\n\s*\n|\r\n\s*\r\n", text):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and len(current) + len(words) > max_words:
+            passages.append(" ".join(current))
+            current = []
+        while len(words) > max_words:
+            passages.append(" ".join(words[:max_words]))
+            words = words[max_words:]
+        current.extend(words)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+def bm25_scores(query_weights: Dict[str, float], documents: List[List[str]], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Okapi BM25 score of every tokenized document for a weighted bag of query terms"""
+    if not documents:
+        return []
+
+    avg_length = sum(len(doc) for doc in documents) / len(documents) or 1.0
+    document_frequency = Counter(term for doc in documents for term in set(doc))
+    total = len(documents)
+
+    scores = []
+    for doc in documents:
+        term_counts = Counter(doc)
+        length_norm = k1 * (1 - b + b * len(doc) / avg_length)
+        score = 0.0
+        for term, weight in query_weights.items():
+            tf = term_counts.get(term)
+            if not tf:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            score += weight * idf * tf * (k1 + 1) / (tf + length_norm)
+        scores.append(score)
+    return scores
+
+def _shingles(tokens: List[str], size: int = 5) -> set:
+    if len(tokens) <= size:
+        return {tuple(tokens)}
+    return {tuple(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def _is_search_error(result: Any) -> bool:
+    return not isinstance(result, dict) or "error" in result
+
+def compact_search_results(
+    query_results: Dict[str, Any],
+    case_text: str,
+    critique: str = "",
+    token_budget: int = COMPACTION_TOKEN_BUDGET,
+) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Reduce raw Tavily results to the passages most relevant to the case.
+
+    Page text is split into passages, scored with BM25 against the case facts,
+    the reflection's `missing` critique and the search query, de-duplicated
+    across results, and the best passages are kept within token_budget. Every
+    passage keeps its source URL so the revisor can still cite it.
+
+    Returns (compacted_results, {"tokens_before": ..., "tokens_after": ...}).
+    """
+    tokens_before = estimate_tokens(query_results)
+    if token_budget <= 0:
+        return query_results, {"tokens_before": tokens_before, "tokens_after": tokens_before}
+
+    # Critique terms matter more than the (long) case text for choosing evidence
+    base_weights: Dict[str, float] = {}
+    for term in set(tokenize(case_text)):
+        base_weights[term] = 1.0
+    for term in set(tokenize(critique)):
+        base_weights[term] = base_weights.get(term, 0.0) + 2.0
+
+    compacted: Dict[str, Any] = {}
+    candidates = []  # (score, query, url, text, tokens)
+    for query, result in query_results.items():
+        if _is_search_error(result):
+            compacted[query] = result
+            continue
+
+        compacted[query] = {"answer": result.get("answer"), "sources": [], "passages": []}
+        query_weights = dict(base_weights)
+        for term in set(tokenize(query)):
+            query_weights[term] = query_weights.get(term, 0.0) + 2.0
+
+        passages = []
+        for item in result.get("results", []) or []:
+            url = item.get("url", "")
+            compacted[query]["sources"].append({"url": url, "title": item.get("title", "")})
+            text = item.get("raw_content") or item.get("content") or ""
+            for passage in split_passages(text):
+                passages.append((url, passage, tokenize(passage)))
+
+        scores = bm25_scores(query_weights, [tokens for _, _, tokens in passages])
+        for (url, passage, tokens), score in zip(passages, scores):
+            candidates.append((score, query, url, passage, tokens))
+
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+    # Best passage per query first so no query's evidence is crowded out, then by score
+    first_per_query, rest, seen_queries = [], [], set()
+    for candidate in candidates:
+        if candidate[1] not in seen_queries:
+            seen_queries.add(candidate[1])
+            first_per_query.append(candidate)
+        else:
+            rest.append(candidate)
+
+    used = estimate_tokens(compacted)
+    kept_shingles: List[set] = []
+    for score, query, url, passage, tokens in first_per_query + rest:
+        cost = estimate_tokens(passage) + estimate_tokens(url) + 8
+        if used + cost > token_budget:
+            continue
+
+        shingles = _shingles(tokens)
+        if any(len(shingles & other) / (len(shingles | other) or 1) > 0.8 for other in kept_shingles):
+            continue  # same text quoted by another source
+
+        kept_shingles.append(shingles)
+        compacted[query]["passages"].append({"url": url, "text": passage})
+        used += cost
+
+    return compacted, {"tokens_before": tokens_before, "tokens_after": estimate_tokens(compacted)}
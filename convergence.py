@@ -0,0 +1,84 @@
+import difflib
+import os
+import time
+from typing import Any, Dict, List, Optional
+from langchain_core.messages import AIMessage, BaseMessage
+
+from cache import normalize_query
+from conversation_state import message_tokens
+
+# A new query this similar (token Jaccard) to an executed one adds nothing
+QUERY_SIMILARITY_THRESHOLD = float(os.getenv("QUERY_SIMILARITY_THRESHOLD", "0.8"))
+# Stop once a revision changes less than this fraction of the answer's words
+ANSWER_CHANGE_THRESHOLD = float(os.getenv("ANSWER_CHANGE_THRESHOLD", "0.05"))
+# Per-request budgets (<= 0 disables)
+RUN_TIME_BUDGET_SECONDS = float(os.getenv("RUN_TIME_BUDGET_SECONDS", "600"))
+RUN_TOKEN_BUDGET = int(os.getenv("RUN_TOKEN_BUDGET", "0"))
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the normalized query terms"""
+    terms_a, terms_b = set(normalize_query(a).split()), set(normalize_query(b).split())
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+def answer_change(previous: str, current: str) -> float:
+    """Fraction of the answer that changed between two revisions (0 = identical)"""
+    matcher = difflib.SequenceMatcher(None, previous.split(), current.split(), autojunk=False)
+    return 1.0 - matcher.ratio()
+
+def tokens_used(state: List[BaseMessage]) -> int:
+    """Prompt + completion tokens reported by the LLM so far, estimated when usage is missing"""
+    total = 0
+    for message in state:
+        if isinstance(message, AIMessage):
+            usage = getattr(message, "usage_metadata", None) or {}
+            total += usage.get("total_tokens") or message_tokens(message)
+    return total
+
+def _tool_args(state: List[BaseMessage]) -> List[Dict[str, Any]]:
+    return [
+        message.tool_calls[0]["args"]
+        for message in state
+        if isinstance(message, AIMessage) and message.tool_calls
+    ]
+
+def stop_reason(state: List[BaseMessage], started_at: Optional[float] = None) -> Optional[str]:
+    """Why another search/revise iteration would not be worth it, or None to continue.
+
+    Looks at the latest AI answer in state: an empty `missing` critique, new
+    search queries that only repeat executed ones, an answer that barely changed
+    from the previous one, or an exhausted time/token budget all stop the loop.
+    Only meant for revisions: the pipeline always searches and revises the draft
+    once before asking. A missing or malformed reflection is not an empty critique.
+    """
+    answers = _tool_args(state)
+    if not answers:
+        return None
+    current = answers[-1]
+
+    reflection = current.get("reflection")
+    if isinstance(reflection, dict) and not (reflection.get("missing") or "").strip():
+        return "critique_empty"
+
+    new_queries = current.get("search_queries") or []
+    if not new_queries:
+        return "no_search_queries"
+
+    executed = [query for args in answers[:-1] for query in args.get("search_queries") or []]
+    if executed and all(
+        max(query_similarity(query, old) for old in executed) >= QUERY_SIMILARITY_THRESHOLD
+        for query in new_queries
+    ):
+        return "queries_repeated"
+
+    if len(answers) > 1 and answer_change(answers[-2].get("answer", ""), current.get("answer", "")) < ANSWER_CHANGE_THRESHOLD:
+        return "answer_converged"
+
+    if started_at is not None and RUN_TIME_BUDGET_SECONDS > 0 and time.monotonic() - started_at > RUN_TIME_BUDGET_SECONDS:
+        return "time_budget"
+
+    if RUN_TOKEN_BUDGET > 0 and tokens_used(state) >= RUN_TOKEN_BUDGET:
+        return "token_budget"
+
+    return None
@@ -0,0 +1,125 @@
+import os
+from typing import Any, Dict, List, Tuple
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+from compaction import estimate_tokens
+from encoder import dumps, loads
+
+# Token budget for the conversation messages sent to the revisor (the system prompt is extra)
+STATE_TOKEN_BUDGET = int(os.getenv("STATE_TOKEN_BUDGET", "24000"))
+SUMMARY_WORDS = 60
+
+def message_tokens(message: BaseMessage) -> int:
+    """Estimated prompt tokens for a message, including tool-call arguments"""
+    tokens = estimate_tokens(message.content if isinstance(message.content, str) else dumps(message.content))
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += estimate_tokens(tool_call.get("args", {}))
+    return tokens
+
+def split_rounds(state: List[BaseMessage]) -> Tuple[List[BaseMessage], List[List[BaseMessage]]]:
+    """Split state into the leading case messages and rounds of (AI message, its ToolMessages)"""
+    head: List[BaseMessage] = []
+    rounds: List[List[BaseMessage]] = []
+    for message in state:
+        if isinstance(message, AIMessage):
+            rounds.append([message])
+        elif rounds:
+            rounds[-1].append(message)
+        else:
+            head.append(message)
+    return head, rounds
+
+def _summarize(text: str) -> str:
+    words = text.split()
+    if len(words) <= SUMMARY_WORDS:
+        return text
+    return " ".join(words[:SUMMARY_WORDS]) + " ... [earlier draft truncated]"
+
+def _source_urls(content: Any) -> Dict[str, List[str]]:
+    """Source URLs per query from a search ToolMessage (compacted or raw Tavily results)"""
+    try:
+        results = loads(content) if isinstance(content, str) else content
+    except ValueError:
+        return {}
+    if not isinstance(results, dict):
+        return {}
+
+    urls = {}
+    for query, result in results.items():
+        if not isinstance(result, dict):
+            continue
+        items = result.get("sources") or result.get("results") or []
+        urls[query] = [item.get("url", "") for item in items if isinstance(item, dict)]
+    return urls
+
+def condense_round(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Shrink an older round: truncate the draft, drop the critique, keep only source URLs.
+
+    Tool-call ids are preserved so every function call still has its response.
+    """
+    condensed: List[BaseMessage] = []
+    for message in messages:
+        if isinstance(message, AIMessage):
+            tool_calls = []
+            for tool_call in message.tool_calls or []:
+                args = tool_call.get("args", {})
+                condensed_args = {
+                    "answer": _summarize(args.get("answer", "")),
+                    "search_queries": args.get("search_queries", []),
+                }
+                if "references" in args:
+                    condensed_args["references"] = args["references"]
+                tool_calls.append({**tool_call, "args": condensed_args})
+            condensed.append(AIMessage(content=_summarize(message.content) if isinstance(message.content, str) else "", tool_calls=tool_calls))
+        elif isinstance(message, ToolMessage):
+            condensed.append(ToolMessage(
+                content=dumps({
+                    query: {"sources": urls, "note": "evidence from an earlier iteration, condensed"}
+                    for query, urls in _source_urls(message.content).items()
+                }),
+                tool_call_id=message.tool_call_id
+            ))
+        else:
+            condensed.append(message)
+    return condensed
+
+def budget_messages(state: List[BaseMessage], token_budget: int = STATE_TOKEN_BUDGET) -> Tuple[List[BaseMessage], Dict[str, int]]:
+    """Select what the revisor needs from the full history within token_budget.
+
+    The case and the latest round (current answer, critique and compacted evidence)
+    are always kept. Older rounds are condensed, newest first, while they fit the
+    budget and dropped after that, so the prompt stays flat as iterations grow.
+
+    Returns (messages, stats) where stats has tokens_full, tokens_sent,
+    rounds_condensed and rounds_dropped.
+    """
+    head, rounds = split_rounds(state)
+    tokens_full = sum(message_tokens(message) for message in state)
+    if not rounds:
+        return list(state), {"tokens_full": tokens_full, "tokens_sent": tokens_full, "rounds_condensed": 0, "rounds_dropped": 0}
+
+    latest = rounds[-1]
+    used = sum(message_tokens(message) for message in head + latest)
+
+    kept_older: List[List[BaseMessage]] = []
+    dropped = 0
+    for older in reversed(rounds[:-1]):
+        condensed = condense_round(older)
+        cost = sum(message_tokens(message) for message in condensed)
+        if dropped or used + cost > token_budget:
+            dropped += 1
+            continue
+        kept_older.insert(0, condensed)
+        used += cost
+
+    messages = list(head)
+    for older in kept_older:
+        messages.extend(older)
+    messages.extend(latest)
+
+    return messages, {
+        "tokens_full": tokens_full,
+        "tokens_sent": used,
+        "rounds_condensed": len(kept_older),
+        "rounds_dropped": dropped,
+    }
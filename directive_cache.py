@@ -0,0 +1,30 @@
+import os
+import re
+import unicodedata
+from dotenv import load_dotenv
+
+from cache import SQLiteCache, make_key
+from chains import prompt_version
+
+load_dotenv()
+
+# Finished directives, stored as their recorded SSE event sequence.
+# Set DIRECTIVE_CACHE_PATH to an empty string to disable.
+directive_cache = SQLiteCache(
+    path=os.getenv("DIRECTIVE_CACHE_PATH", "directive_cache.sqlite3"),
+    table="directives",
+    ttl=float(os.getenv("DIRECTIVE_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("DIRECTIVE_CACHE_MAX_ENTRIES", "500"))
+)
+
+# Bump to invalidate every cached directive without touching the prompts
+DIRECTIVE_CACHE_VERSION = os.getenv("DIRECTIVE_CACHE_VERSION", "1")
+
+def normalize_case_text(case_details: str) -> str:
+    """Canonical case text: Unicode-normalized with whitespace collapsed"""
+    text = unicodedata.normalize("NFKC", case_details)
+    return re.sub(r"\s+", " ", text).strip()
+
+def directive_cache_key(case_details: str, stream_mode: str = "lean", draft_mode: str = "single") -> str:
+    """Content address of a directive: case text, stream and draft mode and model/prompt fingerprint"""
+    return make_key(normalize_case_text(case_details), stream_mode, draft_mode, prompt_version(), DIRECTIVE_CACHE_VERSION)
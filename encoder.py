@@ -0,0 +1,96 @@
+"""Shared JSON encoding for search results, SSE events and caches.
+
+Everything is encoded in a single pass: values the json/orjson encoders do not
+know are handed to `default`, which converts exceptions, pydantic models,
+LangChain messages and arbitrary objects. orjson is used when installed
+(JSON_BACKEND=json forces the standard library).
+"""
+import dataclasses
+import json
+import os
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None and os.getenv("JSON_BACKEND", "auto") != "json" else "json"
+
+# Deeper structures are cut off rather than recursing forever on cycles
+MAX_DEPTH = 64
+
+def default(obj: Any) -> Any:
+    """Fallback for values the encoder does not handle natively"""
+    if isinstance(obj, Exception):
+        return {"error": True, "error_type": obj.__class__.__name__, "error_message": str(obj)}
+    if hasattr(obj, "model_dump") and hasattr(obj, "content") and hasattr(obj, "type"):
+        # LangChain messages: only what a client or cache needs, not the run metadata
+        message = {"type": obj.type, "content": obj.content}
+        if getattr(obj, "tool_calls", None):
+            message["tool_calls"] = obj.tool_calls
+        return message
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    if hasattr(obj, "__dict__"):
+        return {key: value for key, value in vars(obj).items() if not key.startswith("_")}
+    return str(obj)
+
+def to_jsonable(obj: Any, _depth: int = 0) -> Any:
+    """A JSON-safe version of obj, built in one walk.
+
+    Containers that are already JSON-safe are returned as they are (no copy),
+    so plain Tavily payloads cost a single traversal.
+    """
+    if obj is None or isinstance(obj, (str, bool, int, float)):
+        return obj
+    if _depth >= MAX_DEPTH:
+        return str(obj)
+
+    if isinstance(obj, dict):
+        converted = None
+        for index, (key, value) in enumerate(obj.items()):
+            safe = to_jsonable(value, _depth + 1)
+            if converted is None and (safe is not value or not isinstance(key, str)):
+                # First change: copy the (unchanged) items seen so far
+                converted = dict(item for _, item in zip(range(index), obj.items()))
+            if converted is not None:
+                converted[key if isinstance(key, str) else str(key)] = safe
+        return obj if converted is None else converted
+
+    if isinstance(obj, list):
+        converted = None
+        for index, value in enumerate(obj):
+            safe = to_jsonable(value, _depth + 1)
+            if converted is None and safe is not value:
+                converted = obj[:index]
+            if converted is not None:
+                converted.append(safe)
+        return obj if converted is None else converted
+
+    return to_jsonable(default(obj), _depth + 1)
+
+def dumps(obj: Any) -> str:
+    """Encode obj as compact JSON text"""
+    if JSON_BACKEND == "orjson":
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # e.g. integers beyond 64 bits or nesting orjson refuses: the standard library takes both
+            return json.dumps(to_jsonable(obj), ensure_ascii=False, separators=(",", ":"))
+    try:
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":"))
+    except ValueError:
+        # Circular reference
+        return json.dumps(to_jsonable(obj), ensure_ascii=False, separators=(",", ":"))
+
+def loads(data: Any) -> Any:
+    if JSON_BACKEND == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
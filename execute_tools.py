@@ -1,12 +1,26 @@
-import json
-from typing import List, Dict, Any
+import asyncio
+import os
+import time
+from typing import List, Dict, Any, Tuple, AsyncGenerator, Optional
 from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, HumanMessage
-from langchain_tavily import TavilySearch
 from dotenv import load_dotenv
+from cache import SQLiteCache, make_key, normalize_query
+from compaction import compact_search_results
+from encoder import dumps, to_jsonable
+from legal_index import LegalIndex
+from metrics import observe_search, timed
+from tavily_client import TavilyClient
 load_dotenv()
 
-# Configure TavilySearch with proper parameters based on documentation
-tavily_tool = TavilySearch(
+# Limits for the concurrent search stage (overridable per call)
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "3"))
+SEARCH_QUERY_TIMEOUT = float(os.getenv("SEARCH_QUERY_TIMEOUT", "30"))
+SEARCH_STAGE_TIMEOUT = float(os.getenv("SEARCH_STAGE_TIMEOUT", "60"))
+# Start the draft's searches as soon as each query appears in the streamed tool call
+SPECULATIVE_SEARCH = os.getenv("SPECULATIVE_SEARCH", "1") == "1"
+
+# Tavily search parameters sent with every query
+TAVILY_CONFIG = dict(
     max_results=5,
     topic="news",
     # Additional parameters for better search results
@@ -18,85 +32,328 @@ tavily_tool = TavilySearch(
     include_domains=["https://indiankanoon.org/","https://www.indiacode.nic.in/",""]
 )
 
-def safe_json_serialize(obj):
-    """Safely serialize objects to JSON, handling exceptions and non-serializable objects"""
+# Built on first use so importing this module never needs TAVILY_API_KEY
+tavily_tool = None
+
+def get_tavily_tool() -> TavilyClient:
+    """Return the shared Tavily client (pooled connections, rate limited), creating it on first use"""
+    global tavily_tool
+    if tavily_tool is None:
+        tavily_tool = TavilyClient(**TAVILY_CONFIG)
+    return tavily_tool
+
+async def close_tavily_tool():
+    """Close the shared client's connections (at shutdown)"""
+    if isinstance(tavily_tool, TavilyClient):
+        await tavily_tool.aclose()
+
+# Search results are cached on disk so repeated or near-identical queries skip Tavily.
+# Set SEARCH_CACHE_PATH to an empty string to disable.
+search_cache = SQLiteCache(
+    path=os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite3"),
+    table="search_results",
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", str(7 * 24 * 3600))),
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+)
+
+# Local statute/judgment index consulted before Tavily (empty LOCAL_INDEX_PATH disables)
+local_index = LegalIndex(os.getenv("LOCAL_INDEX_PATH", "legal_index.sqlite3"))
+
+# Tavily settings that change what a query returns
+SEARCH_CACHE_CONFIG_FIELDS = [
+    "topic", "search_depth", "country", "include_domains",
+    "max_results", "include_answer", "include_raw_content",
+]
+
+def search_cache_key(query: str) -> str:
+    """Cache key for a query under the current Tavily configuration"""
+    config = {field: TAVILY_CONFIG.get(field) for field in SEARCH_CACHE_CONFIG_FIELDS}
+    return make_key(normalize_query(query), config)
+
+def is_cacheable(result: Any) -> bool:
+    """Only successful searches are cached; Tavily reports failures as an "error" key"""
+    return isinstance(result, dict) and "error" not in result
+
+def get_search_queries(ai_message: AIMessage) -> List[Tuple[str, List[str]]]:
+    """Return (tool_call_id, search_queries) pairs from AnswerQuestion/ReviseAnswer tool calls"""
+    if not hasattr(ai_message, "tool_calls") or not ai_message.tool_calls:
+        return []
+    
+    return [
+        (tool_call["id"], tool_call["args"].get("search_queries", []))
+        for tool_call in ai_message.tool_calls
+        if tool_call["name"] in ["AnswerQuestion", "ReviseAnswer"]
+    ]
+
+def search_error(e: Exception) -> Dict[str, Any]:
+    """Error payload used in place of a search result when a query fails"""
+    return {
+        "error": True,
+        "error_type": e.__class__.__name__,
+        "error_message": str(e)
+    }
+
+def run_search_query(query: str) -> Any:
+    """Execute a single search query, returning a JSON-safe result or an error dict"""
+    started = time.monotonic()
     try:
-        # Test if the object is JSON serializable
-        json.dumps(obj)
-        return obj
-    except (TypeError, ValueError, AttributeError) as e:
-        # If it's an exception object or non-serializable, convert to safe format
-        if isinstance(obj, Exception):
-            return {
-                "error": True,
-                "error_type": obj.__class__.__name__,
-                "error_message": str(obj)
-            }
-        elif hasattr(obj, '__dict__'):
+        key = search_cache_key(query)
+        cached = search_cache.get(key)
+        if cached is not None:
+            observe_search("cache", time.monotonic() - started)
+            return cached
+        
+        # Statute lookups are usually answered by the local index
+        local = local_index.lookup(query)
+        if local is not None:
+            observe_search("local_index", time.monotonic() - started)
+            return local
+        
+        print(f"Executing search query: {query}")  # Debug logging
+        result = get_tavily_tool().invoke(query)
+        
+        # Ensure result is JSON serializable; it is encoded once for the metrics and the cache
+        result = to_jsonable(result)
+        encoded = dumps(result)
+        observe_search("tavily", time.monotonic() - started, len(encoded))
+        if is_cacheable(result):
+            search_cache.set(key, result, encoded)
+            local_index.add_search_results(result)
+        return result
+        
+    except Exception as e:
+        print(f"Search failed for query '{query}': {str(e)}")  # Debug logging
+        observe_search("error", time.monotonic() - started)
+        return search_error(e)
+
+async def arun_search_query(query: str, timeout: Optional[float] = None) -> Any:
+    """Async variant of run_search_query with a per-query timeout"""
+    timeout = SEARCH_QUERY_TIMEOUT if timeout is None else timeout
+    started = time.monotonic()
+    try:
+        key = search_cache_key(query)
+        cached = await asyncio.to_thread(search_cache.get, key)
+        if cached is not None:
+            observe_search("cache", time.monotonic() - started)
+            return cached
+        
+        # Statute lookups are usually answered by the local index
+        local = await asyncio.to_thread(local_index.lookup, query)
+        if local is not None:
+            observe_search("local_index", time.monotonic() - started)
+            return local
+        
+        print(f"Executing search query: {query}")  # Debug logging
+        result = await asyncio.wait_for(get_tavily_tool().ainvoke(query), timeout=timeout)
+        result = to_jsonable(result)
+        encoded = dumps(result)
+        observe_search("tavily", time.monotonic() - started, len(encoded))
+        if is_cacheable(result):
+            await asyncio.to_thread(search_cache.set, key, result, encoded)
+            await asyncio.to_thread(local_index.add_search_results, result)
+        return result
+    
+    except asyncio.TimeoutError:
+        observe_search("error", time.monotonic() - started)
+        return search_error(TimeoutError(f"Search timed out after {timeout}s"))
+    except Exception as e:
+        print(f"Search failed for query '{query}': {str(e)}")  # Debug logging
+        observe_search("error", time.monotonic() - started)
+        return search_error(e)
+
+async def astream_search_queries(
+    queries: List[str],
+    max_concurrency: Optional[int] = None,
+    query_timeout: Optional[float] = None,
+    stage_timeout: Optional[float] = None,
+    prefetched: Optional[Dict[str, "asyncio.Task"]] = None,
+) -> AsyncGenerator[Tuple[int, str, Any], None]:
+    """Run queries concurrently and yield (index, query, result) in completion order.
+    
+    At most max_concurrency searches are in flight at once. Queries with a task in
+    prefetched (already started speculatively) just wait for it. Queries still
+    running when the stage deadline passes are cancelled and reported as TimeoutError dicts.
+    """
+    prefetched = prefetched or {}
+    max_concurrency = SEARCH_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+    stage_timeout = SEARCH_STAGE_TIMEOUT if stage_timeout is None else stage_timeout
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def run(index: int, query: str) -> Tuple[int, str, Any]:
+        if query in prefetched:
+            return index, query, await prefetched[query]
+        async with semaphore:
+            return index, query, await arun_search_query(query, query_timeout)
+    
+    tasks = [asyncio.ensure_future(run(index, query)) for index, query in enumerate(queries)]
+    pending = set(tasks)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + stage_timeout
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+    
+    # Whatever missed the stage deadline degrades to an error result
+    for index, task in enumerate(tasks):
+        if task in pending:
+            yield index, queries[index], search_error(
+                TimeoutError(f"Search stage deadline of {stage_timeout}s exceeded")
+            )
+
+class SpeculativeSearch:
+    """Searches started while the LLM is still streaming the tool call that asks for them.
+    
+    start() is called for each query as soon as it is complete in the streamed
+    arguments; take() hands the tasks for the final query list to the search stage
+    and cancels any the final arguments no longer contain.
+    """
+    
+    def __init__(self, max_concurrency: Optional[int] = None, query_timeout: Optional[float] = None):
+        self.query_timeout = query_timeout
+        self._semaphore = asyncio.Semaphore(max(1, SEARCH_MAX_CONCURRENCY if max_concurrency is None else max_concurrency))
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._intervals: Dict[str, List[float]] = {}
+        self.generation_finished_at: Optional[float] = None
+    
+    def start(self, query: str) -> bool:
+        """Launch the search for query unless it is already running; True if it was launched"""
+        if not isinstance(query, str) or not query.strip() or query in self.tasks:
+            return False
+        self.tasks[query] = asyncio.ensure_future(self._run(query))
+        return True
+    
+    async def _run(self, query: str) -> Any:
+        async with self._semaphore:
+            interval = self._intervals[query] = [time.monotonic(), None]
             try:
-                # Try to convert object attributes to dictionary
-                safe_dict = {}
-                for key, value in obj.__dict__.items():
-                    safe_dict[key] = safe_json_serialize(value)
-                return safe_dict
-            except:
-                return {"error": True, "message": str(obj)}
-        else:
-            return {"error": True, "message": str(obj)}
+                return await arun_search_query(query, self.query_timeout)
+            finally:
+                interval[1] = time.monotonic()
+    
+    def finish_generation(self):
+        """Mark the end of the LLM stream; search time before this point was overlapped"""
+        self.generation_finished_at = time.monotonic()
+    
+    def take(self, queries: List[str]) -> Dict[str, asyncio.Task]:
+        """Tasks for the given queries; speculative searches for other queries are cancelled"""
+        for query, task in self.tasks.items():
+            if query not in queries:
+                task.cancel()
+        return {query: task for query, task in self.tasks.items() if query in queries}
+    
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
+    
+    def overlap_seconds(self) -> float:
+        """Wall-clock time searches ran while the LLM was still generating"""
+        end = self.generation_finished_at or time.monotonic()
+        spans = sorted(
+            (started, min(finished or end, end))
+            for started, finished in self._intervals.values()
+            if started < end
+        )
+        total, covered_until = 0.0, 0.0
+        for started, finished in spans:
+            started = max(started, covered_until)
+            if finished > started:
+                total += finished - started
+                covered_until = finished
+        return total
+
+def build_tool_message(call_id: str, query_results: Dict[str, Any]) -> ToolMessage:
+    """Wrap the results of one tool call's search queries in a ToolMessage"""
+    try:
+        # Anything non-serializable is converted by the encoder's fallback in the same pass
+        content = dumps(query_results)
+    except Exception as e:
+        # Fallback if even safe serialization fails
+        print(f"Failed to serialize query results: {str(e)}")
+        content = dumps({
+            "error": True,
+            "message": "Failed to serialize search results",
+            "queries": list(query_results)
+        })
+    
+    return ToolMessage(
+        content=content,
+        tool_call_id=call_id
+    )
+
+def get_compaction_context(state: List[BaseMessage]) -> Tuple[str, str]:
+    """Case facts and the latest reflection's `missing` critique, used to rank search evidence"""
+    case_text = next((str(message.content) for message in state if isinstance(message, HumanMessage)), "")
+    
+    critique = ""
+    for tool_call in getattr(state[-1], "tool_calls", None) or []:
+        reflection = tool_call["args"].get("reflection") or {}
+        if isinstance(reflection, dict):
+            critique = reflection.get("missing", "") or ""
+    
+    return case_text, critique
+
+def build_tool_messages(
+    state: List[BaseMessage],
+    calls: List[Tuple[str, List[str]]],
+    results: Dict[str, Any],
+) -> Tuple[List[ToolMessage], Dict[str, int]]:
+    """Compact each tool call's search results and wrap them in ToolMessages.
+    
+    Returns the messages plus token counts before and after compaction.
+    """
+    case_text, critique = get_compaction_context(state)
+    tool_messages = []
+    stats = {"tokens_before": 0, "tokens_after": 0}
+    
+    for call_id, search_queries in calls:
+        with timed("compaction"):
+            compacted, call_stats = compact_search_results(
+                {query: results[query] for query in search_queries}, case_text, critique
+            )
+        stats["tokens_before"] += call_stats["tokens_before"]
+        stats["tokens_after"] += call_stats["tokens_after"]
+        tool_messages.append(build_tool_message(call_id, compacted))
+    
+    return tool_messages, stats
 
 # Function to execute search queries from AnswerQuestion tool calls
 def execute_tools(state: List[BaseMessage]) -> List[BaseMessage]:
     last_ai_message: AIMessage = state[-1]
     
-    # Extract tool calls from the AI message
-    if not hasattr(last_ai_message, "tool_calls") or not last_ai_message.tool_calls:
-        return []
-    
     # Process the AnswerQuestion or ReviseAnswer tool calls to extract search queries
-    tool_messages = []
+    calls = get_search_queries(last_ai_message)
     
-    for tool_call in last_ai_message.tool_calls:
-        if tool_call["name"] in ["AnswerQuestion", "ReviseAnswer"]:
-            call_id = tool_call["id"]
-            search_queries = tool_call["args"].get("search_queries", [])
-            
-            # Execute each search query using the tavily tool
-            query_results = {}
-            for query in search_queries:
-                try:
-                    print(f"Executing search query: {query}")  # Debug logging
-                    result = tavily_tool.invoke(query)
-                    
-                    # Ensure result is JSON serializable
-                    safe_result = safe_json_serialize(result)
-                    query_results[query] = safe_result
-                    
-                except Exception as e:
-                    print(f"Search failed for query '{query}': {str(e)}")  # Debug logging
-                    query_results[query] = {
-                        "error": True,
-                        "error_type": e.__class__.__name__,
-                        "error_message": str(e)
-                    }
-            
-            try:
-                # Safely serialize the entire query_results
-                content = json.dumps(safe_json_serialize(query_results))
-            except Exception as e:
-                # Fallback if even safe serialization fails
-                print(f"Failed to serialize query results: {str(e)}")
-                content = json.dumps({
-                    "error": True,
-                    "message": "Failed to serialize search results",
-                    "queries": list(search_queries)
-                })
-            
-            # Create a tool message with the results
-            tool_messages.append(
-                ToolMessage(
-                    content=content,
-                    tool_call_id=call_id
-                )
-            )
+    # Execute each search query using the tavily tool
+    results = {}
+    for _, search_queries in calls:
+        for query in search_queries:
+            if query not in results:
+                results[query] = run_search_query(query)
+    
+    # Create tool messages with the compacted results
+    tool_messages, _ = build_tool_messages(state, calls, results)
+    return tool_messages
+
+async def aexecute_tools(state: List[BaseMessage], **limits) -> List[BaseMessage]:
+    """Async execute_tools: all queries of the last AI message run concurrently.
+    
+    limits are passed through to astream_search_queries (max_concurrency,
+    query_timeout, stage_timeout). Results keep the original query order.
+    """
+    calls = get_search_queries(state[-1])
+    queries = list(dict.fromkeys(query for _, search_queries in calls for query in search_queries))
+    
+    results = {}
+    async for _, query, result in astream_search_queries(queries, **limits):
+        results[query] = result
     
-    return tool_messages
\ No newline at end of file
+    tool_messages, _ = build_tool_messages(state, calls, results)
+    return tool_messages
@@ -0,0 +1,414 @@
+"""Streaming ingestion of uploaded case files into a condensed case text.
+
+Uploads (pleadings, contracts, email exports) are copied to disk in chunks,
+then read back one file at a time: text is extracted incrementally, split
+into paragraphs, repeated paragraphs (quoted email threads, re-sent drafts,
+letterheads) are dropped, and the most fact-dense paragraphs are kept within
+a token budget, in their original order. Only the selected paragraphs and a
+bounded window of paragraph hashes are held in memory, whatever the upload size;
+emails are parsed one message at a time, each from its first MAX_EMAIL_BYTES.
+
+    python ingest.py pleadings.pdf emails.mbox [--notes "..."] [--budget 12000]
+"""
+import argparse
+import asyncio
+import email
+import email.policy
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import uuid
+import zipfile
+from collections import OrderedDict
+from email.parser import BytesFeedParser
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+from compaction import estimate_tokens
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Uploads are staged here (one directory per request, removed after ingestion)
+CASE_UPLOAD_DIR = os.getenv("CASE_UPLOAD_DIR", "uploads")
+CASE_UPLOAD_MAX_BYTES = int(os.getenv("CASE_UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+# Tokens of condensed case text handed to the draft stage
+CASE_TOKEN_BUDGET = int(os.getenv("CASE_TOKEN_BUDGET", "12000"))
+# Paragraph hashes remembered for deduplication (repeats usually follow closely, as in email threads)
+CASE_DEDUPE_WINDOW = int(os.getenv("CASE_DEDUPE_WINDOW", "100000"))
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+READ_CHUNK_CHARS = 64 * 1024
+# Longer paragraphs are cut, so one paragraph never holds more than this
+MAX_PARAGRAPH_CHARS = 4000
+# Emails (.eml files and each mbox message) are parsed from their first MAX_EMAIL_BYTES only:
+# headers and the text body come first, the attachments beyond the limit are skipped
+MAX_EMAIL_BYTES = int(os.getenv("CASE_MAX_EMAIL_BYTES", str(5 * 1024 * 1024)))
+# The first paragraphs of a document (title, parties, recitals) are favoured
+LEAD_PARAGRAPHS = 3
+
+TEXT_EXTENSIONS = {".txt", ".md", ".csv", ".log", ".json", ".xml", ".tsv"}
+HTML_EXTENSIONS = {".html", ".htm"}
+
+# Dates, money, statutory provisions, parties and procedural facts make a paragraph worth keeping
+SIGNAL_PATTERNS = [
+    (re.compile(
+        r"\b\d{1,2}[./-]\d{1,2}[./-]\d{2,4}\b"
+        r"|\b\d{1,2}(?:st|nd|rd|th)?\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?,?\s+\d{4}\b"
+        r"|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s+\d{1,2},?\s+\d{4}\b",
+        re.IGNORECASE), 2.0),
+    (re.compile(r"(?:₹|\brs\.?|\binr\b)\s?\d[\d,]*(?:\.\d+)?|\b\d[\d,]*(?:\.\d+)?\s*(?:lakhs?|crores?)\b", re.IGNORECASE), 2.0),
+    (re.compile(
+        r"\b(?:section|sec\.|article|order|rule)\s*\d+[a-z]?\b|\b(?:BNS|BNSS|BSA|IPC|CrPC|CPC|N\.?I\.? Act)\b|\bAct,?\s+(?:of\s+)?\d{4}\b",
+        re.IGNORECASE), 2.0),
+    (re.compile(
+        r"\b(?:plaintiff|defendant|petitioner|respondent|complainant|accused|appellant|landlord|tenant|"
+        r"employer|employee|buyer|seller|lender|borrower|guarantor)s?\b", re.IGNORECASE), 1.0),
+    (re.compile(
+        r"\b(?:agreement|contract|notice|fir|complaint|judgment|decree|summons|affidavit|invoice|cheque|"
+        r"payment|breach|terminat\w*|default\w*|evidence|witness|hearing|deadline|possession|injunction)\b",
+        re.IGNORECASE), 1.0),
+]
+BOILERPLATE_PATTERN = re.compile(
+    r"unsubscribe|sent from my|confidentiality notice|this e-?mail (?:and any attachments? )?(?:is|are|may be) confidential|"
+    r"privileged and confidential|do not reply|please consider the environment|"
+    r"^on .{1,200} wrote:\s*$|-{2,}\s*original message\s*-{2,}",
+    re.IGNORECASE | re.MULTILINE
+)
+WORD = re.compile(r"\w+")
+# Blank lines, including blank quoted lines ("> >") inside replied-to emails
+PARAGRAPH_BREAK = re.compile(r"\n[ \t\r\f\v>]*\n")
+
+class UnsupportedUpload(Exception):
+    """An uploaded file whose format cannot be read"""
+
+class UploadTooLarge(Exception):
+    """The upload exceeds CASE_UPLOAD_MAX_BYTES"""
+
+async def save_upload(upload: Any, directory: str, max_bytes: int) -> Tuple[str, int]:
+    """Copy an UploadFile to directory in fixed-size chunks; returns (path, bytes written)"""
+    name = os.path.basename(upload.filename or "") or "upload.txt"
+    name = re.sub(r"[^\w.\- ]", "_", name)
+    path = os.path.join(directory, f"{uuid.uuid4().hex[:8]}-{name}")
+    written = 0
+    with open(path, "wb") as f:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes // (1024 * 1024)} MiB")
+            await asyncio.to_thread(f.write, chunk)
+    return path, written
+
+# Text extraction: each reader yields text pieces of bounded size, with blank lines between paragraphs
+
+def read_text(path: str) -> Iterator[str]:
+    with open(path, encoding="utf-8", errors="replace", newline=None) as f:
+        while True:
+            piece = f.read(READ_CHUNK_CHARS)
+            if not piece:
+                return
+            yield piece
+
+class _TextExtractor(HTMLParser):
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "table", "blockquote", "section", "article"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+    def take(self) -> str:
+        text, self.parts = "".join(self.parts), []
+        return text
+
+def html_to_text(pieces: Iterator[str]) -> Iterator[str]:
+    parser = _TextExtractor()
+    for piece in pieces:
+        parser.feed(piece)
+        yield parser.take()
+    parser.close()
+    yield parser.take()
+
+def read_docx(path: str) -> Iterator[str]:
+    namespace = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise UnsupportedUpload(f"{os.path.basename(path)} is not a valid .docx file")
+    with archive, archive.open("word/document.xml") as document:
+        for _, element in ElementTree.iterparse(document, events=("end",)):
+            if element.tag == f"{namespace}p":
+                text = "".join(node.text or "" for node in element.iter(f"{namespace}t"))
+                if text.strip():
+                    yield text + "\n\n"
+                element.clear()
+
+def read_pdf(path: str) -> Iterator[str]:
+    if PdfReader is None:
+        raise UnsupportedUpload("PDF uploads need the pypdf package (pip install pypdf)")
+    with open(path, "rb") as f:
+        for page in PdfReader(f).pages:
+            yield (page.extract_text() or "") + "\n\n"
+
+def email_text(message: email.message.Message) -> Iterator[str]:
+    """Header summary and body (plain text preferred) of one email, without attachments"""
+    headers = [f"{name}: {message[name]}" for name in ("From", "To", "Date", "Subject") if message[name]]
+    yield "\n".join(headers) + "\n\n"
+    body = message.get_body(preferencelist=("plain", "html")) if hasattr(message, "get_body") else None
+    if body is None:
+        return
+    try:
+        content = body.get_content()
+    except (KeyError, LookupError, UnicodeDecodeError):
+        content = (body.get_payload(decode=True) or b"").decode("utf-8", errors="replace")
+    if body.get_content_subtype() == "html":
+        yield from html_to_text(iter([content]))
+    else:
+        yield content
+    yield "\n\n"
+
+class _EmailPrefixParser:
+    """Feeds at most MAX_EMAIL_BYTES of one email to a feed parser, ignoring the rest"""
+
+    def __init__(self):
+        self._parser = BytesFeedParser(policy=email.policy.default)
+        self._remaining = MAX_EMAIL_BYTES
+
+    def feed(self, data: bytes):
+        if self._remaining > 0:
+            self._parser.feed(data[:self._remaining])
+            self._remaining -= len(data)
+
+    @property
+    def full(self) -> bool:
+        return self._remaining <= 0
+
+    def close(self) -> email.message.Message:
+        return self._parser.close()
+
+def read_eml(path: str) -> Iterator[str]:
+    parser = _EmailPrefixParser()
+    with open(path, "rb") as f:
+        while not parser.full:
+            chunk = f.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    yield from email_text(parser.close())
+
+def read_mbox(path: str) -> Iterator[str]:
+    """Messages split at "From " lines and parsed one at a time, each from its first MAX_EMAIL_BYTES"""
+    parser: Optional[_EmailPrefixParser] = None
+    line_start = True
+    with open(path, "rb") as f:
+        while True:
+            # Bounded reads: a line without newlines (e.g. an inline attachment) never has to fit in memory
+            line = f.readline(UPLOAD_CHUNK_BYTES)
+            if not line:
+                break
+            if line_start and line.startswith(b"From "):
+                if parser is not None:
+                    yield from email_text(parser.close())
+                parser = _EmailPrefixParser()
+            else:
+                if parser is None:
+                    parser = _EmailPrefixParser()
+                parser.feed(line)
+            line_start = line.endswith(b"\n")
+    if parser is not None:
+        yield from email_text(parser.close())
+
+def extract_text(path: str) -> Iterator[str]:
+    """Text pieces of an uploaded file, chosen by extension (content-sniffed when unknown)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in HTML_EXTENSIONS:
+        return html_to_text(read_text(path))
+    if extension == ".docx":
+        return read_docx(path)
+    if extension == ".pdf":
+        return read_pdf(path)
+    if extension == ".eml":
+        return read_eml(path)
+    if extension == ".mbox":
+        return read_mbox(path)
+    if extension not in TEXT_EXTENSIONS:
+        with open(path, "rb") as f:
+            head = f.read(8192)
+        if b"\x00" in head:
+            raise UnsupportedUpload(f"Unsupported file type: {os.path.basename(path)}")
+    return read_text(path)
+
+def split_paragraphs(pieces: Iterator[str]) -> Iterator[str]:
+    """Paragraphs (blank-line separated, at most MAX_PARAGRAPH_CHARS) from a stream of text pieces"""
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        parts = PARAGRAPH_BREAK.split(buffer)
+        buffer = parts.pop()
+        for part in parts:
+            yield from _cut(part)
+        while len(buffer) > MAX_PARAGRAPH_CHARS:
+            cut = max(buffer.rfind("\n", 0, MAX_PARAGRAPH_CHARS), buffer.rfind(" ", 0, MAX_PARAGRAPH_CHARS))
+            cut = cut if cut > 0 else MAX_PARAGRAPH_CHARS
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+    yield from _cut(buffer)
+
+def _cut(paragraph: str) -> Iterator[str]:
+    paragraph = paragraph.strip()
+    while len(paragraph) > MAX_PARAGRAPH_CHARS:
+        cut = paragraph.rfind(" ", 0, MAX_PARAGRAPH_CHARS)
+        cut = cut if cut > 0 else MAX_PARAGRAPH_CHARS
+        yield paragraph[:cut].strip()
+        paragraph = paragraph[cut:].strip()
+    if paragraph:
+        yield paragraph
+
+def paragraph_key(paragraph: str) -> bytes:
+    """Hash of a paragraph ignoring quote markers ("> "), case, punctuation and spacing"""
+    # Only the words are hashed, so quote markers drop out without stripping them first
+    words = WORD.findall(paragraph.lower())
+    return hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).digest()
+
+def salience(paragraph: str, tokens: int, position: int) -> float:
+    """How much case substance a paragraph carries per token"""
+    signals = sum(weight * len(pattern.findall(paragraph)) for pattern, weight in SIGNAL_PATTERNS)
+    score = (signals + 0.5) / math.sqrt(max(tokens, 1))
+    if position < LEAD_PARAGRAPHS:
+        score += 1.0
+    if BOILERPLATE_PATTERN.search(paragraph):
+        score *= 0.1
+    return score
+
+class CaseCondenser:
+    """Keeps the highest-scoring unique paragraphs within a token budget while files are streamed through it"""
+
+    def __init__(self, token_budget: int, dedupe_window: int = CASE_DEDUPE_WINDOW):
+        self.token_budget = max(1, token_budget)
+        self.dedupe_window = dedupe_window
+        self._seen: "OrderedDict[bytes, None]" = OrderedDict()
+        # Min-heap of (score, sequence, source, paragraph, tokens): the weakest paragraph is dropped first
+        self._kept: List[Tuple[float, int, str, str, int]] = []
+        self._kept_tokens = 0
+        self._sequence = 0
+        self.files: List[Dict[str, Any]] = []
+
+    def _is_duplicate(self, paragraph: str) -> bool:
+        key = paragraph_key(paragraph)
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return True
+        self._seen[key] = None
+        if len(self._seen) > self.dedupe_window:
+            self._seen.popitem(last=False)
+        return False
+
+    def add_file(self, source: str, pieces: Iterator[str], size: int = 0):
+        stats = {"name": source, "bytes": size, "paragraphs": 0, "duplicates": 0, "tokens": 0}
+        for position, paragraph in enumerate(split_paragraphs(pieces)):
+            stats["paragraphs"] += 1
+            if self._is_duplicate(paragraph):
+                stats["duplicates"] += 1
+                continue
+            tokens = estimate_tokens(paragraph)
+            stats["tokens"] += tokens
+            self._sequence += 1
+            heapq.heappush(self._kept, (salience(paragraph, tokens, position), self._sequence, source, paragraph, tokens))
+            self._kept_tokens += tokens
+            while self._kept_tokens > self.token_budget and self._kept:
+                self._kept_tokens -= heapq.heappop(self._kept)[4]
+        self.files.append(stats)
+
+    def result(self, notes: str = "") -> Dict[str, Any]:
+        """Condensed case text (notes first, then kept paragraphs per file in order, gaps marked) and stats"""
+        sections = [notes.strip()] if notes.strip() else []
+        previous_source, previous_sequence = None, None
+        for _, sequence, source, paragraph, _ in sorted(self._kept, key=lambda item: item[1]):
+            if source != previous_source:
+                sections.append(f"--- {source} ---")
+            elif sequence != previous_sequence + 1:
+                sections.append("[...]")
+            sections.append(paragraph)
+            previous_source, previous_sequence = source, sequence
+        tokens_unique = sum(file["tokens"] for file in self.files)
+        return {
+            "case_details": "\n\n".join(sections),
+            "stats": {
+                "files": self.files,
+                "paragraphs": sum(file["paragraphs"] for file in self.files),
+                "duplicates": sum(file["duplicates"] for file in self.files),
+                "tokens_unique": tokens_unique,
+                "tokens_kept": self._kept_tokens,
+                "paragraphs_kept": len(self._kept),
+                "token_budget": self.token_budget,
+            },
+        }
+
+def condense_files(files: List[Tuple[str, str, int]], notes: str = "", token_budget: Optional[int] = None) -> Dict[str, Any]:
+    """Condense (display name, path, size) files into case text; notes are always kept in full"""
+    token_budget = CASE_TOKEN_BUDGET if token_budget is None else token_budget
+    # The typed notes count against the budget, but the files always get a share of it
+    file_budget = max(token_budget - estimate_tokens(notes), token_budget // 4)
+    condenser = CaseCondenser(file_budget)
+    for name, path, size in files:
+        condenser.add_file(name, extract_text(path), size)
+    return condenser.result(notes)
+
+async def ingest_uploads(uploads: List[Any], notes: str = "", token_budget: Optional[int] = None) -> Dict[str, Any]:
+    """Stage UploadFiles on disk, then condense them off the event loop; the staged copies are removed"""
+    directory = os.path.join(CASE_UPLOAD_DIR, uuid.uuid4().hex)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        files = []
+        remaining = CASE_UPLOAD_MAX_BYTES
+        for upload in uploads:
+            path, size = await save_upload(upload, directory, remaining)
+            remaining -= size
+            files.append((os.path.basename(upload.filename or "") or os.path.basename(path), path, size))
+        return await asyncio.to_thread(condense_files, files, notes, token_budget)
+    finally:
+        await asyncio.to_thread(shutil.rmtree, directory, True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Condense case files into case text for the directive pipeline")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--notes", default="", help="case summary typed by the user, always kept")
+    parser.add_argument("--budget", type=int, default=CASE_TOKEN_BUDGET, help="token budget of the condensed text")
+    args = parser.parse_args()
+
+    files = [(os.path.basename(path), path, os.path.getsize(path)) for path in args.files]
+    result = condense_files(files, args.notes, args.budget)
+    print(result["case_details"])
+    print(json.dumps(result["stats"], indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
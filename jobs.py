@@ -0,0 +1,162 @@
+import asyncio
+import sqlite3
+import time
+import uuid
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+
+class JobStore:
+    """Background pipeline jobs with an append-only, per-job event log in SQLite.
+
+    A job consumes its event stream in its own task, independent of any HTTP
+    connection. Every event gets a sequence number (1, 2, ...) so readers can
+    resume after the last one they saw. Readers in other processes sharing the
+    database poll for new events; readers in the owning process are woken up.
+    """
+
+    def __init__(self, path: str, ttl: float, poll_interval: float = 1.0):
+        self.path = path
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._updated: Dict[str, asyncio.Event] = {}
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "job_id TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (job_id, seq))"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _create(self, job_id: str):
+        now = time.time()
+        conn = self._connect()
+        try:
+            # Expired jobs and their logs are removed as new jobs arrive
+            expired = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE updated_at < ?", (now - self.ttl,))]
+            conn.executemany("DELETE FROM job_events WHERE job_id = ?", [(old,) for old in expired])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(old,) for old in expired])
+            conn.execute("INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, 'running', ?, ?)", (job_id, now, now))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _append(self, job_id: str, seq: int, data: str):
+        conn = self._connect()
+        try:
+            conn.execute("INSERT INTO job_events (job_id, seq, data) VALUES (?, ?, ?)", (job_id, seq, data))
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _set_status(self, job_id: str, status: str):
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _read(self, job_id: str, after: int, limit: int = 500) -> List[Tuple[int, str]]:
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT seq, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (job_id, after, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status and number of logged events, or None for an unknown id"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT status, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            events = conn.execute("SELECT COUNT(*) FROM job_events WHERE job_id = ?", (job_id,)).fetchone()[0]
+        finally:
+            conn.close()
+        return {"job_id": job_id, "status": row[0], "created_at": row[1], "updated_at": row[2], "events": events}
+
+    async def create(self, source: AsyncIterator[str]) -> str:
+        """Start consuming source as a new background job and return its id"""
+        job_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._create, job_id)
+        self._updated[job_id] = asyncio.Event()
+        self._tasks[job_id] = asyncio.create_task(self._pump(job_id, source))
+        return job_id
+
+    def _notify(self, job_id: str):
+        updated = self._updated.get(job_id)
+        if updated is not None:
+            updated.set()
+            self._updated[job_id] = asyncio.Event()
+
+    async def _pump(self, job_id: str, source: AsyncIterator[str]):
+        status = "failed"
+        try:
+            seq = 0
+            async for data in source:
+                seq += 1
+                await asyncio.to_thread(self._append, job_id, seq, data)
+                self._notify(job_id)
+            status = "completed"
+        except asyncio.CancelledError:
+            status = "cancelled"
+            raise
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+        finally:
+            await asyncio.shield(asyncio.to_thread(self._set_status, job_id, status))
+            self._tasks.pop(job_id, None)
+            self._notify(job_id)
+            self._updated.pop(job_id, None)
+
+    def cancel(self, job_id: str) -> bool:
+        task = self._tasks.get(job_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    async def events(self, job_id: str, after: int = 0) -> AsyncGenerator[Tuple[int, str], None]:
+        """Yield (seq, data) for every event after seq `after`, following the job until it ends"""
+        while True:
+            # Grab the waiter before reading so an append in between is not missed
+            updated = self._updated.get(job_id)
+            rows = await asyncio.to_thread(self._read, job_id, after)
+            for seq, data in rows:
+                yield seq, data
+                after = seq
+            if rows:
+                continue
+
+            job = await asyncio.to_thread(self.get, job_id)
+            if job is None:
+                return
+            if job["status"] != "running":
+                # The job may have logged its last events after the read above
+                for seq, data in await asyncio.to_thread(self._read, job_id, after, -1):
+                    yield seq, data
+                return
+            if updated is None:
+                # Running in another process: poll the shared log
+                await asyncio.sleep(self.poll_interval)
+            else:
+                try:
+                    await asyncio.wait_for(updated.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
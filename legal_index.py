@@ -0,0 +1,318 @@
+"""Local full-text index of statute sections and fetched judgments (SQLite FTS5, BM25).
+
+Ingest statutes from the repository root:
+
+    python legal_index.py ingest statutes/bsa_2023.txt --act "Bharatiya Sakshya Adhiniyam, 2023" \
+        --url https://www.indiacode.nic.in/
+    python legal_index.py ingest statutes/sections.jsonl
+    python legal_index.py search "electronic record certificate"
+    python legal_index.py stats
+
+Plain-text files are split into sections at lines starting with "63." or
+"Section 63B."; JSONL files hold one {"act", "section", "title", "text", "url"}
+object per line. Re-ingesting only rewrites sections whose text changed.
+Sections without a URL are indexed but never cited in place of Tavily, so
+pass --url for plain-text statutes.
+
+A query is answered locally only when a section matches the act and section
+number it names ("BSA section 63", "Section 63 of the Bharatiya Sakshya
+Adhiniyam"), or when enough sections contain most of the query's terms.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import math
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from cache import normalize_query
+from compaction import STOPWORDS
+
+# Share of the query's terms a section must contain to count as relevant
+LOCAL_INDEX_MIN_COVERAGE = float(os.getenv("LOCAL_INDEX_MIN_COVERAGE", "0.75"))
+# Relevant hits must also score at least this fraction of the best one
+LOCAL_INDEX_RELATIVE_SCORE = float(os.getenv("LOCAL_INDEX_RELATIVE_SCORE", "0.5"))
+# Without an act + section match, Tavily is skipped only when this many hits are relevant
+LOCAL_INDEX_MIN_HITS = int(os.getenv("LOCAL_INDEX_MIN_HITS", "2"))
+# Index pages returned by Tavily (kind "search_result") so repeat lookups can stay local
+LOCAL_INDEX_AUTO_ADD = os.getenv("LOCAL_INDEX_AUTO_ADD", "0") == "1"
+
+SECTION_HEADING = re.compile(r"^\s*(?:Section\s+)?(\d+[A-Z]{0,3})\.\s+(.*)$")
+# Section/article numbers named in a normalized query: "section 63b", "s 63", "u s 63", "article 21"
+QUERY_SECTION = re.compile(r"\b(?:section|article|s)\s+(\d+[a-z]{0,3})\b")
+# Words left out of act acronyms ("Code of Civil Procedure" -> "ccp")
+ACT_FILLER = {"the", "of", "and", "for", "in", "on", "to"}
+
+def act_matches(act: str, tokens: Set[str]) -> bool:
+    """Whether the query tokens name the act, in full or by its acronym ("BSA", "CPA", "MV Act")"""
+    words = [word for word in normalize_query(act).split() if not word.isdigit() and word not in ACT_FILLER]
+    if not words:
+        return False
+    acronyms = {"".join(word[0] for word in words)}
+    if words[-1] == "act" and len(words) > 1:
+        acronyms.add("".join(word[0] for word in words[:-1]))
+    if acronyms & tokens:
+        return True
+    significant = [word for word in words if word not in ("act", "code")]
+    return bool(significant) and sum(word in tokens for word in significant) >= math.ceil(len(significant) / 2)
+
+class LegalIndex:
+    """Section-level FTS5 index over statutes and previously fetched judgments"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.enabled = bool(path)
+        self.hits = 0
+        self.misses = 0
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "doc_id TEXT PRIMARY KEY, kind TEXT NOT NULL, content_hash TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5("
+                "act, section, title, text, url UNINDEXED, doc_id UNINDEXED, "
+                "tokenize = 'porter unicode61')"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def upsert(self, documents: Iterable[Dict[str, Any]], kind: str = "statute") -> Dict[str, int]:
+        """Add or update documents; unchanged ones (same text hash) are skipped"""
+        counts = {"added": 0, "updated": 0, "unchanged": 0}
+        conn = self._connect()
+        try:
+            for doc in documents:
+                text = doc.get("text", "")
+                doc_id = doc.get("doc_id") or f"{doc.get('act', '')}|{doc.get('section', '')}"
+                content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+                row = conn.execute("SELECT content_hash FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+                if row is not None and row[0] == content_hash:
+                    counts["unchanged"] += 1
+                    continue
+
+                conn.execute("DELETE FROM sections WHERE doc_id = ?", (doc_id,))
+                conn.execute(
+                    "INSERT INTO sections (act, section, title, text, url, doc_id) VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc.get("act", ""), doc.get("section", ""), doc.get("title", ""), text, doc.get("url", ""), doc_id)
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (doc_id, kind, content_hash, updated_at) VALUES (?, ?, ?, ?)",
+                    (doc_id, kind, content_hash, time.time())
+                )
+                counts["updated" if row is not None else "added"] += 1
+            conn.commit()
+        finally:
+            conn.close()
+        return counts
+
+    def add_search_results(self, result: Any) -> Dict[str, int]:
+        """Index the pages of a Tavily result (opt-in via LOCAL_INDEX_AUTO_ADD)"""
+        if not (self.enabled and LOCAL_INDEX_AUTO_ADD) or not isinstance(result, dict) or "error" in result:
+            return {}
+        documents = [
+            {
+                "doc_id": item["url"],
+                "title": item.get("title", ""),
+                "text": item.get("raw_content") or item.get("content") or "",
+                "url": item["url"],
+            }
+            for item in result.get("results", []) or []
+            if isinstance(item, dict) and item.get("url") and (item.get("raw_content") or item.get("content"))
+        ]
+        try:
+            return self.upsert(documents, kind="search_result")
+        except sqlite3.Error as e:
+            print(f"Local index update failed: {str(e)}")
+            return {}
+
+    def search(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """BM25-ranked hits for the query terms (any term may match).
+
+        Each hit also reports "matched", how many of the distinct query terms
+        its section contains.
+        """
+        if not self.enabled:
+            return []
+        terms = list(dict.fromkeys(normalize_query(query).split()))
+        if not terms:
+            return []
+        quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    "SELECT rowid, act, section, title, url, text, snippet(sections, 3, '', '', ' ... ', 48), "
+                    "-bm25(sections, 2.0, 4.0, 3.0, 1.0) AS score "
+                    "FROM sections WHERE sections MATCH ? ORDER BY score DESC LIMIT ?",
+                    (" OR ".join(quoted), limit)
+                ).fetchall()
+                matched = dict.fromkeys((row[0] for row in rows), 0)
+                placeholders = ", ".join("?" * len(matched))
+                for term in quoted:
+                    for (rowid,) in conn.execute(
+                        f"SELECT rowid FROM sections WHERE sections MATCH ? AND rowid IN ({placeholders})",
+                        (term, *matched)
+                    ):
+                        matched[rowid] += 1
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Local index search failed: {str(e)}")
+            return []
+
+        return [
+            {
+                "act": act, "section": section, "title": title, "url": url, "text": text,
+                "snippet": snippet, "score": score, "matched": matched[rowid],
+            }
+            for rowid, act, section, title, url, text, snippet, score in rows
+        ]
+
+    def relevant_hits(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Hits that answer the query: the act and section it names, or most of its terms.
+
+        Exact act + section matches come first and are marked "exact". Hits
+        without a URL are dropped, since they cannot be cited.
+        """
+        normalized = normalize_query(query)
+        tokens = set(normalized.split())
+        terms = [term for term in tokens if term not in STOPWORDS]
+        sections = set(QUERY_SECTION.findall(normalized))
+
+        hits = []
+        for hit in self.search(query, limit):
+            if not hit["url"]:
+                continue
+            hit["exact"] = bool(hit["section"]) and hit["section"].lower() in sections and act_matches(hit["act"], tokens)
+            coverage = hit["matched"] / len(terms) if terms else 0.0
+            if hit["exact"] or coverage >= LOCAL_INDEX_MIN_COVERAGE:
+                hits.append(hit)
+        if not hits:
+            return []
+
+        best = max(hit["score"] for hit in hits)
+        hits = [hit for hit in hits if hit["exact"] or hit["score"] >= LOCAL_INDEX_RELATIVE_SCORE * best]
+        return sorted(hits, key=lambda hit: (not hit["exact"], -hit["score"]))
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """A Tavily-shaped result built from local hits, or None if they are not relevant enough"""
+        hits = self.relevant_hits(query)
+        if not any(hit["exact"] for hit in hits) and len(hits) < LOCAL_INDEX_MIN_HITS:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {
+            "query": query,
+            "answer": None,
+            "source": "local_index",
+            "results": [
+                {
+                    "url": hit["url"],
+                    "title": " ".join(part for part in (hit["act"], f"Section {hit['section']}" if hit["section"] else "", hit["title"]) if part),
+                    "content": hit["snippet"],
+                    "raw_content": hit["text"],
+                    "score": round(hit["score"], 3),
+                }
+                for hit in hits
+            ],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        conn = self._connect()
+        try:
+            kinds = dict(conn.execute("SELECT kind, COUNT(*) FROM documents GROUP BY kind").fetchall())
+        finally:
+            conn.close()
+        return {"enabled": True, "path": self.path, "documents": kinds, "hits": self.hits, "misses": self.misses}
+
+def parse_statute_text(text: str, act: str, url: str = "") -> Iterator[Dict[str, Any]]:
+    """Split a plain-text statute into sections at numbered headings"""
+    current: Optional[Dict[str, Any]] = None
+    lines: List[str] = []
+    for line in text.splitlines():
+        heading = SECTION_HEADING.match(line)
+        if heading:
+            if current is not None:
+                current["text"] = "\n".join(lines).strip()
+                yield current
+            number, rest = heading.groups()
+            title = re.split(r"\.?\s*[—–]|\.-", rest, maxsplit=1)[0].strip().rstrip(".")
+            current = {"act": act, "section": number, "title": title, "url": url}
+            lines = [line]
+        elif current is not None:
+            lines.append(line)
+    if current is not None:
+        current["text"] = "\n".join(lines).strip()
+        yield current
+
+def iter_documents(path: str, act: Optional[str] = None, url: str = "") -> Iterator[Dict[str, Any]]:
+    """Sections from a .jsonl or plain-text file, or from every such file under a directory.
+
+    url is used for plain-text sections and for JSONL records that have none.
+    """
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith((".jsonl", ".txt")):
+                    yield from iter_documents(os.path.join(root, name), act, url)
+        return
+
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    doc = json.loads(line)
+                    if url and not doc.get("url"):
+                        doc["url"] = url
+                    yield doc
+        else:
+            name = act or os.path.splitext(os.path.basename(path))[0].replace("_", " ")
+            yield from parse_statute_text(f.read(), name, url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local legal full-text index")
+    parser.add_argument("--index", default=os.getenv("LOCAL_INDEX_PATH", "legal_index.sqlite3"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Add or update statute sections / judgments")
+    ingest.add_argument("paths", nargs="+")
+    ingest.add_argument("--act", help="Act name for plain-text files (defaults to the file name)")
+    ingest.add_argument("--url", default="", help="Source URL cited for sections that have none (e.g. the India Code page)")
+    ingest.add_argument("--kind", default="statute", choices=["statute", "judgment"])
+
+    search = commands.add_parser("search", help="Query the index (all BM25 hits, not just relevant ones)")
+    search.add_argument("query")
+
+    commands.add_parser("stats", help="Show document counts")
+
+    args = parser.parse_args()
+    index = LegalIndex(args.index)
+
+    if args.command == "ingest":
+        for path in args.paths:
+            print(path, index.upsert(iter_documents(path, args.act, args.url), kind=args.kind))
+    elif args.command == "search":
+        for hit in index.search(args.query):
+            print(f"{hit['score']:.2f}  {hit['act']} s.{hit['section']} {hit['title']}  {hit['url']}")
+            print(f"      {hit['snippet']}")
+    else:
+        print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,96 @@
 import asyncio
-import json
-from typing import AsyncGenerator, Dict, Any, List
-from fastapi import FastAPI, HTTPException
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Dict, Any, List, Literal, Optional
+from fastapi import FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from langchain_core.messages import HumanMessage, BaseMessage, ToolMessage, AIMessage
 from dotenv import load_dotenv
 import os
 
 # Import your existing modules
-from chains import first_responder_chain, revisor_chain, validator, pydantic_parser
-from execute_tools import execute_tools, tavily_tool
-from reflexion_graph import app as langgraph_app
-from schema import AnswerQuestion, ReviseAnswer
+from checkpoints import CheckpointStore
+from chains import SECTION_GROUPS, STAGE_MODELS, is_routed, valid_tool_call, get_case_analysis_chain, get_critique_chain, get_first_responder_chain, get_revisor_chain, get_section_chain, validator, pydantic_parser
+from batch import BATCH_DIR, BATCH_MAX_CONCURRENCY, BATCH_RATE_PER_MINUTE, BatchLimits, completed_ids, read_cases, run_batch
+from conversation_state import budget_messages
+from convergence import stop_reason, tokens_used
+from directive_cache import directive_cache, directive_cache_key
+from encoder import dumps
+from jobs import JobStore
+from metrics import PIPELINE_RUNS, observe_ingest, observe_llm_call, observe_stage, render as render_metrics, start_trace
+from scheduler import PipelineScheduler, QueueFull, Ticket
+from single_flight import SharedRun, SingleFlight
+from sse import SSE_STREAM_MODE, SSEEvent, accepts_gzip, gzip_stream, lean_events
+from tool_stream import ToolArgsStream
+from ingest import CASE_UPLOAD_MAX_BYTES, UnsupportedUpload, UploadTooLarge, ingest_uploads
+from execute_tools import SPECULATIVE_SEARCH, SpeculativeSearch, get_search_queries, astream_search_queries, build_tool_messages, search_cache, search_cache_key, local_index, get_tavily_tool, close_tavily_tool
+from rate_limits import limiter_stats
+from schema import AnswerQuestion, DraftCritique, ReviseAnswer
 
 load_dotenv()
 
-# Validate required environment variables
-if not os.getenv("GOOGLE_API_KEY"):
-    raise ValueError("GOOGLE_API_KEY is required in .env file")
-if not os.getenv("TAVILY_API_KEY"):
-    raise ValueError("TAVILY_API_KEY is required in .env file")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Validate configuration and build the LLM/search clients once the worker starts"""
+    # Validate required environment variables
+    if not os.getenv("GOOGLE_API_KEY"):
+        raise ValueError("GOOGLE_API_KEY is required in .env file")
+    if not os.getenv("TAVILY_API_KEY"):
+        raise ValueError("TAVILY_API_KEY is required in .env file")
+    
+    get_first_responder_chain()
+    get_revisor_chain("revision")
+    get_revisor_chain()
+    get_tavily_tool()
+    yield
+    await close_tavily_tool()
+
+# Room for multipart boundaries, part headers and form fields on top of CASE_UPLOAD_MAX_BYTES
+UPLOAD_FORM_OVERHEAD_BYTES = 1024 * 1024
+UPLOAD_PATHS = ("/ingest_case", "/generate_directive/upload")
+
+class UploadSizeLimit:
+    """Rejects oversized case-file uploads with 413 before Starlette parses (and spools) the multipart body.
+
+    A declared Content-Length is checked up front; chunked bodies are counted
+    as they arrive. ingest_uploads still enforces the exact per-file limit.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+        detail = f"Upload exceeds {CASE_UPLOAD_MAX_BYTES // (1024 * 1024)} MiB"
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Re-raised by FastAPI's body parsing, so the client gets a 413
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
 
-app = FastAPI(title="Legal Advisor AI", description="AI Legal Strategos with Streaming")
+app = FastAPI(title="Legal Advisor AI", description="AI Legal Strategos with Streaming", lifespan=lifespan)
+
+# Added before CORS so that its 413 responses carry the CORS headers too
+app.add_middleware(UploadSizeLimit, max_bytes=CASE_UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD_BYTES)
 
 # Add CORS middleware
 app.add_middleware(
@@ -34,210 +101,594 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Identical directive requests in flight share one pipeline run
+single_flight = SingleFlight()
+
+# At most PIPELINE_MAX_CONCURRENT runs at once; further runs wait in a bounded queue
+scheduler = PipelineScheduler(
+    max_concurrent=int(os.getenv("PIPELINE_MAX_CONCURRENT", "4")),
+    max_queue=int(os.getenv("PIPELINE_MAX_QUEUE", "16"))
+)
+
+# Concurrent batch requests share one set of ceilings instead of each getting their own
+batch_limits = BatchLimits(BATCH_MAX_CONCURRENCY, BATCH_RATE_PER_MINUTE)
+
+# Detached runs: the pipeline keeps going when the client disconnects and
+# every event is logged so clients can resume with Last-Event-ID
+job_store = JobStore(
+    path=os.getenv("JOBS_DB_PATH", "jobs.sqlite3"),
+    ttl=float(os.getenv("JOBS_TTL", str(24 * 3600)))
+)
+
+# Pipeline state after every completed node, so failed runs can be resumed by run id
+checkpoint_store = CheckpointStore(
+    path=os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite3"),
+    ttl=float(os.getenv("CHECKPOINT_TTL", str(24 * 3600)))
+)
+# Run ids executing in this worker
+running_runs = set()
+
+# Stop reasons after which an intermediate (lighter model) answer is redone on the final model;
+# budget stops keep it, since another call would overrun the budget
+FINAL_PASS_STOPS = ("critique_empty", "no_search_queries", "queries_repeated", "answer_converged")
+
+# "single": the draft is one tool call; "sections": case analysis, directive parts in parallel, then a critique.
+# "sections" stays opt-in: with the fake LLM (python -m benchmarks.draft_modes) it took 1.46x the latency,
+# 2.3x the time to first token and 2.57x the tokens of "single". It was faster (0.86x) only at 0.1s per chunk.
+DRAFT_MODE = os.getenv("DRAFT_MODE", "single")
+# Critique calls per sectioned draft before it is redone as a single call
+DRAFT_CRITIQUE_ATTEMPTS = int(os.getenv("DRAFT_CRITIQUE_ATTEMPTS", "2"))
+
 class GenerateDirectiveRequest(BaseModel):
     case_details: str
+    use_cache: bool = True
+    # Seconds between replayed events on a cache hit (0 replays instantly)
+    replay_delay: float = 0.0
+    # Include the run's "trace" event (per-stage timings, tokens, search sources)
+    trace: bool = False
+    # "lean": coalesced deltas and search summaries (full payloads via /search_results); "full": everything
+    stream_mode: Literal["lean", "full"] = SSE_STREAM_MODE
+    draft_mode: Literal["single", "sections"] = DRAFT_MODE
 
-class SSEEvent:
-    def __init__(self, event_type: str, data: Any):
-        self.event_type = event_type
-        self.data = data
+def tool_answer(ai_message: AIMessage) -> str:
+    """The answer argument of the message's tool call (events never carry whole messages)"""
+    tool_calls = getattr(ai_message, "tool_calls", None) or []
+    return tool_calls[0]["args"].get("answer", "") if tool_calls else ""
+
+def reflection_event(field: str, value: Any) -> SSEEvent:
+    """SSE event for a completed reflection or search_queries tool argument"""
+    if field == "reflection":
+        reflection = value if isinstance(value, dict) else {}
+        return SSEEvent("reflection", {
+            "missing": reflection.get("missing", ""),
+            "superfluous": reflection.get("superfluous", "")
+        })
+    return SSEEvent("search_queries", {"queries": value or []})
+
+async def stream_tool_call_response(
+    chain,
+    messages: List[BaseMessage],
+    stage: str,
+    responses: List[BaseMessage],
+    speculation: Optional[SpeculativeSearch] = None,
+    model_stage: Optional[str] = None,
+) -> AsyncGenerator[SSEEvent, None]:
+    """Stream a tool-bound chain, forwarding the answer as it is generated.
+    
+    The chains force a tool call, so the answer arrives inside the tool-call
+    argument JSON rather than in message content. The argument fragments are
+    parsed incrementally: `answer` is streamed as {stage}_chunk deltas and
+    reflection/search_queries are emitted as soon as each field is complete.
+    Ends with {stage}_complete, which reports time to the first visible token
+    next to the total duration (the wait before anything was visible when only
+    message content was forwarded). The complete AI message is appended to responses.
+    With speculation, each search query is launched as soon as it is complete in
+    the arguments, while the rest of the call is still streaming. Timings and
+    tokens are recorded under model_stage (the STAGE_MODELS entry used, default stage).
+    """
+    model_stage = model_stage or stage
+    model = STAGE_MODELS.get(model_stage, {}).get("model", "")
+    started = time.monotonic()
+    first_token_at = None
+    parsers: Dict[int, ToolArgsStream] = {}
+    emitted = set()
+    full_response = None
+    
+    async for chunk in chain.astream(messages):
+        full_response = chunk if full_response is None else full_response + chunk
+        
+        if hasattr(chunk, 'content') and chunk.content:
+            first_token_at = first_token_at or time.monotonic()
+            yield SSEEvent(f"{stage}_chunk", {"content": chunk.content})
+        
+        for tool_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+            parser = parsers.setdefault(tool_chunk.get("index") or 0, ToolArgsStream(item_fields=("search_queries",)))
+            for kind, field, value in parser.feed(tool_chunk.get("args") or ""):
+                if kind == "delta":
+                    first_token_at = first_token_at or time.monotonic()
+                    yield SSEEvent(f"{stage}_chunk", {"content": value})
+                elif kind == "item":
+                    if speculation is not None and speculation.start(value):
+                        yield SSEEvent("search_prefetch", {"query": value})
+                elif field in ("reflection", "search_queries") and field not in emitted:
+                    emitted.add(field)
+                    yield reflection_event(field, value)
     
-    def format(self) -> str:
-        """Format as Server-Sent Event"""
-        data_str = json.dumps(self.data) if isinstance(self.data, (dict, list)) else str(self.data)
-        return f"event: {self.event_type}\ndata: {data_str}\n\n"
+    if full_response is None or not getattr(full_response, "tool_calls", None):
+        return
+    
+    responses.append(full_response)
+    args = full_response.tool_calls[0]["args"]
+    
+    # Anything the incremental parser could not surface comes from the final message
+    for field in ("reflection", "search_queries"):
+        if field not in emitted:
+            yield reflection_event(field, args.get(field))
+    
+    finished = time.monotonic()
+    observe_stage(model_stage, finished - started, model=model)
+    observe_llm_call(model_stage, full_response, first_token_at - started if first_token_at else None, model)
+    payload = {
+        "answer": args.get("answer", ""),
+        "time_to_first_token_ms": round(((first_token_at or finished) - started) * 1000),
+        "duration_ms": round((finished - started) * 1000),
+        "model": model
+    }
+    if "references" in args:
+        payload["references"] = args.get("references", [])
+    yield SSEEvent(f"{stage}_complete", payload)
 
-async def stream_draft_response(chain, human_message: HumanMessage) -> AsyncGenerator[SSEEvent, None]:
-    """Stream the initial draft response"""
+async def stream_draft_response(
+    chain,
+    human_message: HumanMessage,
+    responses: List[BaseMessage],
+    speculation: Optional[SpeculativeSearch] = None,
+    model_stage: str = "draft",
+) -> AsyncGenerator[SSEEvent, None]:
+    """Stream the initial draft response, appending the complete AI message to responses"""
     try:
         # Check if LLM supports streaming
         if hasattr(chain.last, 'astream'):
-            # Stream the response in chunks
-            full_response = None
-            async for chunk in chain.astream([human_message]):
-                if hasattr(chunk, 'content') and chunk.content:
-                    yield SSEEvent("draft_chunk", {"content": chunk.content})
-                full_response = chunk
-            
-            # Yield the complete response for tool extraction
-            if full_response:
-                yield SSEEvent("draft_complete", {"response": full_response})
+            async for event in stream_tool_call_response(chain, [human_message], "draft", responses, speculation, model_stage):
+                yield event
         else:
             # Fallback: invoke normally and yield full response
             response = await asyncio.get_event_loop().run_in_executor(
                 None, lambda: chain.invoke([human_message])
             )
-            yield SSEEvent("draft", {"response": response})
+            responses.append(response)
+            yield SSEEvent("draft", {"answer": tool_answer(response)})
+            async for event in extract_and_stream_reflection(response):
+                yield event
+    except Exception as e:
+        yield SSEEvent("error", {"message": f"Draft generation failed: {str(e)}"})
+
+def content_text(content: Any) -> str:
+    """Text of a message's content, which some providers return as a list of parts"""
+    if isinstance(content, str):
+        return content
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in content or [] if isinstance(part, (str, dict)))
+
+async def stream_sectioned_draft(human_message: HumanMessage, responses: List[BaseMessage]) -> AsyncGenerator[SSEEvent, None]:
+    """Draft written as a shared case analysis, the directive's parts in parallel, then one critique.
+    
+    The parts are generated concurrently but streamed in directive order as
+    draft_chunk deltas: the earliest unfinished part is forwarded live and later
+    parts are buffered until it completes. The parts and the critique are merged
+    into one AnswerQuestion tool call carrying the summed token usage of every
+    call, so the search and revision stages work exactly as after a single-call draft.
+    A critique that is not a valid DraftCritique call is retried; if none is, the
+    draft is redone by stream_routed_draft.
+    """
+    started = time.monotonic()
+    first_token_at = None
+    calls = []
+    tasks = []
+    try:
+        yield SSEEvent("draft_section", {"section": "analysis", "status": "started"})
+        analysis = await get_case_analysis_chain().ainvoke({"messages": [human_message]})
+        calls.append(analysis)
+        observe_llm_call("draft_analysis", analysis, model=STAGE_MODELS["critique"]["model"])
+        yield SSEEvent("draft_section", {
+            "section": "analysis",
+            "status": "completed",
+            "duration_ms": round((time.monotonic() - started) * 1000)
+        })
+        
+        # (index, text) deltas from the section calls; (index, None) when one finishes
+        queue: asyncio.Queue = asyncio.Queue()
+        durations: Dict[int, float] = {}
+        
+        async def write_section(index: int, name: str):
+            section_started = time.monotonic()
+            section_first_token = None
+            full_response = None
+            inputs = {"messages": [human_message], "analysis": content_text(analysis.content)}
+            async for chunk in get_section_chain(name).astream(inputs):
+                full_response = chunk if full_response is None else full_response + chunk
+                text = content_text(chunk.content)
+                if text:
+                    section_first_token = section_first_token or time.monotonic()
+                    queue.put_nowait((index, text))
+            durations[index] = time.monotonic() - section_started
+            observe_llm_call(
+                "draft_section", full_response, section_first_token - section_started if section_first_token else None, STAGE_MODELS["draft"]["model"]
+            )
+            return full_response
+        
+        for index, (name, _) in enumerate(SECTION_GROUPS):
+            task = asyncio.create_task(write_section(index, name))
+            task.add_done_callback(lambda _, index=index: queue.put_nowait((index, None)))
+            tasks.append(task)
+        
+        texts = [[] for _ in tasks]
+        released = [0] * len(tasks)
+        finished = set()
+        emitted = []
+        current = 0
+        while current < len(tasks):
+            index, text = await queue.get()
+            if text is None:
+                if tasks[index].exception() is not None:
+                    raise tasks[index].exception()
+                finished.add(index)
+                yield SSEEvent("draft_section", {
+                    "section": SECTION_GROUPS[index][0],
+                    "status": "completed",
+                    "duration_ms": round(durations[index] * 1000)
+                })
+            else:
+                texts[index].append(text)
+            
+            # The current part streams live; the next one starts once it has finished
+            while current < len(tasks):
+                pending = texts[current][released[current]:]
+                if pending:
+                    content = "".join(pending)
+                    if emitted and released[current] == 0:
+                        content = "\n\n" + content
+                    released[current] = len(texts[current])
+                    emitted.append(content)
+                    first_token_at = first_token_at or time.monotonic()
+                    yield SSEEvent("draft_chunk", {"content": content})
+                if current not in finished:
+                    break
+                current += 1
+        
+        calls.extend(task.result() for task in tasks if task.result() is not None)
+        answer = "".join(emitted)
+        
+        args = None
+        for _ in range(DRAFT_CRITIQUE_ATTEMPTS):
+            critique = await get_critique_chain().ainvoke({"messages": [human_message], "directive": answer})
+            calls.append(critique)
+            observe_llm_call("draft_critique", critique, model=STAGE_MODELS["critique"]["model"])
+            if valid_tool_call(critique, DraftCritique):
+                args = critique.tool_calls[0]["args"]
+                break
+            yield SSEEvent("validation", {"stage": "critique", "schema": "DraftCritique", "valid": False})
+        if args is None:
+            # Without a critique the draft would look complete: redo it as a single call, which critiques itself
+            async for event in stream_routed_draft(human_message, responses):
+                yield event
+            return
+        reflection = args["reflection"]
+        search_queries = args["search_queries"]
+        yield reflection_event("reflection", reflection)
+        yield reflection_event("search_queries", search_queries)
+        
+        usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+        for message in calls:
+            message_usage = getattr(message, "usage_metadata", None) or {}
+            for key in usage:
+                usage[key] += message_usage.get(key) or 0
+        responses.append(AIMessage(
+            content="",
+            tool_calls=[{
+                "name": "AnswerQuestion",
+                "args": {"answer": answer, "search_queries": search_queries, "reflection": reflection},
+                "id": f"call_{uuid.uuid4().hex}"
+            }],
+            usage_metadata=usage if usage["total_tokens"] else None
+        ))
+        
+        finished_at = time.monotonic()
+        observe_stage("draft", finished_at - started)
+        yield SSEEvent("draft_complete", {
+            "answer": answer,
+            "time_to_first_token_ms": round(((first_token_at or finished_at) - started) * 1000),
+            "duration_ms": round((finished_at - started) * 1000),
+            "mode": "sections",
+            "llm_calls": len(calls),
+            "tokens": {"prompt": usage["input_tokens"], "completion": usage["output_tokens"]}
+        })
     except Exception as e:
         yield SSEEvent("error", {"message": f"Draft generation failed: {str(e)}"})
+    finally:
+        for task in tasks:
+            task.cancel()
 
 async def extract_and_stream_reflection(ai_message: AIMessage) -> AsyncGenerator[SSEEvent, None]:
     """Extract and stream reflection from AI message"""
     try:
         if hasattr(ai_message, "tool_calls") and ai_message.tool_calls:
             for tool_call in ai_message.tool_calls:
-                if tool_call["name"] == "AnswerQuestion":
+                if tool_call["name"] in ["AnswerQuestion", "ReviseAnswer"]:
                     args = tool_call["args"]
                     
-                    # Stream reflection
-                    reflection = args.get("reflection", {})
-                    yield SSEEvent("reflection", {
-                        "missing": reflection.get("missing", ""),
-                        "superfluous": reflection.get("superfluous", "")
-                    })
-                    
-                    # Stream search queries
-                    search_queries = args.get("search_queries", [])
-                    yield SSEEvent("search_queries", {"queries": search_queries})
+                    # Stream reflection and search queries
+                    yield reflection_event("reflection", args.get("reflection", {}))
+                    yield reflection_event("search_queries", args.get("search_queries", []))
                     
                     break
     except Exception as e:
         yield SSEEvent("error", {"message": f"Reflection extraction failed: {str(e)}"})
 
-async def stream_search_execution(state: List[BaseMessage]) -> AsyncGenerator[SSEEvent, None]:
-    """Stream search execution results"""
+async def stream_search_execution(
+    state: List[BaseMessage],
+    tool_messages: List[ToolMessage],
+    speculation: Optional[SpeculativeSearch] = None,
+) -> AsyncGenerator[SSEEvent, None]:
+    """Run the search queries concurrently, streaming results and appending the ToolMessages to tool_messages.
+    
+    Queries already started speculatively (while the draft streamed) are joined instead of re-run.
+    """
     try:
+        started = time.monotonic()
         last_ai_message: AIMessage = state[-1]
         
-        if not hasattr(last_ai_message, "tool_calls") or not last_ai_message.tool_calls:
-            return
+        calls = get_search_queries(last_ai_message)
+        queries = list(dict.fromkeys(query for _, search_queries in calls for query in search_queries))
         
-        for tool_call in last_ai_message.tool_calls:
-            if tool_call["name"] in ["AnswerQuestion", "ReviseAnswer"]:
-                search_queries = tool_call["args"].get("search_queries", [])
-                
-                for query in search_queries:
-                    try:
-                        yield SSEEvent("search_executing", {"query": query})
-                        
-                        # Execute search in thread pool to avoid blocking
-                        result = await asyncio.get_event_loop().run_in_executor(
-                            None, lambda q=query: tavily_tool.invoke(q)
-                        )
-                        
-                        yield SSEEvent("search_result", {
-                            "query": query,
-                            "result": result
-                        })
-                    except Exception as e:
-                        yield SSEEvent("search_error", {
-                            "query": query,
-                            "error": str(e)
-                        })
+        for query in queries:
+            yield SSEEvent("search_executing", {"query": query})
+        
+        # Results stream in completion order; a slow query does not hold up the rest
+        results = {}
+        prefetched = speculation.take(queries) if speculation is not None else {}
+        async for _, query, result in astream_search_queries(queries, prefetched=prefetched):
+            results[query] = result
+            
+            if isinstance(result, dict) and result.get("error") is True:
+                yield SSEEvent("search_error", {
+                    "query": query,
+                    "error": result.get("error_message", "")
+                })
+            else:
+                yield SSEEvent("search_result", {
+                    "query": query,
+                    "result": result
+                })
+        
+        # The revisor sees the results streamed above, in query order, compacted to the evidence budget
+        compacted_messages, stats = build_tool_messages(state, calls, results)
+        tool_messages.extend(compacted_messages)
+        observe_stage("search", time.monotonic() - started, queries=len(queries))
+        yield SSEEvent("compaction", stats)
+        
+        if speculation is not None:
+            yield SSEEvent("speculative_search", {
+                "prefetched": len(prefetched),
+                "discarded": len(speculation.tasks) - len(prefetched),
+                "overlap_ms": round(speculation.overlap_seconds() * 1000)
+            })
                         
     except Exception as e:
         yield SSEEvent("error", {"message": f"Search execution failed: {str(e)}"})
 
-async def stream_revision_response(chain, state: List[BaseMessage]) -> AsyncGenerator[SSEEvent, None]:
-    """Stream the revision response"""
+async def stream_revision_response(
+    chain,
+    state: List[BaseMessage],
+    responses: List[BaseMessage],
+    model_stage: str = "final_revision",
+) -> AsyncGenerator[SSEEvent, None]:
+    """Stream the revision response, appending the complete AI message to responses"""
     try:
+        # Only the case, the latest answer/critique/evidence and condensed history go to the revisor
+        messages, context_stats = budget_messages(state)
+        yield SSEEvent("context", context_stats)
+        
         # Check if LLM supports streaming
         if hasattr(chain.last, 'astream'):
-            # Stream the revision in chunks
-            full_response = None
-            async for chunk in chain.astream(state):
-                if hasattr(chunk, 'content') and chunk.content:
-                    yield SSEEvent("revision_chunk", {"content": chunk.content})
-                full_response = chunk
-            
-            # Extract final revised answer
-            if full_response and hasattr(full_response, "tool_calls") and full_response.tool_calls:
-                for tool_call in full_response.tool_calls:
-                    if tool_call["name"] == "ReviseAnswer":
-                        args = tool_call["args"]
-                        yield SSEEvent("revision_complete", {
-                            "answer": args.get("answer", ""),
-                            "references": args.get("references", [])
-                        })
-                        break
+            async for event in stream_tool_call_response(chain, messages, "revision", responses, model_stage=model_stage):
+                yield event
         else:
             # Fallback: invoke normally
             response = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: chain.invoke(state)
+                None, lambda: chain.invoke(messages)
             )
-            yield SSEEvent("revision", {"response": response})
+            responses.append(response)
+            yield SSEEvent("revision", {"answer": tool_answer(response)})
             
     except Exception as e:
         yield SSEEvent("error", {"message": f"Revision failed: {str(e)}"})
 
-async def stream_legal_directive(case_details: str) -> AsyncGenerator[str, None]:
-    """Main streaming function that orchestrates the entire process"""
+async def stream_routed_draft(
+    human_message: HumanMessage,
+    responses: List[BaseMessage],
+    speculation: Optional[SpeculativeSearch] = None,
+) -> AsyncGenerator[SSEEvent, None]:
+    """Single-call draft on the draft model, redone on the final model if a lighter model's call is not a valid AnswerQuestion"""
+    stages = ["draft", "final_revision"] if is_routed("draft") else ["draft"]
+    for stage in stages:
+        description = "Generating initial draft" if stage == "draft" else "Redoing the draft with the final model"
+        yield SSEEvent("stage", {"current": "draft", "description": description, "model": STAGE_MODELS[stage]["model"]})
+        attempt = []
+        async for event in stream_draft_response(get_first_responder_chain(stage), human_message, attempt, speculation, stage):
+            yield event
+        if not attempt:
+            return
+        if not is_routed(stage) or valid_tool_call(attempt[0], AnswerQuestion):
+            responses.append(attempt[0])
+            return
+        yield SSEEvent("validation", {"stage": stage, "schema": "AnswerQuestion", "valid": False})
+
+async def stream_routed_revision(
+    state: List[BaseMessage],
+    iteration: int,
+    stage: str,
+    responses: List[BaseMessage],
+    stages_used: List[str],
+) -> AsyncGenerator[SSEEvent, None]:
+    """Revision on the stage's model, redone on the final model if a lighter model's call is not a valid ReviseAnswer.
+    
+    The final model's output is accepted as it always was. The stage that
+    produced the appended message is appended to stages_used.
+    """
+    stages = [stage, "final_revision"] if is_routed(stage) else [stage]
+    for attempt_stage in stages:
+        description = f"Generating revision - Iteration {iteration}"
+        if attempt_stage != stage:
+            description = f"Redoing the revision with the final model - Iteration {iteration}"
+        yield SSEEvent("stage", {"current": "revision", "description": description, "model": STAGE_MODELS[attempt_stage]["model"]})
+        attempt = []
+        async for event in stream_revision_response(get_revisor_chain(attempt_stage), state, attempt, attempt_stage):
+            yield event
+        if not attempt:
+            return
+        if not is_routed(attempt_stage) or valid_tool_call(attempt[0], ReviseAnswer):
+            responses.append(attempt[0])
+            stages_used.append(attempt_stage)
+            return
+        yield SSEEvent("validation", {"stage": attempt_stage, "schema": "ReviseAnswer", "valid": False})
+
+async def run_legal_directive(
+    case_details: str,
+    checkpoint: Optional[Dict[str, Any]] = None,
+    draft_mode: str = DRAFT_MODE,
+) -> AsyncGenerator[SSEEvent, None]:
+    """Main pipeline that orchestrates the entire process, yielding SSE events.
+    
+    The state is checkpointed after the draft and after every search and
+    revision. Given a checkpoint (from checkpoint_store.load), the run continues
+    after its last completed node under the same run id. draft_mode "sections"
+    writes the draft with stream_sectioned_draft instead of a single call.
+    """
+    run_id = checkpoint["run_id"] if checkpoint else uuid.uuid4().hex
+    status = "failed"
+    # The single-call draft's searches start while it is still streaming; joined by the first search stage
+    speculation = SpeculativeSearch() if SPECULATIVE_SEARCH and not checkpoint and draft_mode == "single" else None
+    running_runs.add(run_id)
     try:
+        started_at = time.monotonic()
+        # Stage timings, token usage and search sources of this run end up in the trace event
+        trace = start_trace()
         human_message = HumanMessage(content=case_details)
         state = [human_message]
+        iteration = 0
+        compaction_totals = {"tokens_before": 0, "tokens_after": 0}
+        MAX_ITERATIONS = 2
+        # Stage that produced each revision in state; a routed last one gets a final pass on convergence
+        revision_stages = []
+        final_pass = False
         
-        yield SSEEvent("start", {"message": "Starting legal directive generation"}).format()
+        def save(node: str):
+            extra = {"compaction": compaction_totals, "revision_stages": revision_stages, "final_pass": final_pass}
+            return asyncio.to_thread(checkpoint_store.save, run_id, case_details, node, iteration, state, extra)
         
-        # Step 1: Generate initial draft
-        yield SSEEvent("stage", {"current": "draft", "description": "Generating initial draft"}).format()
+        yield SSEEvent("start", {"message": "Starting legal directive generation"})
         
-        draft_response = None
-        async for event in stream_draft_response(first_responder_chain, human_message):
-            yield event.format()
-            if event.event_type == "draft_complete":
-                draft_response = event.data["response"]
-            elif event.event_type == "draft":
-                draft_response = event.data["response"]
+        last_node = None
+        if checkpoint:
+            state = list(checkpoint["state"])
+            iteration = checkpoint["iteration"]
+            compaction_totals = checkpoint["extra"].get("compaction", compaction_totals)
+            revision_stages = list(checkpoint["extra"].get("revision_stages", revision_stages))
+            final_pass = checkpoint["extra"].get("final_pass", final_pass)
+            last_node = checkpoint["node"]
+        yield SSEEvent("run", {"run_id": run_id, "resumed_after": last_node, "iteration": iteration})
         
-        if not draft_response:
-            yield SSEEvent("error", {"message": "Failed to generate draft"}).format()
-            return
+        if last_node is None:
+            # Step 1: Generate initial draft
+            draft_responses = []
+            if draft_mode == "sections":
+                yield SSEEvent("stage", {"current": "draft", "description": "Generating initial draft in parallel sections"})
+                draft_events = stream_sectioned_draft(human_message, draft_responses)
+            else:
+                draft_events = stream_routed_draft(human_message, draft_responses, speculation)
+            async for event in draft_events:
+                yield event
+            if speculation is not None:
+                speculation.finish_generation()
             
-        state.append(draft_response)
-        
-        # Extract and stream reflection
-        async for event in extract_and_stream_reflection(draft_response):
-            yield event.format()
+            if not draft_responses:
+                yield SSEEvent("error", {"message": "Failed to generate draft"})
+                return
+                
+            state.append(draft_responses[0])
+            await save("draft")
         
-        # Iteration loop (max 2 iterations)
-        iteration = 0
-        MAX_ITERATIONS = 2
+        # Iteration loop (max 2 iterations), stopping early once revisions converge.
+        # The draft is always researched and revised once: convergence is only checked from iteration 1.
+        # A run resumed after a search goes straight to that iteration's revision.
+        # Intermediate revisions run on the "revision" model and the last one on "final_revision".
+        needs_search = last_node != "search"
         
-        while iteration < MAX_ITERATIONS:
-            iteration += 1
-            yield SSEEvent("iteration", {"current": iteration, "max": MAX_ITERATIONS}).format()
-            
-            # Step 2: Execute search tools
-            yield SSEEvent("stage", {"current": "search", "description": f"Executing search queries - Iteration {iteration}"}).format()
-            
-            async for event in stream_search_execution(state):
-                yield event.format()
-            
-            # Execute tools to get ToolMessage results
-            tool_messages = await asyncio.get_event_loop().run_in_executor(
-                None, lambda: execute_tools(state)
-            )
-            
-            state.extend(tool_messages)
+        while True:
+            if needs_search:
+                if iteration >= MAX_ITERATIONS:
+                    stop = "max_iterations"
+                else:
+                    stop = stop_reason(state, started_at) if iteration >= 1 else None
+                if stop in FINAL_PASS_STOPS and revision_stages and is_routed(revision_stages[-1]):
+                    # The run converged on an intermediate answer: redo that revision on the final model
+                    intermediate = state.pop()
+                    final_responses = []
+                    async for event in stream_routed_revision(state, iteration, "final_revision", final_responses, revision_stages):
+                        yield event
+                    state.append(final_responses[0] if final_responses else intermediate)
+                    if final_responses:
+                        final_pass = True
+                        await save("revision")
+                if stop:
+                    break
+                
+                iteration += 1
+                yield SSEEvent("iteration", {"current": iteration, "max": MAX_ITERATIONS})
+                
+                # Step 2: Execute search tools
+                yield SSEEvent("stage", {"current": "search", "description": f"Executing search queries - Iteration {iteration}"})
+                
+                tool_messages = []
+                search_failed = False
+                async for event in stream_search_execution(state, tool_messages, speculation):
+                    yield event
+                    if event.event_type == "compaction":
+                        for key in compaction_totals:
+                            compaction_totals[key] += event.data[key]
+                    elif event.event_type == "error":
+                        search_failed = True
+                
+                state.extend(tool_messages)
+                speculation = None
+                if not search_failed:
+                    await save("search")
+            needs_search = True
             
             # Step 3: Generate revision
-            yield SSEEvent("stage", {"current": "revision", "description": f"Generating revision - Iteration {iteration}"}).format()
+            revision_stage = "final_revision" if iteration >= MAX_ITERATIONS else "revision"
+            revision_responses = []
+            async for event in stream_routed_revision(state, iteration, revision_stage, revision_responses, revision_stages):
+                yield event
             
-            revision_response = None
-            async for event in stream_revision_response(revisor_chain, state):
-                yield event.format()
-                if event.event_type == "revision_complete":
-                    revision_response = event.data
-                elif event.event_type == "revision":
-                    revision_response = event.data["response"]
-            
-            if revision_response:
-                # Check if we have a proper revision response
-                if isinstance(revision_response, dict) and "answer" in revision_response:
-                    # We got the final answer
-                    final_answer = revision_response
-                    break
-                else:
-                    # Add the AI response to state for next iteration
-                    state.append(revision_response)
-                    
-                    # Check if we should continue (based on tool messages count)
-                    tool_count = sum(isinstance(msg, ToolMessage) for msg in state)
-                    if tool_count > MAX_ITERATIONS:
-                        break
-            else:
-                yield SSEEvent("error", {"message": f"Revision failed in iteration {iteration}"}).format()
+            if not revision_responses:
+                yield SSEEvent("error", {"message": f"Revision failed in iteration {iteration}"})
+                stop = "revision_failed"
                 break
+            
+            # The revision's answer, critique and new queries drive the next iteration
+            state.append(revision_responses[0])
+            await save("revision")
+        
+        # Each skipped iteration saves one revision call (plus its searches)
+        llm_calls_saved = MAX_ITERATIONS - iteration - int(final_pass) if stop != "revision_failed" else 0
+        yield SSEEvent("stopped", {
+            "reason": stop,
+            "iterations": iteration,
+            "llm_calls_saved": llm_calls_saved,
+            "final_pass": final_pass,
+            "tokens_used": tokens_used(state)
+        })
         
         # Extract final answer from the last response
         if state:
@@ -251,31 +702,422 @@ async def stream_legal_directive(case_details: str) -> AsyncGenerator[str, None]
                         yield SSEEvent("final", {
                             "answer": final_answer,
                             "references": references,
-                            "iterations": iteration
-                        }).format()
+                            "iterations": iteration,
+                            "stop_reason": stop,
+                            "llm_calls_saved": llm_calls_saved,
+                            "compaction": compaction_totals,
+                            "run_id": run_id
+                        })
                         break
         
-        yield SSEEvent("done", {"message": "Legal directive generation completed"}).format()
+        # A failed revision still ends with the previous answer, but the run stays resumable
+        if stop != "revision_failed":
+            status = "completed"
+        yield SSEEvent("trace", trace.summary())
+        yield SSEEvent("done", {"message": "Legal directive generation completed"})
         
     except Exception as e:
-        yield SSEEvent("error", {"message": f"Generation failed: {str(e)}"}).format()
+        yield SSEEvent("error", {"message": f"Generation failed: {str(e)}", "run_id": run_id})
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "interrupted"
+        raise
+    finally:
+        # Speculative searches the run never joined (it stopped or failed first)
+        if speculation is not None:
+            speculation.cancel()
+        running_runs.discard(run_id)
+        await asyncio.shield(asyncio.to_thread(checkpoint_store.set_status, run_id, status))
+
+async def generate_directive_result(case_details: str, draft_mode: str = DRAFT_MODE) -> Dict[str, Any]:
+    """Run the pipeline for one case without streaming and return its final result"""
+    result: Dict[str, Any] = {"answer": None, "references": []}
+    errors = []
+    async for event in run_legal_directive(case_details, draft_mode=draft_mode):
+        if event.event_type == "final":
+            result.update(event.data)
+        elif event.event_type == "error":
+            errors.append(event.data.get("message", ""))
+    
+    if errors:
+        result["errors"] = errors
+    return result
+
+async def scheduled_directive_result(case_details: str) -> Dict[str, Any]:
+    """generate_directive_result for batch cases, in a scheduler slot taken only when no request is queued"""
+    ticket = await scheduler.reserve_background()
+    try:
+        return await generate_directive_result(case_details)
+    finally:
+        scheduler.release(ticket)
+
+async def replay_directive(recorded: List[str], replay_delay: float = 0.0) -> AsyncGenerator[str, None]:
+    """Replay a cached directive's recorded SSE events"""
+    yield SSEEvent("cache", {"hit": True, "events": len(recorded)}).format()
+    for formatted in recorded:
+        if replay_delay > 0:
+            await asyncio.sleep(replay_delay)
+        yield formatted
+
+async def stream_shared_directive(run: SharedRun, joined: bool) -> AsyncGenerator[str, None]:
+    """Follow a shared pipeline run; joiners are told how much they missed"""
+    if joined:
+        # Counting this request, which subscribes below
+        yield SSEEvent("joined", {"subscribers": run.subscribers + 1, "replayed_events": len(run.events)}).format()
+    
+    async for formatted in run.subscribe():
+        yield formatted
+
+async def scheduled_stream(ticket: Ticket, stream: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+    """Wait for a pipeline slot (streaming queue position), then run the pipeline stream"""
+    try:
+        async for position, estimated_wait in scheduler.wait(ticket):
+            yield SSEEvent("queued", {
+                "position": position,
+                "estimated_wait_seconds": round(estimated_wait)
+            }).format()
+        
+        async for formatted in stream:
+            yield formatted
+    finally:
+        scheduler.release(ticket)
+
+async def without_trace_events(stream: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+    """Drop the pipeline's "trace" event for clients that did not ask for it"""
+    async for formatted in stream:
+        if not formatted.startswith("event: trace\n"):
+            yield formatted
+
+async def open_directive_stream(
+    case_details: str,
+    use_cache: bool = True,
+    replay_delay: float = 0.0,
+    trace: bool = False,
+    stream_mode: str = SSE_STREAM_MODE,
+    draft_mode: str = DRAFT_MODE,
+) -> AsyncIterator[str]:
+    """Return the stream of formatted Server-Sent Events for a case.
+    
+    Identical cases (same normalized text, model and prompts) are replayed from
+    the directive cache. Otherwise the request joins an identical in-flight run,
+    or starts one that is recorded and cached once it finishes cleanly. The
+    trace event is only passed on with trace=True (and never replayed).
+    Raises QueueFull when a new run is needed and the scheduler queue is full.
+    """
+    # Runs are shared and cached per stream and draft mode, since the recorded events differ
+    key = directive_cache_key(case_details, stream_mode, draft_mode)
+    
+    if use_cache:
+        recorded = await asyncio.to_thread(directive_cache.get, key)
+        if recorded is not None:
+            return replay_directive(recorded, replay_delay)
+    
+    # Identical cases already running are shared instead of starting another pipeline;
+    # only a new run needs a scheduler slot
+    ticket = None
+    if not single_flight.is_running(key):
+        ticket = scheduler.reserve()
+    
+    run, joined = single_flight.join(key, lambda: scheduled_stream(ticket, record_legal_directive(case_details, key, stream_mode, draft_mode)))
+    if ticket is not None:
+        # Also covers a run cancelled before its generator ever started
+        run.task.add_done_callback(lambda _: scheduler.release(ticket))
+    stream = stream_shared_directive(run, joined)
+    return stream if trace else without_trace_events(stream)
+
+def stream_events(events: AsyncIterator[SSEEvent], stream_mode: str) -> AsyncIterator[SSEEvent]:
+    return lean_events(events) if stream_mode == "lean" else events
+
+async def resumed_legal_directive(checkpoint: Dict[str, Any], stream_mode: str) -> AsyncGenerator[str, None]:
+    """Continue a checkpointed run; resumed runs are not cached since they only stream the remaining nodes"""
+    async for event in stream_events(run_legal_directive(checkpoint["case_details"], checkpoint), stream_mode):
+        yield event.format()
+
+async def record_legal_directive(
+    case_details: str,
+    key: str,
+    stream_mode: str = SSE_STREAM_MODE,
+    draft_mode: str = DRAFT_MODE,
+) -> AsyncGenerator[str, None]:
+    """Run the pipeline, formatting its events and caching the run once it finishes cleanly"""
+    recorded = []
+    event_types = set()
+    async for event in stream_events(run_legal_directive(case_details, draft_mode=draft_mode), stream_mode):
+        formatted = event.format()
+        # A replay's timings would describe the original run, so traces are not cached
+        if event.event_type != "trace":
+            recorded.append(formatted)
+        event_types.add(event.event_type)
+        yield formatted
+    
+    if "final" in event_types and "error" not in event_types:
+        await asyncio.to_thread(directive_cache.set, key, recorded)
+
+def event_stream_response(stream: AsyncIterator[str], accept_encoding: Optional[str], allow_headers: str = "Cache-Control") -> StreamingResponse:
+    """SSE response, gzipped (flushed per event) when the client accepts it"""
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Headers": allow_headers,
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip(accept_encoding):
+        headers["Content-Encoding"] = "gzip"
+        stream = gzip_stream(stream)
+    return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
 
 @app.post("/generate_directive")
-async def generate_directive(request: GenerateDirectiveRequest):
+async def generate_directive(request: GenerateDirectiveRequest, accept_encoding: Optional[str] = Header(None)):
     """Generate legal directive with streaming response"""
     try:
-        return StreamingResponse(
-            stream_legal_directive(request.case_details),
-            media_type="text/event-stream",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-                "Access-Control-Allow-Headers": "Cache-Control"
-            }
+        stream = await open_directive_stream(
+            request.case_details, request.use_cache, request.replay_delay, request.trace, request.stream_mode, request.draft_mode
+        )
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return event_stream_response(stream, accept_encoding)
+
+async def ingest_case_files(files: List[UploadFile], case_details: str, token_budget: Optional[int]) -> Dict[str, Any]:
+    """Condense uploaded case files (with the typed case details kept in full) into case text"""
+    started = time.monotonic()
+    try:
+        ingested = await ingest_uploads(files, case_details, token_budget)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedUpload as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    if not ingested["case_details"].strip():
+        raise HTTPException(status_code=400, detail="No text could be extracted from the uploaded files")
+    
+    observe_ingest(ingested["stats"], time.monotonic() - started)
+    return ingested
+
+async def with_ingest_event(stats: Dict[str, Any], stream: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+    yield SSEEvent("ingest", stats).format()
+    async for formatted in stream:
+        yield formatted
+
+@app.post("/ingest_case")
+async def ingest_case(
+    files: List[UploadFile] = File(...),
+    case_details: str = Form(""),
+    token_budget: Optional[int] = Form(None),
+):
+    """Condensed case text and ingestion stats for uploaded case files (pleadings, contracts, email exports)"""
+    return await ingest_case_files(files, case_details, token_budget)
+
+@app.post("/generate_directive/upload")
+async def generate_directive_upload(
+    files: List[UploadFile] = File(...),
+    case_details: str = Form(""),
+    token_budget: Optional[int] = Form(None),
+    use_cache: bool = Form(True),
+    trace: bool = Form(False),
+    stream_mode: Literal["lean", "full"] = Form(SSE_STREAM_MODE),
+    draft_mode: Literal["single", "sections"] = Form(DRAFT_MODE),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Generate a directive from uploaded case files, streaming an "ingest" event and then the usual events"""
+    ingested = await ingest_case_files(files, case_details, token_budget)
+    try:
+        stream = await open_directive_stream(ingested["case_details"], use_cache, 0.0, trace, stream_mode, draft_mode)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return event_stream_response(with_ingest_event(ingested["stats"], stream), accept_encoding)
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    """Last completed node and status (running, completed, failed, interrupted) of a pipeline run"""
+    run = await asyncio.to_thread(checkpoint_store.get, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    run["resumable"] = run["status"] != "completed" and run_id not in running_runs
+    return run
+
+class ResumeRunRequest(BaseModel):
+    trace: bool = False
+    stream_mode: Literal["lean", "full"] = SSE_STREAM_MODE
+
+@app.post("/runs/{run_id}/resume")
+async def resume_run(run_id: str, request: Optional[ResumeRunRequest] = None, accept_encoding: Optional[str] = Header(None)):
+    """Continue a failed or interrupted run after its last completed node, streaming the remaining events"""
+    request = request or ResumeRunRequest()
+    key = f"resume:{run_id}"
+    if run_id in running_runs or single_flight.is_running(key):
+        raise HTTPException(status_code=409, detail="Run is still in progress")
+    
+    checkpoint = await asyncio.to_thread(checkpoint_store.load, run_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if checkpoint["status"] == "completed":
+        raise HTTPException(status_code=409, detail="Run already completed")
+    
+    try:
+        ticket = scheduler.reserve()
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    run, joined = single_flight.join(key, lambda: scheduled_stream(ticket, resumed_legal_directive(checkpoint, request.stream_mode)))
+    run.task.add_done_callback(lambda _: scheduler.release(ticket))
+    stream = stream_shared_directive(run, joined)
+    return event_stream_response(stream if request.trace else without_trace_events(stream), accept_encoding)
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: GenerateDirectiveRequest):
+    """Start a directive run in the background, independent of this connection"""
+    try:
+        stream = await open_directive_stream(
+            request.case_details, request.use_cache, request.replay_delay, request.trace, request.stream_mode, request.draft_mode
+        )
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    job_id = await job_store.create(stream)
+    return {"job_id": job_id, "events_url": f"/jobs/{job_id}/events"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Job status and number of logged events"""
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a running job; its event log is kept"""
+    if not job_store.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not running in this worker")
+    return {"job_id": job_id, "status": "cancelling"}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(
+    job_id: str,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """Stream a job's events, resuming after Last-Event-ID (header or query) if given"""
+    if await asyncio.to_thread(job_store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    after = last_event_id or 0
+    if last_event_id_header and last_event_id_header.isdigit():
+        after = int(last_event_id_header)
+    
+    async def stream():
+        async for seq, data in job_store.events(job_id, after):
+            yield f"id: {seq}\n{data}"
+    
+    return event_stream_response(stream(), accept_encoding, "Cache-Control, Last-Event-ID")
+
+@app.post("/batch_directives")
+async def batch_directives(request: Request, concurrency: int = 2, rate_per_minute: float = 0, batch_id: Optional[str] = None):
+    """Generate directives for a JSONL body of cases, streaming one NDJSON line per finished case.
+    
+    With batch_id, results are checkpointed on the server; resubmitting the same
+    batch_id skips cases that already completed. Cases count against the
+    pipeline scheduler like interactive runs (but yield to queued ones), and
+    all batches share BATCH_MAX_CONCURRENCY and BATCH_RATE_PER_MINUTE.
+    """
+    body = (await request.body()).decode("utf-8")
+    cases = list(read_cases(body.splitlines()))
+    concurrency = max(1, min(concurrency, BATCH_MAX_CONCURRENCY))
+    
+    checkpoint = None
+    if batch_id:
+        if not batch_id.replace("-", "").replace("_", "").isalnum():
+            raise HTTPException(status_code=400, detail="batch_id may only contain letters, digits, '-' and '_'")
+        os.makedirs(BATCH_DIR, exist_ok=True)
+        checkpoint = os.path.join(BATCH_DIR, f"{batch_id}.ndjson")
+    
+    async def stream():
+        skip_ids = await asyncio.to_thread(completed_ids, checkpoint) if checkpoint else set()
+        output = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+        try:
+            async for result in run_batch(cases, scheduled_directive_result, concurrency, rate_per_minute, skip_ids, batch_limits):
+                line = dumps(result) + "\n"
+                if output:
+                    output.write(line)
+                    output.flush()
+                yield line
+        finally:
+            if output:
+                output.close()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: stage latencies, LLM tokens, search sources, cache hit rates, pipeline load"""
+    stats = scheduler.stats()
+    PIPELINE_RUNS.set(stats["active"], state="active")
+    PIPELINE_RUNS.set(stats["queued"], state="queued")
+    PIPELINE_RUNS.set(single_flight.in_flight(), state="in_flight")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """Active (of which background batch cases) and queued pipeline runs, and cases running across all batches"""
+    return {**scheduler.stats(), "batch": batch_limits.stats()}
+
+@app.get("/rate_limits")
+async def rate_limits():
+    """Configured provider quotas, what is left of them, and how often calls waited, were throttled or retried"""
+    return limiter_stats()
+
+@app.get("/search_results")
+async def search_results(query: str):
+    """Full search payload for a query summarized in a lean stream (cached or local results only)"""
+    result = await asyncio.to_thread(search_cache.get, search_cache_key(query))
+    if result is None:
+        result = await asyncio.to_thread(local_index.lookup, query)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No stored result for this query")
+    return result
+
+@app.get("/search_cache/stats")
+async def search_cache_stats():
+    """Hit/miss counters and size of the search-result cache"""
+    return await asyncio.to_thread(search_cache.stats)
+
+@app.get("/local_index/stats")
+async def local_index_stats():
+    """Indexed statutes/judgments and how often the index answered a query without Tavily"""
+    return await asyncio.to_thread(local_index.stats)
+
+@app.get("/directive_cache/stats")
+async def directive_cache_stats():
+    """Hit/miss counters and size of the directive cache"""
+    return await asyncio.to_thread(directive_cache.stats)
+
+@app.delete("/directive_cache")
+async def clear_directive_cache():
+    """Drop every cached directive (e.g. after changing prompts outside chains.py)"""
+    await asyncio.to_thread(directive_cache.clear)
+    return {"status": "cleared"}
 
 @app.get("/health")
 async def health_check():
@@ -283,6 +1125,8 @@ async def health_check():
     return {"status": "healthy", "message": "Legal Advisor AI is running"}
 
 if __name__ == "__main__":
+    import uvicorn
+    
     # Render sets a PORT environment variable
     port = int(os.environ.get("PORT", 8000))
     uvicorn.run(app, host="0.0.0.0", port=port)
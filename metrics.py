@@ -0,0 +1,205 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Seconds; LLM stages take tens of seconds, cache hits a few milliseconds
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+BYTES_BUCKETS = (1_000, 5_000, 10_000, 25_000, 50_000, 100_000, 250_000, 500_000, 1_000_000)
+
+REGISTRY: List["Metric"] = []
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric:
+    """A named family of samples keyed by label values (Prometheus text exposition)"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())
+            ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    bucket = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                    lines.append(f"{self.name}_bucket{bucket} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+                lines.append(f"{self.name}_count{labels} {counts[-1]}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "directive_stage_seconds", "Duration of pipeline stages (ingest, draft, search, search_query, compaction, revision)", ("stage",)
+)
+TIME_TO_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_time_to_first_token_seconds", "Time from an LLM call to its first streamed answer text", ("stage",)
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the LLM, by stage, model and kind (prompt/completion)", ("stage", "model", "kind"))
+LLM_CALLS = Counter("llm_calls_total", "LLM calls by stage and model", ("stage", "model"))
+SEARCH_QUERIES = Counter("search_queries_total", "Search queries by where the result came from", ("source",))
+SEARCH_RESULT_BYTES = Histogram("tavily_response_bytes", "Size of Tavily results as JSON", buckets=BYTES_BUCKETS)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "rate_limit_wait_seconds", "Time calls waited for provider quota, by provider and priority", ("provider", "priority")
+)
+PROVIDER_RETRIES = Counter("provider_retries_total", "Retried provider calls by provider and HTTP status", ("provider", "status"))
+PROVIDER_THROTTLED = Counter("provider_throttled_total", "429 responses from providers", ("provider",))
+INGEST_PARAGRAPHS = Counter("case_ingest_paragraphs_total", "Paragraphs read from uploaded case files, by kind (read/duplicate)", ("kind",))
+INGEST_TOKENS = Counter("case_ingest_tokens_total", "Tokens of unique case-file paragraphs, by kind (unique/kept)", ("kind",))
+PIPELINE_RUNS = Gauge("pipeline_runs", "Pipeline runs by state (active/queued, and in_flight shared runs)", ("state",))
+
+# The trace of the pipeline run the current task is working for, if any
+current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+
+class Trace:
+    """Per-request record of stage timings, LLM usage and search sources"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.spans: List[Dict[str, Any]] = []
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.tokens_by_stage: Dict[str, Dict[str, int]] = {}
+        self.search_sources: Dict[str, int] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        stages: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            stage = stages.setdefault(span["stage"], {"count": 0, "total_ms": 0, "max_ms": 0})
+            stage["count"] += 1
+            stage["total_ms"] += span["ms"]
+            stage["max_ms"] = max(stage["max_ms"], span["ms"])
+        return {
+            "total_ms": round((time.monotonic() - self.started) * 1000),
+            "stages": stages,
+            "spans": self.spans,
+            "tokens": self.tokens,
+            "tokens_by_stage": self.tokens_by_stage,
+            "search_sources": self.search_sources,
+        }
+
+def start_trace() -> Trace:
+    """Begin tracing a pipeline run; work started from this task afterwards reports into it"""
+    trace = Trace()
+    current_trace.set(trace)
+    return trace
+
+def observe_stage(stage: str, seconds: float, **attrs):
+    """Record a stage duration in the histogram and the current trace"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.spans.append({"stage": stage, "ms": round(seconds * 1000), **attrs})
+
+@contextmanager
+def timed(stage: str, **attrs) -> Iterator[None]:
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.monotonic() - started, **attrs)
+
+def observe_llm_call(stage: str, message: Any, time_to_first_token: Optional[float] = None, model: str = ""):
+    """Record one LLM call: its token usage (when the provider reports it) and time to first token"""
+    LLM_CALLS.inc(stage=stage, model=model)
+    if time_to_first_token is not None:
+        TIME_TO_FIRST_TOKEN_SECONDS.observe(time_to_first_token, stage=stage)
+
+    usage = getattr(message, "usage_metadata", None) or {}
+    trace = current_trace.get()
+    for kind, field in (("prompt", "input_tokens"), ("completion", "output_tokens")):
+        count = usage.get(field) or 0
+        if count:
+            LLM_TOKENS.inc(count, stage=stage, model=model, kind=kind)
+            if trace is not None:
+                trace.tokens[kind] += count
+                stage_tokens = trace.tokens_by_stage.setdefault(stage, {"prompt": 0, "completion": 0})
+                stage_tokens[kind] += count
+
+def observe_search(source: str, seconds: float, result_bytes: Optional[int] = None):
+    """Record one search query served from cache, local_index or tavily (or failed: error)"""
+    SEARCH_QUERIES.inc(source=source)
+    if result_bytes is not None:
+        SEARCH_RESULT_BYTES.observe(result_bytes)
+    observe_stage("search_query", seconds, source=source)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.search_sources[source] = trace.search_sources.get(source, 0) + 1
+
+def observe_ingest(stats: Dict[str, Any], seconds: float):
+    """Record one case-file ingestion: its duration, paragraphs read and dropped, and tokens kept"""
+    INGEST_PARAGRAPHS.inc(stats["paragraphs"], kind="read")
+    INGEST_PARAGRAPHS.inc(stats["duplicates"], kind="duplicate")
+    INGEST_TOKENS.inc(stats["tokens_unique"], kind="unique")
+    INGEST_TOKENS.inc(stats["tokens_kept"], kind="kept")
+    observe_stage("ingest", seconds, files=len(stats["files"]), tokens_kept=stats["tokens_kept"])
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
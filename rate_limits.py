@@ -0,0 +1,367 @@
+"""Client-side quotas and retries for the LLM and search providers.
+
+Every provider call goes through its ProviderLimiter: token buckets for
+requests/min and (for the LLM) tokens/min keep bursts under the provider's
+quota, and 429/5xx responses are retried with jittered exponential backoff,
+waiting at least as long as the provider's Retry-After. A 429 pauses the whole
+provider, not only the call that got it.
+
+Batch calls (request_priority "batch") share the buckets with interactive
+/generate_directive requests according to interactive demand:
+
+- While an interactive call is waiting for quota, batch calls wait too.
+- Within RATE_LIMIT_INTERACTIVE_WINDOW seconds of the last interactive call,
+  batch calls must leave RATE_LIMIT_INTERACTIVE_RESERVE of each bucket untouched.
+- Otherwise batch calls may use the whole bucket.
+
+Buckets are per process: with several uvicorn workers each one enforces its
+own share of the configured quota.
+"""
+import asyncio
+import contextvars
+import email.utils
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional
+
+from metrics import PROVIDER_RETRIES, PROVIDER_THROTTLED, RATE_LIMIT_WAIT_SECONDS
+
+# "interactive" (the default) or "batch"; batch workers set it for everything they run
+request_priority: contextvars.ContextVar[str] = contextvars.ContextVar("request_priority", default="interactive")
+
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "4"))
+RATE_LIMIT_BASE_DELAY = float(os.getenv("RATE_LIMIT_BASE_DELAY", "1"))
+# Longest backoff; a Retry-After beyond this is not waited for and the call fails
+RATE_LIMIT_MAX_DELAY = float(os.getenv("RATE_LIMIT_MAX_DELAY", "60"))
+# Seconds of quota that may be used in one burst
+RATE_LIMIT_BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+# Share of each bucket batch calls may not use while interactive traffic is recent
+RATE_LIMIT_INTERACTIVE_RESERVE = float(os.getenv("RATE_LIMIT_INTERACTIVE_RESERVE", "0.25"))
+# Seconds after the last interactive call during which the reserve is kept
+RATE_LIMIT_INTERACTIVE_WINDOW = float(os.getenv("RATE_LIMIT_INTERACTIVE_WINDOW", "60"))
+# How often a batch call that yields to waiting interactive calls checks again
+BATCH_YIELD_SECONDS = 0.05
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+STATUS_BY_ERROR_NAME = {
+    "ResourceExhausted": 429,
+    "TooManyRequests": 429,
+    "RateLimitError": 429,
+    "InternalServerError": 500,
+    "ServiceUnavailable": 503,
+    "GatewayTimeout": 504,
+    "DeadlineExceeded": 504,
+}
+
+class TokenBucket:
+    """Continuously refilled bucket of per_minute units holding at most capacity (per_minute <= 0: unlimited)"""
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, capacity)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def refill(self, now: float):
+        if self.enabled:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until amount can be taken leaving reserve (a fraction of capacity) behind"""
+        if not self.enabled:
+            return 0.0
+        needed = min(amount, self.capacity) + reserve * self.capacity
+        needed = min(needed, self.capacity)
+        return max(0.0, (needed - self.level) * 60 / self.per_minute)
+
+    def take(self, amount: float):
+        if self.enabled:
+            self.level -= min(amount, self.capacity)
+
+    def credit(self, amount: float):
+        """Return (or, when negative, charge) units after the real cost is known"""
+        if self.enabled:
+            self.level = min(self.capacity, self.level + amount)
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status behind a provider error, from its attributes, class name or message"""
+    for candidate in (
+        getattr(error, "status_code", None),
+        getattr(error, "status", None),
+        getattr(error, "code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        try:
+            status = int(candidate)
+        except (TypeError, ValueError):
+            continue
+        if 100 <= status < 600:
+            return status
+    for cls in type(error).__mro__:
+        if cls.__name__ in STATUS_BY_ERROR_NAME:
+            return STATUS_BY_ERROR_NAME[cls.__name__]
+    message = str(error)
+    if "RESOURCE_EXHAUSTED" in message or "Too Many Requests" in message:
+        return 429
+    match = re.search(r"\b(429|500|502|503|504)\b", message)
+    return int(match.group(1)) if match else None
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """The provider's requested wait: a retry_after attribute, Retry-After header or 'retry in Ns' message"""
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_after = headers.get("Retry-After") if hasattr(headers, "get") else None
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except (TypeError, ValueError):
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(str(retry_after)).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    # Gemini reports the delay in the error text ("Please retry in 23.5s", "retry_delay { seconds: 23 }")
+    message = str(error)
+    match = (
+        re.search(r"retry[ _]?delay\s*\{\s*seconds:\s*(\d+)", message, re.IGNORECASE)
+        or re.search(r"retry(?:[ _]?delay|[ _]in|[ _]after)\D{0,20}?(\d+(?:\.\d+)?)\s*s", message, re.IGNORECASE)
+    )
+    return float(match.group(1)) if match else None
+
+class ProviderLimiter:
+    """Request and token quotas plus retry policy for one provider"""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        tokens_per_minute: float = 0,
+        max_retries: int = RATE_LIMIT_MAX_RETRIES,
+        base_delay: float = RATE_LIMIT_BASE_DELAY,
+        max_delay: float = RATE_LIMIT_MAX_DELAY,
+    ):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute * RATE_LIMIT_BURST_SECONDS / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute * RATE_LIMIT_BURST_SECONDS / 60)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.paused_until = 0.0
+        self.waits = {"interactive": 0, "batch": 0}
+        self.waiting = {"interactive": 0, "batch": 0}
+        self.last_interactive = float("-inf")
+        self.wait_seconds = 0.0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _batch_reserve(self, now: float) -> Optional[float]:
+        """Share of each bucket a batch call must leave, or None while interactive calls wait for quota"""
+        if self.waiting.get("interactive"):
+            return None
+        if now - self.last_interactive < RATE_LIMIT_INTERACTIVE_WINDOW:
+            return RATE_LIMIT_INTERACTIVE_RESERVE
+        return 0.0
+
+    def _try_acquire(self, tokens: float, priority: str) -> float:
+        """Take one request and tokens now (returns 0) or return the seconds to wait first"""
+        with self._lock:
+            now = time.monotonic()
+            if priority == "batch":
+                reserve = self._batch_reserve(now)
+                if reserve is None:
+                    return max(self.paused_until - now, BATCH_YIELD_SECONDS)
+            else:
+                reserve = 0.0
+                self.last_interactive = now
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            delay = max(
+                self.paused_until - now,
+                self.requests.wait_time(1, reserve),
+                self.tokens.wait_time(tokens, reserve),
+            )
+            if delay > 0:
+                return delay
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            return 0.0
+
+    def _record_wait(self, priority: str, waited: float):
+        if waited > 0.001:
+            with self._lock:
+                self.waits[priority] = self.waits.get(priority, 0) + 1
+                self.wait_seconds += waited
+            RATE_LIMIT_WAIT_SECONDS.observe(waited, provider=self.name, priority=priority)
+
+    def _set_waiting(self, priority: str, change: int):
+        with self._lock:
+            self.waiting[priority] = self.waiting.get(priority, 0) + change
+
+    async def acquire(self, tokens: float = 0):
+        priority = request_priority.get()
+        started = time.monotonic()
+        delay = self._try_acquire(tokens, priority)
+        if delay > 0:
+            self._set_waiting(priority, 1)
+            try:
+                while delay > 0:
+                    # Re-checked after sleeping: other callers may have taken the refill
+                    await asyncio.sleep(delay + random.uniform(0, 0.05))
+                    delay = self._try_acquire(tokens, priority)
+            finally:
+                self._set_waiting(priority, -1)
+        self._record_wait(priority, time.monotonic() - started)
+
+    def acquire_sync(self, tokens: float = 0):
+        priority = request_priority.get()
+        started = time.monotonic()
+        delay = self._try_acquire(tokens, priority)
+        if delay > 0:
+            self._set_waiting(priority, 1)
+            try:
+                while delay > 0:
+                    time.sleep(delay + random.uniform(0, 0.05))
+                    delay = self._try_acquire(tokens, priority)
+            finally:
+                self._set_waiting(priority, -1)
+        self._record_wait(priority, time.monotonic() - started)
+
+    def settle(self, estimated_tokens: float, actual_tokens: Optional[float]):
+        """Correct the token bucket once a call reports its real usage"""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.credit(estimated_tokens - actual_tokens)
+
+    def retry_delay(self, error: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after error, or None when it should not be retried"""
+        status = error_status(error)
+        if status not in RETRYABLE_STATUS or attempt >= self.max_retries:
+            with self._lock:
+                self.failures += 1
+            return None
+
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None and retry_after > self.max_delay:
+            with self._lock:
+                self.failures += 1
+            return None
+        # Full jitter, but never sooner than the provider asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        with self._lock:
+            self.retries += 1
+            if status == 429:
+                self.throttled += 1
+                self.paused_until = max(self.paused_until, time.monotonic() + delay)
+        PROVIDER_RETRIES.inc(provider=self.name, status=status)
+        if status == 429:
+            PROVIDER_THROTTLED.inc(provider=self.name)
+        return delay
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], tokens: float = 0) -> Any:
+        """Await fn() within the quota, retrying throttled and transient failures"""
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def call_sync(self, fn: Callable[[], Any], tokens: float = 0) -> Any:
+        attempt = 0
+        while True:
+            self.acquire_sync(tokens)
+            try:
+                return fn()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def stream(self, fn: Callable[[], AsyncIterator[Any]], tokens: float = 0) -> AsyncIterator[Any]:
+        """Iterate fn() within the quota; retried like call, but only until the first item arrives"""
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            started = False
+            try:
+                async for item in fn():
+                    started = True
+                    yield item
+                return
+            except Exception as e:
+                delay = None if started else self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stream_sync(self, fn: Callable[[], Iterator[Any]], tokens: float = 0) -> Iterator[Any]:
+        attempt = 0
+        while True:
+            self.acquire_sync(tokens)
+            started = False
+            try:
+                for item in fn():
+                    started = True
+                    yield item
+                return
+            except Exception as e:
+                delay = None if started else self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "requests_per_minute": self.requests.per_minute,
+                "tokens_per_minute": self.tokens.per_minute,
+                "requests_available": round(self.requests.level, 1) if self.requests.enabled else None,
+                "tokens_available": round(self.tokens.level) if self.tokens.enabled else None,
+                "paused_seconds": round(max(0.0, self.paused_until - now), 1),
+                "waits": dict(self.waits),
+                "waiting": dict(self.waiting),
+                "wait_seconds": round(self.wait_seconds, 1),
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "failures": self.failures,
+            }
+
+# Defaults match Gemini 2.5 Flash paid tier 1 and a Tavily development key; 0 disables a bucket
+LLM_LIMITER = ProviderLimiter(
+    "gemini",
+    requests_per_minute=float(os.getenv("LLM_REQUESTS_PER_MINUTE", "1000")),
+    tokens_per_minute=float(os.getenv("LLM_TOKENS_PER_MINUTE", "1000000")),
+)
+SEARCH_LIMITER = ProviderLimiter(
+    "tavily",
+    requests_per_minute=float(os.getenv("SEARCH_REQUESTS_PER_MINUTE", "100")),
+)
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    return {limiter.name: limiter.stats() for limiter in (LLM_LIMITER, SEARCH_LIMITER)}
@@ -0,0 +1,140 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import AsyncGenerator, Deque, Dict, Optional, Tuple
+
+class QueueFull(Exception):
+    """Raised by PipelineScheduler.reserve when the wait queue is at capacity"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Pipeline queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+class Ticket:
+    """A reserved place in the scheduler: either running or waiting in the queue"""
+
+    def __init__(self, background: bool = False):
+        self.background = background
+        self.admitted = False
+        self.released = False
+        self.started_at: Optional[float] = None
+        self.future: Optional[asyncio.Future] = None
+
+class PipelineScheduler:
+    """Bounds the number of concurrent pipeline runs with a bounded FIFO wait queue.
+
+    reserve() admits or queues a run synchronously (or raises QueueFull), so the
+    HTTP layer can reject before starting a stream. Queued runs await wait(),
+    which reports their position and estimated wait until a slot frees up.
+    Background (batch) runs take slots through reserve_background() instead:
+    they count against max_concurrent but only start when nobody is queued.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, initial_run_seconds: float = 90.0, heartbeat: float = 5.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.heartbeat = heartbeat
+        self.active = 0
+        self.background = 0
+        self.rejected = 0
+        self.completed = 0
+        # Exponentially weighted average run time, used for wait estimates
+        self.avg_run_seconds = initial_run_seconds
+        self._queue: Deque[Ticket] = deque()
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _admit(self, ticket: Ticket):
+        ticket.admitted = True
+        ticket.started_at = time.monotonic()
+        self.active += 1
+        if ticket.background:
+            self.background += 1
+        if ticket.future is not None and not ticket.future.done():
+            ticket.future.set_result(True)
+
+    def estimate_wait(self, position: int) -> float:
+        """Seconds until the run at queue position (1-based) is expected to start"""
+        return self.avg_run_seconds * math.ceil(position / self.max_concurrent)
+
+    def reserve(self) -> Ticket:
+        ticket = Ticket()
+        if self.active < self.max_concurrent and not self._queue:
+            self._admit(ticket)
+        elif len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFull(max(1, int(self.estimate_wait(len(self._queue) + 1))))
+        else:
+            ticket.future = asyncio.get_running_loop().create_future()
+            self._queue.append(ticket)
+            self._notify()
+        return ticket
+
+    async def reserve_background(self) -> Ticket:
+        """Wait for a free slot with no run queued, then admit a background run.
+
+        Background runs never take a queue place, so they do not cause
+        QueueFull for interactive requests, and runs queued behind them are
+        admitted first when a slot frees up.
+        """
+        while self.active >= self.max_concurrent or self._queue:
+            await self._changed.wait()
+        ticket = Ticket(background=True)
+        self._admit(ticket)
+        return ticket
+
+    async def wait(self, ticket: Ticket) -> AsyncGenerator[Tuple[int, float], None]:
+        """Yield (queue position, estimated wait seconds) until the ticket is admitted.
+
+        A new value is yielded when the position changes and every heartbeat seconds.
+        """
+        last_position = None
+        while not ticket.admitted:
+            position = self._queue.index(ticket) + 1
+            if position != last_position:
+                last_position = position
+                yield position, self.estimate_wait(position)
+
+            changed = asyncio.ensure_future(self._changed.wait())
+            try:
+                done, _ = await asyncio.wait({ticket.future, changed}, timeout=self.heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                changed.cancel()
+            if not done:
+                last_position = None  # heartbeat: repeat the position with a fresh estimate
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's slot (or queue place) and admit the next waiting runs"""
+        if ticket.released:
+            return
+        ticket.released = True
+
+        if ticket.admitted:
+            self.active -= 1
+            if ticket.background:
+                self.background -= 1
+            self.completed += 1
+            duration = time.monotonic() - ticket.started_at
+            self.avg_run_seconds = 0.8 * self.avg_run_seconds + 0.2 * duration
+        elif ticket in self._queue:
+            self._queue.remove(ticket)
+
+        while self._queue and self.active < self.max_concurrent:
+            self._admit(self._queue.popleft())
+        self._notify()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "active": self.active,
+            "background": self.background,
+            "queued": len(self._queue),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "avg_run_seconds": round(self.avg_run_seconds, 1),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
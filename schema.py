@@ -22,4 +22,13 @@ class ReviseAnswer(AnswerQuestion):
 
     references: List[str] = Field(
         description="Citations motivating your updated answer."
-    )
\ No newline at end of file
+    )
+
+class DraftCritique(BaseModel):
+    """Critique a directive assembled from sections written in parallel."""
+
+    search_queries: List[str] = Field(
+        description="1-3 search queries for researching improvements to address the critique of the directive."
+    )
+    reflection: Reflection = Field(
+        description="Your reflection on the assembled directive.")
@@ -0,0 +1,92 @@
+import asyncio
+from typing import AsyncGenerator, AsyncIterator, Callable, Dict, List, Tuple
+
+# Seconds a run may go without any subscriber before it is cancelled (its requester never started reading)
+UNWATCHED_TIMEOUT = 30.0
+
+class SharedRun:
+    """One in-flight stream whose items are fanned out to every subscriber.
+
+    Items are buffered, so a subscriber that joins late first receives everything
+    emitted so far and then follows the live stream. The underlying stream is
+    cancelled when its last subscriber goes away before it has finished, or
+    when nobody has subscribed within unwatched_timeout seconds.
+    """
+
+    def __init__(self, source: AsyncIterator[str], unwatched_timeout: float = UNWATCHED_TIMEOUT):
+        self.events: List[str] = []
+        self.done = False
+        self.subscribers = 0
+        self._updated = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(source))
+        asyncio.get_running_loop().call_later(unwatched_timeout, self._cancel_if_unwatched)
+
+    def _cancel_if_unwatched(self):
+        if self.subscribers == 0 and not self.done:
+            self.task.cancel()
+
+    def _notify(self):
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def _pump(self, source: AsyncIterator[str]):
+        try:
+            async for item in source:
+                self.events.append(item)
+                self._notify()
+        except Exception as e:
+            print(f"Shared run failed: {str(e)}")
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        """Yield every item from the start; the caller counts as a subscriber while it iterates"""
+        index = 0
+        try:
+            self.subscribers += 1
+            while True:
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.done:
+                    return
+                await self._updated.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                self.task.cancel()
+
+class SingleFlight:
+    """Deduplicates identical in-flight requests by key"""
+
+    def __init__(self, unwatched_timeout: float = UNWATCHED_TIMEOUT):
+        self.unwatched_timeout = unwatched_timeout
+        self._runs: Dict[str, SharedRun] = {}
+
+    def join(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> Tuple[SharedRun, bool]:
+        """Return the run for key, starting factory() if none is in flight.
+
+        The caller follows it with run.subscribe(). The boolean is True when
+        joining a run another request already started.
+        """
+        run = self._runs.get(key)
+        if run is not None and not run.task.done():
+            return run, True
+
+        run = SharedRun(factory(), self.unwatched_timeout)
+        self._runs[key] = run
+
+        def forget(_):
+            if self._runs.get(key) is run:
+                del self._runs[key]
+
+        run.task.add_done_callback(forget)
+        return run, False
+
+    def is_running(self, key: str) -> bool:
+        run = self._runs.get(key)
+        return run is not None and not run.task.done()
+
+    def in_flight(self) -> int:
+        return len(self._runs)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+import zlib
+from urllib.parse import urlencode
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, Optional
+
+from encoder import dumps
+
+# "lean" coalesces text deltas and summarizes search results; "full" streams everything as produced
+SSE_STREAM_MODE = os.getenv("SSE_STREAM_MODE", "lean")
+# Coalescing window for *_chunk deltas in lean mode
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "100"))
+SSE_COALESCE_CHARS = int(os.getenv("SSE_COALESCE_CHARS", "512"))
+# Gzip the event stream for clients that send Accept-Encoding: gzip (0 disables)
+SSE_GZIP = os.getenv("SSE_GZIP", "1") == "1"
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "300"))
+
+class SSEEvent:
+    def __init__(self, event_type: str, data: Any):
+        self.event_type = event_type
+        self.data = data
+
+    def format(self) -> str:
+        """Format as Server-Sent Event"""
+        data_str = dumps(self.data) if isinstance(self.data, (dict, list)) else str(self.data)
+        return f"event: {self.event_type}\ndata: {data_str}\n\n"
+
+def summarize_search_result(query: str, result: Any) -> Dict[str, Any]:
+    """Title, URL, score and a short snippet per source instead of the full Tavily payload"""
+    result = result if isinstance(result, dict) else {}
+    sources = []
+    for item in result.get("results", []) or []:
+        if not isinstance(item, dict):
+            continue
+        snippet = " ".join(str(item.get("content") or "").split())
+        if len(snippet) > SEARCH_SNIPPET_CHARS:
+            snippet = snippet[:SEARCH_SNIPPET_CHARS].rsplit(" ", 1)[0] + " ..."
+        sources.append({
+            "title": item.get("title", ""),
+            "url": item.get("url", ""),
+            "score": item.get("score"),
+            "snippet": snippet,
+        })
+    summary = {
+        "query": query,
+        "answer": result.get("answer"),
+        "sources": sources,
+        "full_result_url": "/search_results?" + urlencode({"query": query}),
+    }
+    if result.get("source"):
+        summary["source"] = result["source"]
+    return summary
+
+async def lean_events(events: AsyncIterator[SSEEvent]) -> AsyncGenerator[SSEEvent, None]:
+    """Coalesce *_chunk deltas and replace search_result payloads with summaries.
+
+    Consecutive deltas of one stage are merged until SSE_COALESCE_CHARS are
+    buffered or SSE_COALESCE_MS have passed since the first one, and always
+    before any other event, so ordering is unchanged and text is never held
+    back longer than the window even when the model stalls.
+    """
+    iterator = events.__aiter__()
+    buffer_type: Optional[str] = None
+    buffer = []
+    buffered_chars = 0
+    flush_at = 0.0
+    pending = None
+
+    def flush():
+        nonlocal buffer_type, buffer, buffered_chars
+        event = SSEEvent(buffer_type, {"content": "".join(buffer)})
+        buffer_type, buffer, buffered_chars = None, [], 0
+        return event
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            if buffer_type is not None:
+                done, _ = await asyncio.wait({pending}, timeout=max(0.0, flush_at - time.monotonic()))
+                if not done:
+                    yield flush()
+                    continue
+            try:
+                event = await pending
+            except StopAsyncIteration:
+                break
+            finally:
+                if pending.done():
+                    pending = None
+
+            if event.event_type.endswith("_chunk") and isinstance(event.data, dict):
+                if buffer_type is not None and buffer_type != event.event_type:
+                    yield flush()
+                if buffer_type is None:
+                    buffer_type = event.event_type
+                    flush_at = time.monotonic() + SSE_COALESCE_MS / 1000
+                content = str(event.data.get("content", ""))
+                buffer.append(content)
+                buffered_chars += len(content)
+                if buffered_chars >= SSE_COALESCE_CHARS:
+                    yield flush()
+                continue
+
+            if buffer_type is not None:
+                yield flush()
+            if event.event_type == "search_result" and isinstance(event.data, dict):
+                event = SSEEvent("search_result", summarize_search_result(event.data.get("query", ""), event.data.get("result")))
+            yield event
+
+        if buffer_type is not None:
+            yield flush()
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+async def gzip_stream(stream: AsyncIterator[str]) -> AsyncGenerator[bytes, None]:
+    """Gzip an event stream, sync-flushing after every event so nothing is held back"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for formatted in stream:
+        yield compressor.compress(formatted.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    if not SSE_GZIP or not accept_encoding:
+        return False
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*") and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            return True
+    return False
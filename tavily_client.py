@@ -0,0 +1,120 @@
+"""Tavily search client that keeps its HTTP connections between queries.
+
+langchain_tavily's TavilySearch opens a new HTTP session for every query and
+returns failures as an {"error": ...} value without the status or Retry-After,
+so it can neither reuse connections nor be retried correctly. This client
+posts the same request to the same API over one requests.Session (sync) and
+one aiohttp.ClientSession (async; replaced, and the old one closed, when the
+client is used from another event loop), raises TavilyError for
+failed responses and goes through SEARCH_LIMITER. invoke/ainvoke return the
+API's JSON response, as TavilySearch did.
+"""
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+import aiohttp
+import requests
+
+from rate_limits import SEARCH_LIMITER
+
+TAVILY_API_URL = "https://api.tavily.com/search"
+
+class TavilyError(Exception):
+    """A failed Tavily request, with the HTTP status and Retry-After (seconds or HTTP date) if sent"""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[str] = None):
+        super().__init__(f"Error {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class TavilyClient:
+    def __init__(self, api_key: Optional[str] = None, timeout: float = 60.0, **params: Any):
+        self.api_key = api_key or os.getenv("TAVILY_API_KEY", "")
+        self.timeout = timeout
+        # Search settings sent with every query (max_results, topic, search_depth, ...)
+        self.params = params
+        self._session: Optional[requests.Session] = None
+        self._async_session: Optional[aiohttp.ClientSession] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _payload(self, query: str) -> Dict[str, Any]:
+        return {"query": query, **self.params}
+
+    def _result(self, query: str, status: int, reason: str, headers: Any, data: Any) -> Dict[str, Any]:
+        if status != 200:
+            message = data.get("detail", reason) if isinstance(data, dict) else reason
+            if isinstance(message, dict):
+                message = message.get("error", reason)
+            raise TavilyError(status, str(message), headers.get("Retry-After"))
+        if not isinstance(data, dict) or not data.get("results"):
+            # TavilySearch raised for empty results too; errors are never cached
+            raise LookupError(f"No search results found for '{query}'")
+        return data
+
+    def _post(self, query: str) -> Dict[str, Any]:
+        if self._session is None:
+            self._session = requests.Session()
+        response = self._session.post(TAVILY_API_URL, json=self._payload(query), headers=self._headers(), timeout=self.timeout)
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        return self._result(query, response.status_code, response.reason, response.headers, data)
+
+    async def _get_async_session(self) -> aiohttp.ClientSession:
+        # aiohttp sessions belong to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            await self._close_other_loop_session()
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._async_loop = loop
+        return self._async_session
+
+    async def _close_other_loop_session(self):
+        """Close the session created on another event loop before it is replaced"""
+        session, loop = self._async_session, self._async_loop
+        self._async_session = None
+        self._async_loop = None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running():
+            # Still serving another thread: close it there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        try:
+            # Connections of a closed loop are just released; those of a stopped one are closed
+            # without waiting, since their close callbacks are scheduled on that loop
+            await session.close()
+        except RuntimeError:
+            pass
+
+    async def _apost(self, query: str) -> Dict[str, Any]:
+        session = await self._get_async_session()
+        async with session.post(TAVILY_API_URL, json=self._payload(query), headers=self._headers()) as response:
+            try:
+                data = await response.json(content_type=None)
+            except (aiohttp.ContentTypeError, ValueError):
+                data = None
+            return self._result(query, response.status, response.reason or "", response.headers, data)
+
+    def invoke(self, query: str) -> Dict[str, Any]:
+        return SEARCH_LIMITER.call_sync(lambda: self._post(query))
+
+    async def ainvoke(self, query: str) -> Dict[str, Any]:
+        return await SEARCH_LIMITER.call(lambda: self._apost(query))
+
+    async def aclose(self):
+        if self._async_loop is asyncio.get_running_loop():
+            if self._async_session is not None and not self._async_session.closed:
+                await self._async_session.close()
+        else:
+            await self._close_other_loop_session()
+        if self._session is not None:
+            self._session.close()
+        self._async_session = None
+        self._session = None
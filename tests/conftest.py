@@ -0,0 +1,13 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Modules read their database paths at import time: keep every test run away
+# from the working directory's caches, job store and checkpoints
+from benchmarks.pipeline import configure_environment
+
+configure_environment(tempfile.mkdtemp(prefix="legal-advisor-tests-"))
@@ -0,0 +1,54 @@
+import asyncio
+
+from batch import BatchLimits, read_cases, run_batch
+from scheduler import PipelineScheduler
+
+def test_read_cases_reports_malformed_lines():
+    cases = list(read_cases(['{"id": "a", "case_details": "x"}', "", "not json", '{"case_details": 1}']))
+    assert cases[0] == {"id": "a", "case_details": "x"}
+    assert [case["id"] for case in cases[1:]] == ["3", "4"]
+    assert all("error" in case for case in cases[1:])
+
+def test_concurrent_batches_share_the_process_limits():
+    async def run():
+        limits = BatchLimits(max_concurrency=2, rate_per_minute=0)
+        in_flight = peak = 0
+
+        async def runner(details):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"answer": details}
+
+        async def batch(name):
+            cases = [{"id": f"{name}{i}", "case_details": f"{name}{i}"} for i in range(6)]
+            return [result async for result in run_batch(cases, runner, concurrency=4, shared=limits)]
+
+        first, second = await asyncio.gather(batch("a"), batch("b"))
+        assert len(first) == len(second) == 6
+        assert all(result["status"] == "ok" for result in first + second)
+        assert peak == 2
+
+    asyncio.run(run())
+
+def test_background_runs_count_against_slots_and_yield_to_queued_runs():
+    async def run():
+        scheduler = PipelineScheduler(max_concurrent=1, max_queue=4)
+        background = await scheduler.reserve_background()
+        assert scheduler.stats()["background"] == 1
+
+        queued = scheduler.reserve()
+        assert not queued.admitted
+        waiting = asyncio.ensure_future(scheduler.reserve_background())
+        await asyncio.sleep(0)
+        scheduler.release(background)
+        await asyncio.sleep(0)
+        # The queued interactive run goes first
+        assert queued.admitted and not waiting.done()
+        scheduler.release(queued)
+        second = await asyncio.wait_for(waiting, 1)
+        assert second.admitted and scheduler.stats()["active"] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+import pytest
+
+import cache
+from cache import SQLiteCache, make_key, normalize_query
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    return clock
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), table="entries", ttl=60, max_entries=2)
+
+def test_normalize_query_ignores_case_punctuation_and_abbreviations():
+    assert normalize_query("BSA 2023, Sec. 63B  electronic-evidence") == "bsa 2023 section 63b electronic evidence"
+    assert normalize_query("Art. 21") == normalize_query("article 21")
+
+def test_normalize_query_keeps_word_order_and_repeats():
+    assert normalize_query("section 21 article 14") != normalize_query("section 14 article 21")
+    assert normalize_query("bail bail") == "bail bail"
+
+def test_make_key_is_stable_for_equal_parts():
+    assert make_key("q", {"b": 1, "a": 2}) == make_key("q", {"a": 2, "b": 1})
+    assert make_key("q", {"a": 1}) != make_key("q", {"a": 2})
+
+def test_get_set_and_counters(store, clock):
+    assert store.get("missing") is None
+    store.set("k", {"results": [1, 2]})
+    assert store.get("k") == {"results": [1, 2]}
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+def test_entries_expire_after_ttl(store, clock):
+    store.set("k", "value")
+    clock.now += 61
+    assert store.get("k") is None
+    assert store.stats()["entries"] == 0
+
+def test_least_recently_used_entry_is_evicted(store, clock):
+    store.set("a", 1)
+    clock.now += 1
+    store.set("b", 2)
+    clock.now += 1
+    assert store.get("a") == 1
+    clock.now += 1
+    store.set("c", 3)
+    assert store.get("b") is None
+    assert store.get("a") == 1 and store.get("c") == 3
+
+def test_preencoded_value_is_stored_as_given(store, clock):
+    store.set("k", {"a": 1}, encoded='{"a": 1}')
+    assert store.get("k") == {"a": 1}
+
+def test_empty_path_disables_cache():
+    disabled = SQLiteCache("", table="entries", ttl=60, max_entries=2)
+    disabled.set("k", 1)
+    assert disabled.get("k") is None
+    assert disabled.stats()["enabled"] is False
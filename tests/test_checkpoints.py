@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.fakes import install_fakes, load_recording
+from checkpoints import CheckpointStore
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), ttl=3600)
+
+def test_save_and_load_restore_messages_and_extra(store):
+    state = [
+        HumanMessage(content="case"),
+        AIMessage(content="", tool_calls=[{"name": "AnswerQuestion", "args": {"answer": "a"}, "id": "call_1"}]),
+        ToolMessage(content="{}", tool_call_id="call_1"),
+    ]
+    store.save("run", "case", "search", 1, state, {"compaction": {"tokens_before": 10, "tokens_after": 4}})
+
+    checkpoint = store.load("run")
+    assert (checkpoint["node"], checkpoint["iteration"], checkpoint["status"]) == ("search", 1, "running")
+    assert checkpoint["state"] == state
+    assert checkpoint["extra"] == {"compaction": {"tokens_before": 10, "tokens_after": 4}}
+
+    # Only the latest checkpoint is kept
+    store.save("run", "case", "revision", 1, state[:2], {})
+    assert store.load("run")["node"] == "revision"
+    assert len(store.load("run")["state"]) == 2
+
+def test_set_status_and_get(store):
+    assert store.get("missing") is None
+    store.save("run", "case", "draft", 0, [HumanMessage(content="case")], {})
+    store.set_status("run", "failed")
+    run = store.get("run")
+    assert (run["node"], run["status"]) == ("draft", "failed")
+
+    # A new checkpoint (e.g. after a resume) marks the run running again
+    store.save("run", "case", "search", 1, [HumanMessage(content="case")], {})
+    assert store.get("run")["status"] == "running"
+
+def test_expired_checkpoints_are_dropped_on_save(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), ttl=-1)
+    store.save("old", "case", "draft", 0, [HumanMessage(content="case")], {})
+    store.save("new", "case", "draft", 0, [HumanMessage(content="case")], {})
+    assert store.get("old") is None
+    assert store.get("new") is not None
+
+def test_disabled_store_keeps_nothing():
+    store = CheckpointStore("", ttl=3600)
+    store.save("run", "case", "draft", 0, [HumanMessage(content="case")], {})
+    assert store.get("run") is None and store.load("run") is None
+
+def test_resumed_run_keeps_the_final_pass_routing():
+    import main
+
+    install_fakes(load_recording(), first_token_latency=0.0, chunk_delay=0.0, search_latency=0.0)
+
+    async def events(**kwargs):
+        return [event async for event in main.run_legal_directive(**kwargs)]
+
+    finished = asyncio.run(events(case_details=load_recording()["case_details"] + " (resume)"))
+    run_id = next(event.data["run_id"] for event in finished if event.event_type == "run")
+    checkpoint = main.checkpoint_store.load(run_id)
+    assert checkpoint["extra"]["revision_stages"]
+
+    # Pretend the run failed right after an intermediate revision whose critique is empty
+    last = checkpoint["state"][-1]
+    args = dict(last.tool_calls[0]["args"], reflection={"missing": "", "superfluous": ""})
+    checkpoint["state"][-1] = AIMessage(content="", tool_calls=[dict(last.tool_calls[0], args=args)])
+    checkpoint["node"], checkpoint["iteration"] = "revision", 1
+    checkpoint["extra"].update(revision_stages=["revision"], final_pass=False)
+
+    resumed = asyncio.run(events(case_details=checkpoint["case_details"], checkpoint=checkpoint))
+    stopped = next(event.data for event in resumed if event.event_type == "stopped")
+    assert stopped["reason"] == "critique_empty"
+    assert stopped["final_pass"] is True
+    assert main.checkpoint_store.load(run_id)["extra"]["revision_stages"][-1] == "final_revision"
@@ -0,0 +1,56 @@
+from compaction import compact_search_results, estimate_tokens, split_passages
+
+CASE = "The tenant failed to pay rent and the landlord seeks eviction under the lease agreement."
+
+def page(url: str, text: str):
+    return {"url": url, "title": url.rsplit("/", 1)[-1], "content": text[:100], "raw_content": text}
+
+def filler(topic: str, words: int = 400) -> str:
+    return " ".join(f"{topic}{i % 50}" for i in range(words))
+
+def test_budget_is_respected_and_sources_kept():
+    results = {
+        "eviction for unpaid rent": {
+            "answer": None,
+            "results": [page(f"https://example.org/{i}", filler(f"rent eviction tenant w{i}x", 1200)) for i in range(4)],
+        }
+    }
+    compacted, tokens = compact_search_results(results, CASE, token_budget=500)
+    assert tokens["tokens_before"] > 500
+    assert tokens["tokens_after"] <= 500
+    assert tokens["tokens_after"] == estimate_tokens(compacted)
+    assert [source["url"] for source in compacted["eviction for unpaid rent"]["sources"]] == [f"https://example.org/{i}" for i in range(4)]
+    assert all(passage["url"] for passage in compacted["eviction for unpaid rent"]["passages"])
+
+def test_duplicate_passages_are_kept_once():
+    text = "The landlord may seek eviction of a tenant who fails to pay rent for two consecutive months after notice."
+    results = {"eviction unpaid rent": {"results": [page("https://a.example/1", text), page("https://b.example/2", text)]}}
+    compacted, _ = compact_search_results(results, CASE, token_budget=4000)
+    assert [passage["url"] for passage in compacted["eviction unpaid rent"]["passages"]] == ["https://a.example/1"]
+
+def test_every_query_keeps_its_best_passage():
+    results = {
+        "eviction unpaid rent": {"results": [
+            page("https://a.example/rent", "tenant rent eviction landlord " * 20),
+            page("https://a.example/notice", "landlord notice tenant eviction rent lease " * 15),
+        ]},
+        "security deposit refund": {"results": [page("https://b.example/deposit", "security deposit refund interest " * 20)]},
+    }
+    # Room for two passages: the weaker query's best one beats the stronger query's second
+    compacted, _ = compact_search_results(results, CASE, token_budget=500)
+    assert len(compacted["eviction unpaid rent"]["passages"]) == 1
+    assert len(compacted["security deposit refund"]["passages"]) == 1
+
+def test_errors_pass_through_and_zero_budget_disables():
+    results = {"failed": {"error": "timeout"}, "ok": {"results": [page("https://a.example/1", "rent " * 10)]}}
+    compacted, _ = compact_search_results(results, CASE, token_budget=4000)
+    assert compacted["failed"] == {"error": "timeout"}
+
+    untouched, tokens = compact_search_results(results, CASE, token_budget=0)
+    assert untouched is results
+    assert tokens["tokens_before"] == tokens["tokens_after"]
+
+def test_split_passages_bounds_words():
+    passages = split_passages("word " * 250 + "\n\nshort paragraph", max_words=100)
+    assert all(len(passage.split()) <= 100 for passage in passages)
+    assert passages[-1].endswith("short paragraph")
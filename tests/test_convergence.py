@@ -0,0 +1,127 @@
+import asyncio
+import copy
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import convergence
+from benchmarks.fakes import install_fakes, load_recording
+from convergence import answer_change, query_similarity, stop_reason
+
+ANSWER = " ".join(f"word{i}" for i in range(100))
+
+def answer_message(n: int, answer: str = ANSWER, queries=("limitation period for eviction suits",), missing="case law on arrears", usage=None, **extra):
+    args = {"answer": answer, "search_queries": list(queries), **extra}
+    if missing is not None:
+        args["reflection"] = {"missing": missing, "superfluous": ""}
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": "ReviseAnswer", "args": args, "id": f"call_{n}"}],
+        usage_metadata=usage,
+    )
+
+def state_with(*answers):
+    state = [HumanMessage(content="case")]
+    for n, answer in enumerate(answers):
+        state.extend([answer, ToolMessage(content="{}", tool_call_id=f"call_{n}")])
+    return state[:-1]
+
+def revised(words: int) -> str:
+    """ANSWER with its first `words` words replaced"""
+    parts = ANSWER.split()
+    return " ".join([f"new{i}" for i in range(words)] + parts[words:])
+
+def test_no_answer_yet_continues():
+    assert stop_reason([HumanMessage(content="case")]) is None
+
+def test_critique_empty():
+    assert stop_reason(state_with(answer_message(0, missing=" "))) == "critique_empty"
+
+def test_missing_or_malformed_reflection_is_not_an_empty_critique():
+    assert stop_reason(state_with(answer_message(0, missing=None))) is None
+    assert stop_reason(state_with(answer_message(0, missing=None, reflection="none"))) is None
+
+def test_no_search_queries():
+    assert stop_reason(state_with(answer_message(0, queries=()))) == "no_search_queries"
+
+def test_queries_repeated_at_the_jaccard_threshold(monkeypatch):
+    first = answer_message(0, queries=["a b c d e"])
+    # 4 shared terms of 5: Jaccard 0.8
+    at_threshold = answer_message(1, answer=revised(50), queries=["a b c d"])
+    below = answer_message(1, answer=revised(50), queries=["a b c f"])
+    assert query_similarity("a b c d e", "a b c d") == pytest.approx(0.8)
+
+    monkeypatch.setattr(convergence, "QUERY_SIMILARITY_THRESHOLD", 0.8)
+    assert stop_reason(state_with(first, at_threshold)) == "queries_repeated"
+    assert stop_reason(state_with(first, below)) is None
+    # Every new query has to repeat an executed one
+    mixed = answer_message(1, answer=revised(50), queries=["a b c d", "security deposit refund"])
+    assert stop_reason(state_with(first, mixed)) is None
+
+def test_answer_converged(monkeypatch):
+    monkeypatch.setattr(convergence, "ANSWER_CHANGE_THRESHOLD", 0.05)
+    first = answer_message(0, queries=["first query"])
+    assert answer_change(ANSWER, revised(2)) < 0.05
+    assert stop_reason(state_with(first, answer_message(1, answer=revised(2), queries=["second query"]))) == "answer_converged"
+    assert stop_reason(state_with(first, answer_message(1, answer=revised(30), queries=["second query"]))) is None
+
+def test_time_budget(monkeypatch):
+    monkeypatch.setattr(convergence, "RUN_TIME_BUDGET_SECONDS", 10)
+    state = state_with(answer_message(0))
+    assert stop_reason(state, time.monotonic() - 11) == "time_budget"
+    assert stop_reason(state, time.monotonic()) is None
+
+    monkeypatch.setattr(convergence, "RUN_TIME_BUDGET_SECONDS", 0)
+    assert stop_reason(state, time.monotonic() - 11) is None
+
+def test_token_budget(monkeypatch):
+    state = state_with(answer_message(0, usage={"input_tokens": 900, "output_tokens": 100, "total_tokens": 1000}))
+    monkeypatch.setattr(convergence, "RUN_TOKEN_BUDGET", 1000)
+    assert stop_reason(state) == "token_budget"
+    monkeypatch.setattr(convergence, "RUN_TOKEN_BUDGET", 1001)
+    assert stop_reason(state) is None
+
+def run_pipeline(recording, case_details: str):
+    import main
+
+    search = install_fakes(recording, first_token_latency=0.0, chunk_delay=0.0, search_latency=0.0)
+
+    async def run():
+        return [event async for event in main.run_legal_directive(case_details)]
+
+    events = asyncio.run(run())
+    stopped = next(event.data for event in events if event.event_type == "stopped")
+    revisions = sum(event.event_type == "stage" and event.data["current"] == "revision" for event in events)
+    return stopped, search, revisions
+
+def test_draft_with_empty_critique_is_still_researched_and_revised():
+    recording = copy.deepcopy(load_recording())
+    recording["draft"]["reflection"] = {"missing": "", "superfluous": ""}
+    stopped, search, revisions = run_pipeline(recording, recording["case_details"] + " (empty draft critique)")
+    assert stopped["iterations"] >= 1
+    assert search.calls > 0
+    assert revisions >= 1
+
+def test_llm_calls_saved_and_final_pass_accounting():
+    import main
+
+    recording = load_recording()
+    stopped, _, _ = run_pipeline(recording, recording["case_details"] + " (accounting)")
+    # The recording's first revision still misses something: both iterations run, nothing is saved
+    assert (stopped["reason"], stopped["iterations"]) == ("max_iterations", 2)
+    assert (stopped["llm_calls_saved"], stopped["final_pass"]) == (0, False)
+
+    # Converging on an intermediate (routed) revision costs one final pass, which is not a saved call
+    converging = copy.deepcopy(recording)
+    converging["revisions"][0]["reflection"] = {"missing": "", "superfluous": ""}
+    stopped, _, revisions = run_pipeline(converging, recording["case_details"] + " (converges early)")
+    assert stopped["reason"] == "critique_empty"
+    assert stopped["iterations"] == 1
+    if main.is_routed("revision"):
+        assert stopped["final_pass"] is True
+        assert revisions == 2
+        assert stopped["llm_calls_saved"] == 0
+    else:
+        assert stopped["final_pass"] is False
+        assert stopped["llm_calls_saved"] == 1
@@ -0,0 +1,75 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from conversation_state import budget_messages, message_tokens, split_rounds
+from encoder import dumps, loads
+
+def round_messages(n: int, answer_words: int = 400, evidence_words: int = 400):
+    call_id = f"call_{n}"
+    ai = AIMessage(content="", tool_calls=[{
+        "name": "ReviseAnswer",
+        "args": {
+            "answer": " ".join(f"answer{n}" for _ in range(answer_words)),
+            "reflection": {"missing": f"missing {n}", "superfluous": ""},
+            "search_queries": [f"query {n}"],
+            "references": [f"https://example.org/{n}"],
+        },
+        "id": call_id,
+    }])
+    evidence = {f"query {n}": {
+        "sources": [{"url": f"https://example.org/{n}", "title": "t"}],
+        "passages": [{"url": f"https://example.org/{n}", "text": " ".join(f"evidence{n}" for _ in range(evidence_words))}],
+    }}
+    return [ai, ToolMessage(content=dumps(evidence), tool_call_id=call_id)]
+
+def history(rounds: int):
+    state = [SystemMessage(content="system"), HumanMessage(content="The tenant has not paid rent since March.")]
+    for n in range(rounds):
+        state.extend(round_messages(n))
+    return state
+
+def test_small_history_is_sent_as_is():
+    state = history(2)
+    messages, stats = budget_messages(state, token_budget=100_000)
+    assert len(messages) == len(state)
+    assert stats["rounds_dropped"] == 0
+    # Older rounds are still condensed
+    assert stats["rounds_condensed"] == 1
+    assert stats["tokens_sent"] < stats["tokens_full"]
+
+def test_head_and_latest_round_are_kept_in_full():
+    state = history(4)
+    messages, _ = budget_messages(state, token_budget=100_000)
+    head, rounds = split_rounds(state)
+    assert messages[:len(head)] == head
+    assert messages[-2:] == rounds[-1]
+
+def test_older_rounds_are_condensed_to_urls():
+    state = history(3)
+    messages, _ = budget_messages(state, token_budget=100_000)
+    older_ai, older_tool = messages[2], messages[3]
+    args = older_ai.tool_calls[0]["args"]
+    assert "reflection" not in args
+    assert args["answer"].endswith("[earlier draft truncated]")
+    assert args["references"] == ["https://example.org/0"]
+    assert older_tool.tool_call_id == older_ai.tool_calls[0]["id"]
+    assert loads(older_tool.content)["query 0"]["sources"] == ["https://example.org/0"]
+
+def test_budget_drops_oldest_rounds_first():
+    state = history(6)
+    head, rounds = split_rounds(state)
+    required = sum(message_tokens(message) for message in head + rounds[-1])
+    messages, stats = budget_messages(state, token_budget=required + 200)
+
+    assert stats["tokens_sent"] <= required + 200
+    assert stats["tokens_sent"] == sum(message_tokens(message) for message in messages)
+    assert stats["rounds_dropped"] > 0
+    assert stats["rounds_condensed"] + stats["rounds_dropped"] == len(rounds) - 1
+    # What survives is the newest older rounds, in order
+    kept_ids = [message.tool_calls[0]["id"] for message in messages if isinstance(message, AIMessage)]
+    assert kept_ids == [f"call_{n}" for n in range(len(rounds) - 1 - stats["rounds_condensed"], len(rounds))]
+
+def test_latest_round_is_kept_even_over_budget():
+    state = history(3)
+    messages, stats = budget_messages(state, token_budget=10)
+    assert messages[-2:] == split_rounds(state)[1][-1]
+    assert stats["rounds_dropped"] == 2
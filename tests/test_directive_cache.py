@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import install_fakes, load_recording
+from cache import SQLiteCache
+from directive_cache import directive_cache_key
+
+@pytest.fixture
+def cached_main(tmp_path, monkeypatch):
+    import main
+
+    cache = SQLiteCache(str(tmp_path / "directives.sqlite3"), table="directives", ttl=3600, max_entries=10)
+    monkeypatch.setattr(main, "directive_cache", cache)
+    return main
+
+def collect(main, case_details: str, **kwargs):
+    async def run():
+        return [formatted async for formatted in await main.open_directive_stream(case_details, **kwargs)]
+    return asyncio.run(run())
+
+def test_cache_key_ignores_spacing_but_not_modes():
+    assert directive_cache_key("Tenant  unpaid\nrent ") == directive_cache_key("Tenant unpaid rent")
+    assert directive_cache_key("case", "lean") != directive_cache_key("case", "full")
+    assert directive_cache_key("case", "lean", "single") != directive_cache_key("case", "lean", "sections")
+
+def test_finished_run_is_replayed_without_running_the_pipeline(cached_main):
+    search = install_fakes(load_recording(), first_token_latency=0.0, chunk_delay=0.0, search_latency=0.0)
+    case_details = load_recording()["case_details"] + " (cache replay)"
+
+    fresh = collect(cached_main, case_details)
+    assert any(formatted.startswith("event: final\n") for formatted in fresh)
+    searches = search.calls
+
+    replayed = collect(cached_main, case_details + "  ")
+    assert replayed[0].startswith("event: cache\n")
+    assert replayed[1:] == fresh
+    assert search.calls == searches
+
+    # Another stream mode is a different recording
+    full = collect(cached_main, case_details, stream_mode="full")
+    assert not full[0].startswith("event: cache\n")
+
+def test_use_cache_false_runs_again(cached_main):
+    search = install_fakes(load_recording(), first_token_latency=0.0, chunk_delay=0.0, search_latency=0.0)
+    case_details = load_recording()["case_details"] + " (cache bypass)"
+
+    collect(cached_main, case_details)
+    searches = search.calls
+    rerun = collect(cached_main, case_details, use_cache=False)
+    assert not rerun[0].startswith("event: cache\n")
+    assert search.calls > searches
@@ -0,0 +1,85 @@
+import dataclasses
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+from pydantic import BaseModel
+
+import encoder
+from encoder import dumps, loads
+
+BACKENDS = ["json", pytest.param("orjson", marks=pytest.mark.skipif(encoder.orjson is None, reason="orjson not installed"))]
+
+class Reflection(BaseModel):
+    missing: str
+    superfluous: str
+
+@dataclasses.dataclass
+class Hit:
+    url: str
+    score: float
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, monkeypatch):
+    monkeypatch.setattr(encoder, "JSON_BACKEND", request.param)
+    return request.param
+
+def test_plain_payload_round_trips(backend):
+    payload = {"query": "rent act § 12", "results": [{"url": "https://example.org", "score": 0.5, "tags": ["a"], "raw_content": None}], "ok": True}
+    text = dumps(payload)
+    assert isinstance(text, str)
+    assert loads(text) == payload
+    assert loads(text.encode("utf-8")) == payload
+    # Compact and unescaped, like the standard library with these options
+    assert text == json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+def test_unknown_values_go_through_default(backend):
+    message = AIMessage(content="", tool_calls=[{"name": "AnswerQuestion", "args": {"answer": "a"}, "id": "call_0"}])
+    payload = {
+        1: "int key",
+        "error": ValueError("boom"),
+        "reflection": Reflection(missing="case law", superfluous=""),
+        "hit": Hit("https://example.org", 0.9),
+        "pair": ("a", "b"),
+        "raw": b"bytes",
+        "message": message,
+    }
+    decoded = loads(dumps(payload))
+    assert decoded["1"] == "int key"
+    assert decoded["error"] == {"error": True, "error_type": "ValueError", "error_message": "boom"}
+    assert decoded["reflection"] == {"missing": "case law", "superfluous": ""}
+    assert decoded["hit"] == {"url": "https://example.org", "score": 0.9}
+    assert decoded["pair"] == ["a", "b"]
+    assert decoded["raw"] == "bytes"
+    assert decoded["message"]["type"] == "ai"
+    assert decoded["message"]["tool_calls"][0]["args"] == {"answer": "a"}
+
+def test_backends_agree(monkeypatch):
+    if encoder.orjson is None:
+        pytest.skip("orjson not installed")
+    payload = {"error": KeyError("k"), "hit": Hit("u", 1.0), "nested": [{"a": (1, 2)}], 3: None}
+    monkeypatch.setattr(encoder, "JSON_BACKEND", "json")
+    with_json = dumps(payload)
+    monkeypatch.setattr(encoder, "JSON_BACKEND", "orjson")
+    with_orjson = dumps(payload)
+    assert loads(with_json) == loads(with_orjson)
+
+def test_values_the_fast_path_refuses_fall_back(backend):
+    # Beyond 64 bits for orjson, circular for json and orjson
+    assert dumps({"big": 2 ** 70, "error": ValueError("x")}) == \
+        '{"big":1180591620717411303424,"error":{"error":true,"error_type":"ValueError","error_message":"x"}}'
+
+    cyclic = {"name": "root"}
+    cyclic["self"] = cyclic
+    decoded = loads(dumps(cyclic))
+    depth = 0
+    while isinstance(decoded, dict):
+        decoded, depth = decoded["self"], depth + 1
+    assert depth <= encoder.MAX_DEPTH
+    assert isinstance(decoded, str)
+
+def test_to_jsonable_does_not_copy_safe_containers():
+    payload = {"results": [{"url": "u", "score": 1.0}]}
+    assert encoder.to_jsonable(payload) is payload
+    converted = encoder.to_jsonable({"results": [{"url": "u"}, ("t",)]})
+    assert converted == {"results": [{"url": "u"}, ["t"]]}
@@ -0,0 +1,84 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import ingest
+from ingest import condense_files, extract_text, paragraph_key
+
+def message(subject: str, body: str, attachment: bytes = b"") -> bytes:
+    parts = [
+        f"From: a@example.org\nTo: b@example.org\nSubject: {subject}\n"
+        "MIME-Version: 1.0\nContent-Type: multipart/mixed; boundary=\"b\"\n\n"
+        f"--b\nContent-Type: text/plain\n\n{body}\n"
+    ]
+    if attachment:
+        parts.append("--b\nContent-Type: application/octet-stream\nContent-Transfer-Encoding: base64\n\n")
+    data = "".join(parts).encode()
+    if attachment:
+        data += attachment + b"\n"
+    return data + b"--b--\n"
+
+def test_paragraph_key_ignores_quote_markers_case_and_punctuation():
+    assert paragraph_key("> > The tenant paid Rs. 5,000.") == paragraph_key("the TENANT paid rs 5 000")
+    assert paragraph_key("The tenant paid") != paragraph_key("The landlord paid")
+
+def test_mbox_messages_are_parsed_one_at_a_time(tmp_path):
+    path = tmp_path / "export.mbox"
+    path.write_bytes(
+        b"From a@example.org Mon Jan  1 00:00:00 2024\n" + message("Notice", "Notice served on 1 March 2024.") +
+        b"\nFrom b@example.org Tue Jan  2 00:00:00 2024\n" + message("Reply", "Payment of Rs. 5,000 is disputed.")
+    )
+    text = "".join(extract_text(str(path)))
+    assert "Subject: Notice" in text and "Notice served on 1 March 2024." in text
+    assert "Subject: Reply" in text and "Payment of Rs. 5,000 is disputed." in text
+    assert "From a@example.org Mon" not in text
+
+def test_emails_are_parsed_from_their_first_bytes_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_EMAIL_BYTES", 4096)
+    path = tmp_path / "large.eml"
+    path.write_bytes(message("Agreement", "The agreement was terminated on 2 April 2024.", b"QUJD" * 100_000))
+    text = "".join(extract_text(str(path)))
+    assert "Subject: Agreement" in text
+    assert "terminated on 2 April 2024." in text
+    assert "QUJD" not in text
+
+def test_condense_drops_quoted_repeats(tmp_path):
+    path = tmp_path / "thread.txt"
+    path.write_text("The hearing was adjourned to 5 May 2024.\n\nOn Mon, A wrote:\n\n> The hearing was adjourned to 5 May 2024.\n")
+    result = condense_files([("thread.txt", str(path), path.stat().st_size)])
+    assert result["stats"]["duplicates"] == 1
+    assert result["case_details"].count("adjourned") == 1
+
+@pytest.fixture
+def client():
+    import main
+    return TestClient(main.app)
+
+def test_oversized_upload_is_rejected_before_parsing(client, monkeypatch):
+    import main
+
+    parsed = []
+    monkeypatch.setattr(main, "ingest_uploads", lambda *args: parsed.append(args))
+    size = main.CASE_UPLOAD_MAX_BYTES + main.UPLOAD_FORM_OVERHEAD_BYTES + 1
+    response = client.post("/ingest_case", content=b"x", headers={"Content-Length": str(size), "Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
+    assert not parsed
+
+def test_chunked_upload_is_cut_off_at_the_limit(client, monkeypatch):
+    import main
+
+    middleware = next(m for m in main.app.user_middleware if m.cls is main.UploadSizeLimit)
+    monkeypatch.setitem(middleware.kwargs, "max_bytes", 1024)
+    main.app.middleware_stack = None
+
+    def body():
+        boundary_start = b"--b\r\nContent-Disposition: form-data; name=\"files\"; filename=\"a.txt\"\r\n\r\n"
+        yield boundary_start
+        for _ in range(16):
+            yield b"x" * 256
+
+    try:
+        response = client.post("/ingest_case", content=body(), headers={"Content-Type": "multipart/form-data; boundary=b"})
+    finally:
+        main.app.middleware_stack = None
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Upload exceeds")
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from jobs import JobStore
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+async def stream(*items, gate: asyncio.Event = None, fail: bool = False):
+    for item in items:
+        yield item
+    if gate is not None:
+        await gate.wait()
+    if fail:
+        raise RuntimeError("pipeline failed")
+
+async def collect(store: JobStore, job_id: str, after: int = 0):
+    return [event async for event in store.events(job_id, after)]
+
+def test_job_logs_every_event_and_completes(path):
+    async def run():
+        store = JobStore(path, ttl=3600)
+        job_id = await store.create(stream("a", "b", "c"))
+        assert await collect(store, job_id) == [(1, "a"), (2, "b"), (3, "c")]
+        assert await collect(store, job_id, after=2) == [(3, "c")]
+        job = store.get(job_id)
+        assert (job["status"], job["events"]) == ("completed", 3)
+
+    asyncio.run(run())
+
+def test_reader_follows_a_running_job(path):
+    async def run():
+        store = JobStore(path, ttl=3600, poll_interval=0.05)
+        gate = asyncio.Event()
+        job_id = await store.create(stream("a", gate=gate))
+        reader = asyncio.ensure_future(collect(store, job_id))
+        await asyncio.sleep(0.1)
+        assert not reader.done()
+        gate.set()
+        assert await reader == [(1, "a")]
+
+    asyncio.run(run())
+
+def test_other_process_reads_shared_log(path):
+    async def run():
+        owner, reader = JobStore(path, ttl=3600), JobStore(path, ttl=3600, poll_interval=0.01)
+        job_id = await owner.create(stream("a", "b"))
+        await owner._tasks[job_id]
+        assert await collect(reader, job_id) == [(1, "a"), (2, "b")]
+        assert reader.cancel(job_id) is False
+
+    asyncio.run(run())
+
+def test_cancelled_and_failed_jobs_keep_their_log(path):
+    async def run():
+        store = JobStore(path, ttl=3600)
+        job_id = await store.create(stream("a", gate=asyncio.Event()))
+        await asyncio.sleep(0.05)
+        assert store.cancel(job_id)
+        assert await collect(store, job_id) == [(1, "a")]
+        assert store.get(job_id)["status"] == "cancelled"
+
+        failed = await store.create(stream("x", fail=True))
+        assert await collect(store, failed) == [(1, "x")]
+        assert store.get(failed)["status"] == "failed"
+
+    asyncio.run(run())
+
+def test_expired_jobs_are_removed_when_new_jobs_arrive(path, monkeypatch):
+    async def run():
+        store = JobStore(path, ttl=60)
+        old = await store.create(stream("a"))
+        await store._tasks[old]
+        later = time.time() + 120
+        monkeypatch.setattr("jobs.time.time", lambda: later)
+        new = await store.create(stream("b"))
+        await store._tasks[new]
+        assert store.get(old) is None
+        assert store.get(new)["status"] == "completed"
+        assert await collect(store, "unknown") == []
+
+    asyncio.run(run())
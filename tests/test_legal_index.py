@@ -0,0 +1,65 @@
+import pytest
+
+import legal_index
+from legal_index import LegalIndex, act_matches, parse_statute_text
+
+BSA = "Bharatiya Sakshya Adhiniyam, 2023"
+BSA_URL = "https://www.indiacode.nic.in/bsa"
+
+STATUTE = """63. Admissibility of electronic records.—(1) Any information contained in an electronic record
+shall be deemed to be also a document if the conditions in this section are satisfied.
+(4) A certificate identifying the electronic record shall accompany it.
+64. Proof as to electronic signature.—Except in the case of a secure electronic signature,
+the signature must be proved to be that of the subscriber.
+65. Proof as to verification of digital signature.—The court may direct the person to produce the certificate for the electronic record.
+"""
+
+@pytest.fixture
+def index(tmp_path):
+    index = LegalIndex(str(tmp_path / "legal.sqlite3"))
+    index.upsert(parse_statute_text(STATUTE, BSA, BSA_URL))
+    return index
+
+def page(url: str, text: str):
+    return {"url": url, "title": "Judgment", "content": text}
+
+def test_act_matches_full_name_and_acronyms():
+    assert act_matches(BSA, {"bharatiya", "sakshya", "adhiniyam"})
+    assert act_matches(BSA, {"bsa", "section", "63"})
+    assert act_matches("Consumer Protection Act, 2019", {"cpa"})
+    assert act_matches("Motor Vehicles Act, 1988", {"mv", "act"})
+    assert not act_matches(BSA, {"consumer", "protection"})
+
+def test_act_and_section_match_answers_locally(index):
+    result = index.lookup("BSA sec. 63 certificate requirement")
+    assert result["source"] == "local_index"
+    assert result["results"][0]["title"].startswith(f"{BSA} Section 63")
+    assert result["results"][0]["url"] == BSA_URL
+
+def test_section_number_of_another_act_goes_to_tavily(index):
+    assert index.lookup("Specific Relief Act section 63 specific performance") is None
+    assert index.stats()["misses"] == 1
+
+def test_partial_term_overlap_goes_to_tavily(index):
+    # Shares "electronic" and "signature" with the statute, but asks about something else
+    assert index.lookup("electronic signature requirements for GST invoices under CGST rules") is None
+
+def test_most_terms_matching_in_enough_sections_answers_locally(index):
+    result = index.lookup("certificate electronic record")
+    assert result is not None
+    assert all(item["url"] for item in result["results"])
+
+def test_sections_without_url_are_never_returned(tmp_path):
+    index = LegalIndex(str(tmp_path / "legal.sqlite3"))
+    index.upsert(parse_statute_text(STATUTE, BSA))
+    assert index.search("BSA section 63")
+    assert index.lookup("BSA section 63") is None
+
+def test_search_results_are_only_indexed_when_opted_in(index, monkeypatch):
+    result = {"results": [page("https://example.org/judgment", "Certificate for electronic record under section 63")]}
+    assert index.add_search_results(result) == {}
+    assert "search_result" not in index.stats()["documents"]
+
+    monkeypatch.setattr(legal_index, "LOCAL_INDEX_AUTO_ADD", True)
+    assert index.add_search_results(result)["added"] == 1
+    assert index.stats()["documents"]["search_result"] == 1
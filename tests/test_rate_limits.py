@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+import rate_limits
+from rate_limits import ProviderLimiter, TokenBucket, error_status, retry_after_seconds
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limits.time, "monotonic", clock)
+    return clock
+
+def drain(limiter: ProviderLimiter, priority: str) -> int:
+    taken = 0
+    while limiter._try_acquire(0, priority) == 0:
+        taken += 1
+    return taken
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(per_minute=60, capacity=10)
+    bucket.take(10)
+    bucket.refill(bucket._updated + 4)
+    assert bucket.level == pytest.approx(4)
+    assert bucket.wait_time(6) == pytest.approx(2)
+    bucket.refill(bucket._updated + 60)
+    assert bucket.level == 10
+
+def test_batch_uses_the_whole_bucket_without_interactive_traffic(clock):
+    # 60/min with 10 s bursts: 10 requests
+    limiter = ProviderLimiter("test", requests_per_minute=60)
+    assert drain(limiter, "batch") == 10
+
+def test_batch_leaves_the_reserve_while_interactive_traffic_is_recent(clock):
+    limiter = ProviderLimiter("test", requests_per_minute=60)
+    assert limiter._try_acquire(0, "interactive") == 0
+    # 9 left, a quarter of the bucket stays reserved
+    assert drain(limiter, "batch") == 6
+    assert drain(limiter, "interactive") == 3
+
+    clock.now += rate_limits.RATE_LIMIT_INTERACTIVE_WINDOW + 10
+    assert drain(limiter, "batch") == 10
+
+def test_batch_waits_while_interactive_calls_wait():
+    limiter = ProviderLimiter("test", requests_per_minute=6000, tokens_per_minute=600)
+
+    async def run():
+        await limiter.acquire(tokens=100)
+        # The token bucket is empty: this call waits ~0.3 s for its refill
+        waiter = asyncio.create_task(limiter.acquire(tokens=3))
+        await asyncio.sleep(0.05)
+        assert limiter.stats()["waiting"]["interactive"] == 1
+        # A batch call that needs no tokens still yields to it
+        assert limiter._try_acquire(0, "batch") > 0
+        await waiter
+        assert limiter.stats()["waiting"]["interactive"] == 0
+
+    asyncio.run(run())
+
+class Throttled(Exception):
+    status_code = 429
+
+def test_error_status_and_retry_after():
+    assert error_status(Throttled()) == 429
+    assert error_status(RuntimeError("503 Service Unavailable")) == 503
+    assert error_status(ValueError("bad request")) is None
+    assert retry_after_seconds(RuntimeError("Please retry in 23.5s.")) == 23.5
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from scheduler import PipelineScheduler, QueueFull
+
+def test_admits_up_to_max_concurrent_then_queues_then_rejects():
+    async def run():
+        scheduler = PipelineScheduler(max_concurrent=2, max_queue=1, initial_run_seconds=30)
+        running = [scheduler.reserve(), scheduler.reserve()]
+        assert all(ticket.admitted for ticket in running)
+
+        queued = scheduler.reserve()
+        assert not queued.admitted
+
+        with pytest.raises(QueueFull) as rejected:
+            scheduler.reserve()
+        # Position 2 with 2 slots: one average run
+        assert rejected.value.retry_after == 30
+        assert scheduler.stats()["rejected"] == 1
+        assert (scheduler.active, len(scheduler._queue)) == (2, 1)
+
+    asyncio.run(run())
+
+def test_release_admits_queued_runs_in_order():
+    async def run():
+        scheduler = PipelineScheduler(max_concurrent=1, max_queue=3)
+        running = scheduler.reserve()
+        first, second = scheduler.reserve(), scheduler.reserve()
+
+        scheduler.release(running)
+        assert first.admitted and not second.admitted
+        assert first.future.done()
+        scheduler.release(first)
+        assert second.admitted
+        assert scheduler.stats()["completed"] == 2
+
+        # Releasing twice is harmless
+        scheduler.release(first)
+        assert scheduler.active == 1
+
+    asyncio.run(run())
+
+def test_releasing_a_queued_ticket_gives_up_its_place():
+    async def run():
+        scheduler = PipelineScheduler(max_concurrent=1, max_queue=2)
+        running = scheduler.reserve()
+        abandoned, waiting = scheduler.reserve(), scheduler.reserve()
+
+        scheduler.release(abandoned)
+        assert not abandoned.admitted
+        assert list(scheduler._queue) == [waiting]
+        assert scheduler.stats()["completed"] == 0
+
+        scheduler.release(running)
+        assert waiting.admitted and not abandoned.admitted
+        assert scheduler.active == 1
+
+    asyncio.run(run())
+
+def test_wait_reports_queue_position():
+    async def run():
+        scheduler = PipelineScheduler(max_concurrent=1, max_queue=2, initial_run_seconds=10)
+        running = scheduler.reserve()
+        ahead = scheduler.reserve()
+        queued = scheduler.reserve()
+
+        updates = []
+
+        async def follow():
+            async for position, wait in scheduler.wait(queued):
+                updates.append((position, wait))
+
+        follower = asyncio.create_task(follow())
+        await asyncio.sleep(0)
+        scheduler.release(running)
+        await asyncio.sleep(0.01)
+        scheduler.release(ahead)
+        await asyncio.wait_for(follower, 1)
+        # Two runs ahead with one slot: two average runs, then the estimate follows the finished run
+        assert updates[0] == (2, 20)
+        assert [position for position, _ in updates] == [2, 1]
+        assert queued.admitted
+
+    asyncio.run(run())
+
+def test_background_runs_yield_to_queued_interactive_runs():
+    async def run():
+        scheduler = PipelineScheduler(max_concurrent=1, max_queue=2)
+        running = scheduler.reserve()
+        interactive = scheduler.reserve()
+
+        background = asyncio.create_task(scheduler.reserve_background())
+        await asyncio.sleep(0)
+        scheduler.release(running)
+        await asyncio.sleep(0)
+        # The freed slot went to the queued interactive run, not the batch case
+        assert interactive.admitted
+        assert not background.done()
+
+        scheduler.release(interactive)
+        ticket = await asyncio.wait_for(background, 1)
+        assert ticket.admitted and ticket.background
+        assert scheduler.stats()["background"] == 1
+
+        # A background run holds a slot: interactive requests queue behind it
+        queued = scheduler.reserve()
+        assert not queued.admitted
+        scheduler.release(ticket)
+        assert queued.admitted and scheduler.stats()["background"] == 0
+
+    asyncio.run(run())
+
+def test_full_queue_maps_to_503_with_retry_after(monkeypatch):
+    import main
+
+    async def full_queue(*args, **kwargs):
+        raise QueueFull(42)
+
+    monkeypatch.setattr(main, "open_directive_stream", full_queue)
+    response = TestClient(main.app).post("/generate_directive", json={"case_details": "case"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "42"
+    assert "retry after 42s" in response.json()["detail"]
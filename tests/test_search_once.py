@@ -0,0 +1,57 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from benchmarks.fakes import install_fakes, load_recording
+
+@pytest.fixture
+def fake_search():
+    return install_fakes(load_recording(), first_token_latency=0.0, chunk_delay=0.0, search_latency=0.0)
+
+def test_execute_tools_runs_shared_queries_once(fake_search):
+    from execute_tools import aexecute_tools, execute_tools
+
+    state = [
+        HumanMessage(content="case"),
+        AIMessage(content="", tool_calls=[
+            {"name": "AnswerQuestion", "args": {"search_queries": ["q1", "q2"]}, "id": "call_1"},
+            {"name": "ReviseAnswer", "args": {"search_queries": ["q2", "q3"]}, "id": "call_2"},
+        ]),
+    ]
+    messages = execute_tools(state)
+    assert Counter(fake_search.queries) == {"q1": 1, "q2": 1, "q3": 1}
+    assert [message.tool_call_id for message in messages] == ["call_1", "call_2"]
+
+    fake_search.queries.clear()
+    messages = asyncio.run(aexecute_tools(state))
+    assert Counter(fake_search.queries) == {"q1": 1, "q2": 1, "q3": 1}
+    assert len(messages) == 2
+
+def test_pipeline_searches_each_query_once_per_iteration(fake_search):
+    import main
+
+    async def run():
+        # Calls made before each "iteration" event belong to the previous one
+        # (the draft's speculative searches count towards iteration 1)
+        boundaries, results = [], {}
+        async for event in main.run_legal_directive(load_recording()["case_details"] + " (search once)"):
+            if event.event_type == "iteration" and event.data["current"] > 1:
+                boundaries.append(len(fake_search.queries))
+            elif event.event_type == "search_result":
+                results.setdefault(event.data["query"], 0)
+                results[event.data["query"]] += 1
+            assert event.event_type != "error", event.data
+        return boundaries, results
+
+    boundaries, results = asyncio.run(run())
+    edges = [0, *boundaries, len(fake_search.queries)]
+    iterations = [fake_search.queries[start:end] for start, end in zip(edges, edges[1:])]
+
+    assert len(iterations) >= 2
+    for queries in iterations:
+        assert queries, "every iteration searches"
+        assert max(Counter(queries).values()) == 1
+    # Each search_result event was served by exactly one search call
+    assert sum(results.values()) == len(fake_search.queries)
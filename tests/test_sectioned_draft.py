@@ -0,0 +1,78 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+
+from benchmarks.fakes import install_fakes, load_recording
+
+class ScriptedCritique:
+    """Critique chain returning the given messages in turn"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        response = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        return response
+
+def critique_call(args):
+    return AIMessage(content="", tool_calls=[{"name": "DraftCritique", "args": args, "id": "call_critique"}])
+
+def run_draft(monkeypatch, critique):
+    import main
+
+    recording = load_recording()
+    install_fakes(recording, first_token_latency=0.0, chunk_delay=0.0, search_latency=0.0)
+    monkeypatch.setattr(main, "get_critique_chain", lambda: critique)
+
+    async def run():
+        responses = []
+        events = [event async for event in main.stream_sectioned_draft(main.HumanMessage(content=recording["case_details"]), responses)]
+        return events, responses
+
+    events, responses = asyncio.run(run())
+    return recording, events, responses
+
+def event_types(events):
+    return [event.event_type for event in events]
+
+def test_valid_critique_is_merged_into_the_draft(monkeypatch):
+    recording = load_recording()
+    reflection = {"missing": "case law on arrears", "superfluous": ""}
+    critique = ScriptedCritique(critique_call({"search_queries": ["arrears case law"], "reflection": reflection}))
+    _, events, responses = run_draft(monkeypatch, critique)
+
+    assert critique.calls == 1
+    assert "validation" not in event_types(events)
+    args = responses[0].tool_calls[0]["args"]
+    assert args["reflection"] == reflection
+    assert args["search_queries"] == ["arrears case law"]
+    assert next(event.data for event in events if event.event_type == "draft_complete")["mode"] == "sections"
+    assert args["answer"] != recording["draft"]["answer"]
+
+def test_failed_critique_is_retried(monkeypatch):
+    valid = critique_call({"search_queries": ["arrears case law"], "reflection": {"missing": "arrears", "superfluous": ""}})
+    critique = ScriptedCritique(AIMessage(content="no tool call"), valid)
+    _, events, responses = run_draft(monkeypatch, critique)
+
+    assert critique.calls == 2
+    validation = [event.data for event in events if event.event_type == "validation"]
+    assert validation == [{"stage": "critique", "schema": "DraftCritique", "valid": False}]
+    assert responses[0].tool_calls[0]["args"]["search_queries"] == ["arrears case law"]
+
+def test_draft_without_a_valid_critique_is_redone_as_a_single_call(monkeypatch):
+    import main
+
+    # A missing tool call and a malformed one never read as "nothing missing"
+    critique = ScriptedCritique(AIMessage(content=""), critique_call({"search_queries": ["q"]}))
+    recording, events, responses = run_draft(monkeypatch, critique)
+
+    assert critique.calls == main.DRAFT_CRITIQUE_ATTEMPTS
+    assert event_types(events).count("validation") == main.DRAFT_CRITIQUE_ATTEMPTS
+    assert "error" not in event_types(events)
+    assert len(responses) == 1
+    args = responses[0].tool_calls[0]["args"]
+    assert args["answer"] == recording["draft"]["answer"]
+    assert args["reflection"] == recording["draft"]["reflection"]
+    assert args["reflection"]["missing"]
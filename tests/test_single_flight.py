@@ -0,0 +1,88 @@
+import asyncio
+
+from single_flight import SingleFlight
+
+class Source:
+    """An async stream fed by the test, recording whether it was cancelled"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.cancelled = False
+
+    async def stream(self):
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is None:
+                    return
+                yield item
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+async def take(subscription, count):
+    return [await subscription.__anext__() for _ in range(count)]
+
+def test_late_joiner_replays_buffered_items_then_follows_live():
+    async def run():
+        flight, source = SingleFlight(), Source()
+        first, joined = flight.join("case", source.stream)
+        assert not joined
+        early = first.subscribe()
+        source.queue.put_nowait("a")
+        source.queue.put_nowait("b")
+        assert await take(early, 2) == ["a", "b"]
+
+        second, joined = flight.join("case", source.stream)
+        assert joined and second is first
+        late = second.subscribe()
+        assert await take(late, 2) == ["a", "b"]
+        source.queue.put_nowait("c")
+        source.queue.put_nowait(None)
+        assert [item async for item in early] == ["c"]
+        assert [item async for item in late] == ["c"]
+        await first.task
+        assert not flight.is_running("case")
+
+    asyncio.run(run())
+
+def test_run_is_cancelled_when_last_subscriber_leaves():
+    async def run():
+        flight, source = SingleFlight(), Source()
+        shared, _ = flight.join("case", source.stream)
+        one, two = shared.subscribe(), shared.subscribe()
+        source.queue.put_nowait("a")
+        await take(one, 1)
+        await take(two, 1)
+        await one.aclose()
+        await asyncio.sleep(0)
+        assert not shared.task.done()
+        await two.aclose()
+        await asyncio.sleep(0)
+        assert source.cancelled and shared.task.done()
+
+    asyncio.run(run())
+
+def test_joiner_that_never_streams_does_not_keep_the_run_alive():
+    async def run():
+        flight, source = SingleFlight(), Source()
+        shared, _ = flight.join("case", source.stream)
+        flight.join("case", source.stream)  # disconnects before its response starts
+        subscription = shared.subscribe()
+        source.queue.put_nowait("a")
+        await take(subscription, 1)
+        await subscription.aclose()
+        await asyncio.sleep(0)
+        assert source.cancelled
+
+    asyncio.run(run())
+
+def test_run_nobody_subscribes_to_is_cancelled_after_timeout():
+    async def run():
+        flight, source = SingleFlight(unwatched_timeout=0.01), Source()
+        shared, _ = flight.join("case", source.stream)
+        await asyncio.sleep(0.05)
+        assert source.cancelled and shared.task.done()
+        assert not flight.is_running("case")
+
+    asyncio.run(run())
@@ -0,0 +1,94 @@
+import asyncio
+import zlib
+
+import sse
+from benchmarks.fakes import install_fakes, load_recording
+from sse import SSEEvent, accepts_gzip, gzip_stream, lean_events
+
+async def replay(events):
+    for event in events:
+        yield event
+
+def collect(stream):
+    async def run():
+        return [item async for item in stream]
+    return asyncio.run(run())
+
+def text_by_type(events):
+    texts = {}
+    for event in events:
+        if event.event_type.endswith("_chunk"):
+            texts[event.event_type] = texts.get(event.event_type, "") + event.data["content"]
+    return texts
+
+def test_lean_events_coalesce_without_reordering(monkeypatch):
+    monkeypatch.setattr(sse, "SSE_COALESCE_CHARS", 10)
+    monkeypatch.setattr(sse, "SSE_COALESCE_MS", 10_000)
+    events = [
+        SSEEvent("draft_chunk", {"content": "abc"}),
+        SSEEvent("draft_chunk", {"content": "defgh"}),
+        SSEEvent("draft_chunk", {"content": "ijk"}),
+        SSEEvent("draft_chunk", {"content": "l"}),
+        SSEEvent("stage", {"current": "search"}),
+        SSEEvent("revision_chunk", {"content": "xy"}),
+        SSEEvent("draft_chunk", {"content": "z"}),
+    ]
+    lean = collect(lean_events(replay(events)))
+    assert [(event.event_type, event.data.get("content")) for event in lean] == [
+        ("draft_chunk", "abcdefghijk"),
+        ("draft_chunk", "l"),
+        ("stage", None),
+        ("revision_chunk", "xy"),
+        ("draft_chunk", "z"),
+    ]
+
+def test_lean_events_summarize_search_results():
+    result = {"answer": None, "results": [{"title": "Act", "url": "https://example.org/act", "score": 0.9, "content": "word " * 200, "raw_content": "full text"}]}
+    (event,) = collect(lean_events(replay([SSEEvent("search_result", {"query": "rent act", "result": result})])))
+    source = event.data["sources"][0]
+    assert source["url"] == "https://example.org/act"
+    assert "raw_content" not in source
+    assert len(source["snippet"]) <= sse.SEARCH_SNIPPET_CHARS + 4
+    assert event.data["full_result_url"] == "/search_results?query=rent+act"
+
+def test_lean_mode_gives_the_same_answer_as_full_mode():
+    import main
+
+    recording = load_recording()
+    install_fakes(recording, first_token_latency=0.0, chunk_delay=0.0, chunk_size=5, search_latency=0.0)
+
+    def run(stream_mode):
+        case_details = recording["case_details"] + f" ({stream_mode} mode)"
+        return collect(main.stream_events(main.run_legal_directive(case_details), stream_mode))
+
+    full, lean = run("full"), run("lean")
+    assert len(lean) < len(full)
+    assert text_by_type(lean) == text_by_type(full)
+
+    def final(events):
+        data = next(event.data for event in events if event.event_type == "final")
+        return {key: value for key, value in data.items() if key != "run_id"}
+
+    assert final(lean) == final(full)
+    assert [event.event_type for event in lean if not event.event_type.endswith("_chunk")] == \
+        [event.event_type for event in full if not event.event_type.endswith("_chunk")]
+
+def test_gzip_stream_decompresses_event_by_event():
+    formatted = [SSEEvent("draft_chunk", {"content": f"part {n} " * 20}).format() for n in range(5)]
+    chunks = collect(gzip_stream(replay(formatted)))
+    assert len(chunks) == len(formatted) + 1
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    # Every flushed chunk decodes to exactly its event, before the stream ends
+    for chunk, event in zip(chunks, formatted):
+        assert decompressor.decompress(chunk).decode("utf-8") == event
+    assert decompressor.decompress(chunks[-1]) == b""
+    assert decompressor.eof
+
+def test_accepts_gzip(monkeypatch):
+    assert accepts_gzip("gzip, deflate, br")
+    assert accepts_gzip("*")
+    assert not accepts_gzip("gzip;q=0, br")
+    assert not accepts_gzip(None)
+    monkeypatch.setattr(sse, "SSE_GZIP", False)
+    assert not accepts_gzip("gzip")
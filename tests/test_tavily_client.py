@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+import tavily_client
+from rate_limits import ProviderLimiter
+from tavily_client import TavilyClient, TavilyError
+
+RESULTS = {"query": "rent act", "results": [{"url": "https://example.org/act", "title": "Act", "content": "text"}]}
+
+class StubResponse:
+    def __init__(self, status, data, headers=None, reason="Reason"):
+        self.status_code = self.status = status
+        self.data = data
+        self.headers = headers or {}
+        self.reason = reason
+
+    def json(self, content_type=None):
+        if self.data is None:
+            raise ValueError("not JSON")
+        return self.data
+
+class AsyncStubResponse(StubResponse):
+    async def json(self, content_type=None):
+        return StubResponse.json(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class StubSession:
+    """Returns the given responses in turn, recording the posted payloads"""
+
+    def __init__(self, *responses, response_type=StubResponse):
+        self.responses = list(responses)
+        self.response_type = response_type
+        self.posted = []
+        self.closed = False
+
+    def post(self, url, json=None, headers=None, **kwargs):
+        self.posted.append(json)
+        status, data, response_headers = self.responses.pop(0)
+        return self.response_type(status, data, response_headers)
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = ProviderLimiter("tavily", requests_per_minute=0, max_retries=2, base_delay=0.01, max_delay=1.0)
+    monkeypatch.setattr(tavily_client, "SEARCH_LIMITER", limiter)
+    return limiter
+
+def client_with(*responses):
+    client = TavilyClient(api_key="key", max_results=3)
+    client._session = StubSession(*responses)
+    return client
+
+def async_client_with(*responses):
+    client = TavilyClient(api_key="key", max_results=3)
+    session = StubSession(*responses, response_type=AsyncStubResponse)
+
+    async def get_session():
+        return session
+
+    client._get_async_session = get_session
+    return client, session
+
+def test_success_returns_the_response_and_sends_the_settings(limiter):
+    client = client_with((200, RESULTS, {}))
+    assert client.invoke("rent act") == RESULTS
+    assert client._session.posted == [{"query": "rent act", "max_results": 3}]
+
+def test_error_status_maps_to_tavily_error_with_retry_after(limiter):
+    client = client_with((401, {"detail": {"error": "Unauthorized: missing or invalid API key."}}, {"Retry-After": "7"}))
+    with pytest.raises(TavilyError) as failed:
+        client.invoke("rent act")
+    assert failed.value.status_code == 401
+    assert failed.value.retry_after == "7"
+    assert "invalid API key" in str(failed.value)
+    # Not retryable: one request
+    assert (limiter.retries, limiter.failures) == (0, 1)
+
+def test_error_without_json_body_uses_the_reason(limiter):
+    client = client_with((400, None, {}))
+    with pytest.raises(TavilyError, match="Error 400: Reason"):
+        client.invoke("rent act")
+
+def test_empty_results_raise_lookup_error(limiter):
+    client = client_with((200, {"query": "rent act", "results": []}, {}))
+    with pytest.raises(LookupError, match="No search results found for 'rent act'"):
+        client.invoke("rent act")
+    assert limiter.retries == 0
+
+def test_throttled_and_transient_failures_are_retried(limiter):
+    client = client_with((429, {"detail": "slow down"}, {"Retry-After": "0.01"}), (503, None, {}), (200, RESULTS, {}))
+    assert client.invoke("rent act") == RESULTS
+    assert len(client._session.posted) == 3
+    assert (limiter.retries, limiter.throttled) == (2, 1)
+    assert limiter.stats()["retries"] == 2
+
+def test_retries_give_up_after_max_retries(limiter):
+    client = client_with(*[(503, None, {})] * 3)
+    with pytest.raises(TavilyError) as failed:
+        client.invoke("rent act")
+    assert failed.value.status_code == 503
+    assert (limiter.retries, limiter.failures) == (2, 1)
+
+def test_async_requests_map_errors_and_retry_the_same_way(limiter):
+    client, session = async_client_with((502, {"detail": "bad gateway"}, {}), (200, RESULTS, {}))
+    assert asyncio.run(client.ainvoke("rent act")) == RESULTS
+    assert len(session.posted) == 2
+    assert limiter.retries == 1
+
+    client, _ = async_client_with((429, None, {"Retry-After": "120"}))
+    with pytest.raises(TavilyError) as failed:
+        asyncio.run(client.ainvoke("rent act"))
+    # Longer than the limiter's max_delay: not retried
+    assert failed.value.retry_after == "120"
+    assert limiter.retries == 1
+
+    client, _ = async_client_with((200, {"results": []}, {}))
+    with pytest.raises(LookupError):
+        asyncio.run(client.ainvoke("rent act"))
+
+def test_session_from_another_event_loop_is_closed():
+    client = TavilyClient(api_key="key")
+
+    async def session():
+        return await client._get_async_session()
+
+    first = asyncio.run(session())
+    second = asyncio.run(session())
+    assert first is not second
+    assert first.closed and not second.closed
+
+    async def reuse_and_close():
+        assert await client._get_async_session() is await client._get_async_session()
+        await client.aclose()
+
+    asyncio.run(reuse_and_close())
+    assert client._async_session is None
+    # aclose from a later loop still closes the last session
+    third = asyncio.run(session())
+    asyncio.run(client.aclose())
+    assert third.closed
@@ -0,0 +1,59 @@
+import json
+import random
+
+import pytest
+
+from tool_stream import ToolArgsStream
+
+ARGS = {
+    "answer": 'Line one\nQuote: "bail" \\ tab\there — ₹5 lakh 😀 é',
+    "reflection": {"missing": "limitation period", "superfluous": ""},
+    "search_queries": ["BNSS section 482", 'quashing "FIR" civil dispute', "BSA 2023 section 63"],
+    "references": [],
+    "confidence": 0.8,
+    "final": True,
+}
+
+def feed_all(stream: ToolArgsStream, fragments):
+    events = []
+    for fragment in fragments:
+        events.extend(stream.feed(fragment))
+    return events
+
+def split(text: str, rng: random.Random):
+    fragments, start = [], 0
+    while start < len(text):
+        end = start + rng.randint(1, 12)
+        fragments.append(text[start:end])
+        start = end
+    return fragments
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("seed", range(20))
+def test_any_chunking_reproduces_the_arguments(seed, ensure_ascii):
+    text = json.dumps(ARGS, ensure_ascii=ensure_ascii, indent=seed % 3 or None)
+    stream = ToolArgsStream(stream_fields=("answer",), item_fields=("search_queries",))
+    events = feed_all(stream, split(text, random.Random(seed)))
+
+    assert "".join(value for kind, field, value in events if kind == "delta") == ARGS["answer"]
+    assert [value for kind, field, value in events if kind == "item"] == ARGS["search_queries"]
+    assert {field: value for kind, field, value in events if kind == "field"} == ARGS
+    assert stream.values == ARGS
+
+def test_answer_streams_before_the_arguments_are_complete():
+    stream = ToolArgsStream()
+    assert stream.feed('{"answer": "Mission') == [("delta", "answer", "Mission")]
+    assert stream.feed(' brief') == [("delta", "answer", " brief")]
+    assert stream.feed('ing", "reflection"') == [("delta", "answer", "ing"), ("field", "answer", "Mission briefing")]
+
+def test_fields_are_reported_as_soon_as_they_close():
+    stream = ToolArgsStream(item_fields=("search_queries",))
+    assert stream.feed('{"search_queries": ["a", ') == [("item", "search_queries", "a")]
+    events = stream.feed('"b"], "answer": "x')
+    assert events[:2] == [("item", "search_queries", "b"), ("field", "search_queries", ["a", "b"])]
+    assert events[2:] == [("delta", "answer", "x")]
+
+def test_surrogate_pair_split_across_fragments():
+    stream = ToolArgsStream()
+    events = feed_all(stream, ['{"answer": "\\ud83d', "\\ude00", '"}'])
+    assert "".join(value for kind, _, value in events if kind == "delta") == "😀"
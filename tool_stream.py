@@ -0,0 +1,175 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class ToolArgsStream:
+    """Incremental parser for the JSON arguments of a streaming tool call.
+
+    Feed it the `args` fragments from `tool_call_chunks` as they arrive. Top-level
+    string fields listed in stream_fields are decoded on the fly and reported as
+    ("delta", field, text) events; every other top-level field is reported once as
+    ("field", field, value) as soon as its value is complete. Elements of the
+    arrays listed in item_fields are also reported one by one as ("item", field,
+    value) while the rest of the array is still arriving.
+    """
+
+    def __init__(self, stream_fields=("answer",), item_fields=()):
+        self.stream_fields = set(stream_fields)
+        self.item_fields = set(item_fields)
+        self.values: Dict[str, Any] = {}
+        self._state = "start"
+        self._key: List[str] = []
+        self._current: Optional[str] = None
+        # Streamed string field
+        self._text: List[str] = []
+        self._delta: List[str] = []
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        # Any other value, kept raw until it is complete
+        self._raw: List[str] = []
+        self._depth = 0
+        self._raw_in_string = False
+        self._raw_escape = False
+        # Start (in _raw) of the current element of an item_fields array, or None
+        self._item_start: Optional[int] = None
+
+    def feed(self, fragment: str) -> List[Tuple[str, str, Any]]:
+        events: List[Tuple[str, str, Any]] = []
+        for char in fragment:
+            self._step(char, events)
+        if self._delta:
+            events.append(("delta", self._current, "".join(self._delta)))
+            self._delta = []
+        return events
+
+    def _emit_field(self, events: List[Tuple[str, str, Any]], value: Any):
+        self.values[self._current] = value
+        events.append(("field", self._current, value))
+
+    def _step(self, char: str, events: List[Tuple[str, str, Any]]):
+        state = self._state
+        if state == "start":
+            if char == "{":
+                self._state = "key_or_end"
+        elif state == "key_or_end":
+            if char == '"':
+                self._key = []
+                self._state = "key"
+            elif char == "}":
+                self._state = "done"
+        elif state == "key":
+            if self._escape:
+                self._key.append(_ESCAPES.get(char, char))
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._current = "".join(self._key)
+                self._state = "colon"
+            else:
+                self._key.append(char)
+        elif state == "colon":
+            if char == ":":
+                self._state = "value"
+        elif state == "value":
+            if char.isspace():
+                return
+            if char == '"' and self._current in self.stream_fields:
+                self._text = []
+                self._state = "stream_string"
+            else:
+                self._raw = [char]
+                self._depth = 1 if char in "{[" else 0
+                self._raw_in_string = char == '"'
+                self._raw_escape = False
+                self._item_start = 1 if char == "[" and self._current in self.item_fields else None
+                self._state = "raw"
+                if char not in '{["':
+                    self._state = "scalar"
+        elif state == "stream_string":
+            self._step_stream_string(char, events)
+        elif state == "raw":
+            self._step_raw(char, events)
+        elif state == "scalar":
+            if char in ",}" or char.isspace():
+                self._emit_field(events, json.loads("".join(self._raw)))
+                self._state = "after_value"
+                self._step(char, events)
+            else:
+                self._raw.append(char)
+        elif state == "after_value":
+            if char == ",":
+                self._state = "key_or_end"
+            elif char == "}":
+                self._state = "done"
+
+    def _emit_item(self, events: List[Tuple[str, str, Any]]):
+        element = "".join(self._raw[self._item_start:-1]).strip()
+        if element:
+            events.append(("item", self._current, json.loads(element)))
+        self._item_start = len(self._raw)
+
+    def _step_raw(self, char: str, events: List[Tuple[str, str, Any]]):
+        self._raw.append(char)
+        if self._raw_in_string:
+            if self._raw_escape:
+                self._raw_escape = False
+            elif char == "\\":
+                self._raw_escape = True
+            elif char == '"':
+                self._raw_in_string = False
+                if self._depth == 0:
+                    self._emit_field(events, json.loads("".join(self._raw)))
+                    self._state = "after_value"
+            return
+
+        if char == '"':
+            self._raw_in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char == "," and self._depth == 1 and self._item_start is not None:
+            self._emit_item(events)
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 0 and self._item_start is not None:
+                self._emit_item(events)
+            if self._depth == 0:
+                self._emit_field(events, json.loads("".join(self._raw)))
+                self._state = "after_value"
+
+    def _out(self, text: str):
+        self._text.append(text)
+        self._delta.append(text)
+
+    def _step_stream_string(self, char: str, events: List[Tuple[str, str, Any]]):
+        if self._unicode is not None:
+            self._unicode += char
+            if len(self._unicode) < 4:
+                return
+            code = int(self._unicode, 16)
+            self._unicode = None
+            if 0xD800 <= code < 0xDC00:
+                self._high_surrogate = code  # wait for the low half of the pair
+            elif 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+                self._out(chr(0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)))
+                self._high_surrogate = None
+            else:
+                self._out(chr(code))
+        elif self._escape:
+            self._escape = False
+            if char == "u":
+                self._unicode = ""
+            else:
+                self._out(_ESCAPES.get(char, char))
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            if self._delta:
+                events.append(("delta", self._current, "".join(self._delta)))
+                self._delta = []
+            self._emit_field(events, "".join(self._text))
+            self._state = "after_value"
+        else:
+            self._out(char)